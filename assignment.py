@@ -1,34 +1,560 @@
+import atexit
+import csv
+import datetime
+import fnmatch
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import os
+import random
+import re
+import select
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, redirect_stdout
+from decimal import ROUND_HALF_EVEN, Decimal
+
 import psycopg2
 import pandas as pd
-
-# Database connection details
-DB_NAME = "shopping"
-DB_USER = "postgres"
-DB_PASSWORD = "root"
-DB_HOST = "localhost"
-DB_PORT = "5432"
+from openpyxl import Workbook, load_workbook
+from psycopg2 import sql
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+try:
+    import zstandard  # optional: zstd-compressed CSV exports
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow as pa  # optional: Parquet / Arrow IPC exports
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+try:
+    import resource  # peak memory reporting (not available on Windows)
+except ImportError:
+    resource = None
+
+# Database connection details (SHOPEASE_DSN, or the standard PG* environment variables, override these)
+DB_DSN = os.environ.get("SHOPEASE_DSN", "")
+DB_NAME = os.environ.get("PGDATABASE", "shopping")
+DB_USER = os.environ.get("PGUSER", "postgres")
+DB_PASSWORD = os.environ.get("PGPASSWORD", "root")
+DB_HOST = os.environ.get("PGHOST", "localhost")
+DB_PORT = os.environ.get("PGPORT", "5432")
+
+# Connection pool sizing and the session settings applied to every pooled connection
+POOL_MAX_CONNECTIONS = int(os.environ.get("SHOPEASE_POOL_MAX", "20"))
+# psycopg2 closes returned connections beyond the minimum, so by default every connection is kept
+POOL_MIN_CONNECTIONS = int(os.environ.get("SHOPEASE_POOL_MIN", str(POOL_MAX_CONNECTIONS)))
+POOL_CHECKOUT_TIMEOUT = float(os.environ.get("SHOPEASE_POOL_TIMEOUT", "30"))
+POOL_HEALTH_CHECK_IDLE_SECONDS = 30  # ping connections that sat idle longer than this
+# Rows fetched per round trip by server-side (named) cursors
+DEFAULT_ITERSIZE = int(os.environ.get("SHOPEASE_ITERSIZE", "10000"))
+SESSION_SETTINGS = {
+    "application_name": os.environ.get("SHOPEASE_APPLICATION_NAME", "shopease"),
+    "statement_timeout": os.environ.get("SHOPEASE_STATEMENT_TIMEOUT", ""),
+    "work_mem": os.environ.get("SHOPEASE_WORK_MEM", ""),
+}
+# Opt-in statement instrumentation: "timing" logs every statement with its duration and calling task,
+# "explain" also captures an EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) plan for each explainable statement
+INSTRUMENT_MODE = os.environ.get("SHOPEASE_INSTRUMENT", "").strip().lower()
+INSTRUMENT_LOG = os.environ.get("SHOPEASE_PLAN_LOG", "query_plans.jsonl")
+INSTRUMENT_TOP_N = int(os.environ.get("SHOPEASE_SLOW_TOP_N", "10"))
+
+def connection_params():
+    """
+    Returns the keyword arguments for psycopg2.connect, from SHOPEASE_DSN when it is set.
+    """
+    params = {"dsn": DB_DSN} if DB_DSN else {"dbname": DB_NAME, "user": DB_USER, "password": DB_PASSWORD,
+                                               "host": DB_HOST, "port": DB_PORT}
+    if INSTRUMENT_MODE in ("timing", "explain"):
+        params["cursor_factory"] = InstrumentedCursor
+    return params
 
 # Function to connect to the database
 def connect_db():
     try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
+        conn = psycopg2.connect(**connection_params())
         print("✅ Database connected successfully!")
         return conn
     except Exception as e:
         print(f"❌ Database connection error: {e}")
         return None
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(POOL_MAX_CONNECTIONS)
+_pool_connection_state = weakref.WeakKeyDictionary()  # conn -> {"settings": applied session settings, "last_used": timestamp}
+_pool_checked_out = 0  # connections currently borrowed through borrow_connection
+
+def get_pool():
+    """
+    Returns the process-wide connection pool, creating it on first use (and again after a fork).
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool.closed or _pool_pid != os.getpid():
+            _pool = ThreadedConnectionPool(POOL_MIN_CONNECTIONS, POOL_MAX_CONNECTIONS, **connection_params())
+            _pool_pid = os.getpid()
+            _pool_connection_state.clear()
+    return _pool
+
+def _connection_is_healthy(conn):
+    """
+    Cheap health check: closed/broken connections fail immediately, long-idle ones are pinged.
+    """
+    if conn.closed or conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    state = _pool_connection_state.get(conn)
+    if state and time.monotonic() - state["last_used"] < POOL_HEALTH_CHECK_IDLE_SECONDS:
+        return True
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1;")
+        cur.close()
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def borrow_connection(**session_settings):
+    """
+    Checks a healthy connection out of the pool and applies the session settings
+    (SESSION_SETTINGS overridden by the keyword arguments, e.g. statement_timeout="5s").
+    Waits up to POOL_CHECKOUT_TIMEOUT seconds when every connection is in use.
+    """
+    global _pool_checked_out
+    if not _pool_slots.acquire(timeout=POOL_CHECKOUT_TIMEOUT):
+        raise PoolError("Timed out waiting for a pooled connection")
+    try:
+        pool = get_pool()
+        conn = pool.getconn()
+        while not _connection_is_healthy(conn):
+            _pool_connection_state.pop(conn, None)
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+
+        settings = {**SESSION_SETTINGS, **session_settings}
+        settings = {name: str(value) for name, value in settings.items() if value not in (None, "")}
+        state = _pool_connection_state.setdefault(conn, {"settings": {}, "last_used": 0})
+        if settings != state["settings"]:
+            # one round trip for all settings; RESET ALL drops the previous borrower's overrides
+            query = "RESET ALL;"
+            if settings:
+                query += " SELECT " + ", ".join(["set_config(%s, %s, false)"] * len(settings)) + ";"
+            cur = conn.cursor()
+            cur.execute(query, [part for item in settings.items() for part in item])
+            cur.close()
+            conn.commit()
+            state["settings"] = settings
+        with _pool_lock:
+            _pool_checked_out += 1
+        return conn
+    except Exception:
+        _pool_slots.release()
+        raise
+
+def release_connection(conn):
+    """
+    Returns a borrowed connection to the pool, rolling back anything left uncommitted.
+    """
+    global _pool_checked_out
+    try:
+        pool = get_pool()
+        broken = conn.closed != 0
+        if not broken and conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        pool.putconn(conn, close=broken)
+        if conn.closed:
+            # broken, or beyond POOL_MIN_CONNECTIONS: the pool closed it rather than keeping it
+            _pool_connection_state.pop(conn, None)
+        else:
+            _pool_connection_state.setdefault(conn, {"settings": {}})["last_used"] = time.monotonic()
+    finally:
+        with _pool_lock:
+            _pool_checked_out -= 1
+        _pool_slots.release()
+
+@contextmanager
+def pooled_connection(**session_settings):
+    """
+    Context manager around borrow_connection/release_connection:
+        with pooled_connection(work_mem="256MB") as conn: ...
+    """
+    conn = borrow_connection(**session_settings)
+    try:
+        yield conn
+    finally:
+        release_connection(conn)
+
+def close_pool():
+    """
+    Closes every pooled connection.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None and not _pool.closed and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+        _pool_connection_state.clear()
+
+def benchmark_connection_pool(workers=50, operations=1000):
+    """
+    Compares opening a connection per operation with borrowing one from the pool,
+    running `operations` trivial queries from `workers` concurrent threads.
+    """
+    def connect_per_operation():
+        started = time.perf_counter()
+        conn = psycopg2.connect(**connection_params())
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1;")
+            cur.fetchone()
+        finally:
+            conn.close()
+        return time.perf_counter() - started
+
+    def pooled_operation():
+        started = time.perf_counter()
+        with pooled_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT 1;")
+            cur.fetchone()
+            cur.close()
+        return time.perf_counter() - started
+
+    # open every free pooled connection up front so the run measures checkout, not connection setup
+    # (connections the caller already holds, like the menu's own, cannot be borrowed again)
+    warm_connections = []
+    try:
+        for _ in range(POOL_MAX_CONNECTIONS - _pool_checked_out):
+            warm_connections.append(borrow_connection())
+    except Exception as e:
+        print(f"❌ Error warming up the connection pool: {e}")
+        return
+    finally:
+        for conn in warm_connections:
+            release_connection(conn)
+
+    print(f"\nConnection benchmark: {operations} operations, {workers} concurrent workers, pool max {POOL_MAX_CONNECTIONS}")
+    for label, operation in (("connect-per-operation", connect_per_operation), ("pooled", pooled_operation)):
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                latencies = sorted(executor.map(lambda _: operation(), range(operations)))
+            elapsed = time.perf_counter() - started
+            p50, p95, p99 = (latencies[int(len(latencies) * q) - 1] * 1000 for q in (0.50, 0.95, 0.99))
+            print(f"{label:>22}: {operations / elapsed:,.0f} ops/sec, "
+                  f"mean {statistics.mean(latencies) * 1000:.2f} ms, p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms")
+        except Exception as e:
+            print(f"❌ Error benchmarking {label} connections: {e}")
+
+
+#================================================= task 26 prepared statements =================================================
+
+# Statements that run over and over with only their parameters changing, prepared once per
+# connection and run by name with execute_prepared() ($1, $2, ... are the parameters)
+PREPARED_STATEMENTS = {
+    "product_stock": "SELECT stock FROM products WHERE product_id = $1",
+    "order_item_count": "SELECT COUNT(*) FROM order_items WHERE order_id = $1",
+    "customer_by_id": "SELECT * FROM customers WHERE customer_id = $1",
+    "customer_by_name": "SELECT * FROM customers WHERE name = $1",
+}
+# Most statements kept prepared on one connection; the least recently used one is deallocated beyond this
+PREPARED_STATEMENT_CACHE_SIZE = int(os.environ.get("SHOPEASE_PREPARED_CACHE_SIZE", "32"))
+_prepared_statements = weakref.WeakKeyDictionary()  # connection -> OrderedDict(name -> (query text, EXECUTE text))
+_prepared_statements_lock = threading.Lock()
+
+def register_statement(name, query):
+    """
+    Adds (or replaces) a named statement in the registry. Connections that prepared an older
+    text of it re-prepare it on next use.
+    """
+    PREPARED_STATEMENTS[name] = query
+
+def execute_prepared(cur, name, params=()):
+    """
+    Runs the registered statement `name` with params on the cursor's connection, PREPAREing it
+    there first if needed, so repeated calls skip parsing and planning. Fetch results from cur as usual.
+    """
+    query = PREPARED_STATEMENTS[name]
+    prepared = _prepared_statements.get(cur.connection)
+    if prepared is None:
+        with _prepared_statements_lock:
+            prepared = _prepared_statements.setdefault(cur.connection, OrderedDict())
+
+    entry = prepared.get(name)
+    if entry is not None and entry[0] == query:
+        prepared.move_to_end(name)
+        idle = cur.connection.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        try:
+            cur.execute(entry[1], params)
+            return cur
+        except (psycopg2.errors.FeatureNotSupported, psycopg2.errors.InvalidSqlStatementName) as e:
+            # The table behind it changed its columns ("cached plan must not change result type"):
+            # it is still prepared, so it is deallocated and prepared again below. Statements
+            # deallocated behind our back (DISCARD ALL) are all forgotten. Only retried when no
+            # earlier work of the caller's transaction would be rolled back with it.
+            if isinstance(e, psycopg2.errors.InvalidSqlStatementName):
+                prepared.clear()
+            if not idle:
+                raise
+            cur.connection.rollback()
+
+    statement = sql.Identifier(f"shopease_{name}")
+    if name in prepared:
+        cur.execute(sql.SQL("DEALLOCATE {};").format(statement))
+        del prepared[name]
+    while prepared and len(prepared) >= PREPARED_STATEMENT_CACHE_SIZE:
+        evicted, _ = prepared.popitem(last=False)
+        cur.execute(sql.SQL("DEALLOCATE {};").format(sql.Identifier(f"shopease_{evicted}")))
+    cur.execute(sql.SQL("PREPARE {} AS ").format(statement) + sql.SQL(query))
+    execute = sql.SQL("EXECUTE {}").format(statement)
+    if params:
+        execute += sql.SQL(" ({})").format(sql.SQL(", ").join(sql.Placeholder() * len(params)))
+    prepared[name] = (query, execute.as_string(cur) + ";")  # composed once, reused as plain text
+    cur.execute(prepared[name][1], params)
+    return cur
+
+def benchmark_prepared_statements(conn, lookups=20000):
+    """
+    Compares point lookups (product stock, customer by ID) sent as full query text with the
+    same lookups through execute_prepared(), reporting per-lookup latency.
+    """
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT MIN(product_id), MAX(product_id), MIN(customer_id), MAX(customer_id) FROM products, customers;")
+        min_product, max_product, min_customer, max_customer = cur.fetchone()
+        if min_product is None or min_customer is None:
+            print("No products or customers to look up; insert or generate data first.")
+            return
+        rng = random.Random(42)
+        keys = [(rng.randint(min_product, max_product), rng.randint(min_customer, max_customer)) for _ in range(lookups // 2)]
+
+        def plain(product_id, customer_id):
+            cur.execute("SELECT stock FROM products WHERE product_id = %s;", (product_id,))
+            cur.fetchall()
+            cur.execute("SELECT * FROM customers WHERE customer_id = %s;", (customer_id,))
+            cur.fetchall()
+
+        def prepared(product_id, customer_id):
+            execute_prepared(cur, "product_stock", (product_id,)).fetchall()
+            execute_prepared(cur, "customer_by_id", (customer_id,)).fetchall()
+
+        print(f"\nPoint lookup benchmark: {len(keys) * 2:,} lookups (product stock + customer by ID)")
+        results = {}
+        for label, lookup in (("plain query text", plain), ("prepared", prepared)):
+            for product_id, customer_id in keys[:100]:
+                lookup(product_id, customer_id)  # warm up caches (and prepare)
+            latencies = []
+            for product_id, customer_id in keys:
+                started = time.perf_counter()
+                lookup(product_id, customer_id)
+                latencies.append((time.perf_counter() - started) / 2)
+            conn.commit()
+            latencies.sort()
+            results[label] = statistics.mean(latencies)
+            p50, p95, p99 = (latencies[int(len(latencies) * q) - 1] * 1e6 for q in (0.50, 0.95, 0.99))
+            print(f"{label:>18}: mean {results[label] * 1e6:.1f} µs, p50 {p50:.1f} µs, p95 {p95:.1f} µs, p99 {p99:.1f} µs")
+        print(f"Prepared lookups are {(1 - results['prepared'] / results['plain query text']) * 100:.1f}% faster on average.")
+        cur.close()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error benchmarking prepared statements: {e}")
+
+
+#================================================= streaming queries =================================================
+
+_cursor_names = itertools.count(1)
+
+def stream_query(conn, query, params=None, itersize=DEFAULT_ITERSIZE):
+    """
+    Runs a query through a named (server-side) cursor and yields its rows, fetching itersize
+    rows per round trip, so only one batch is held in Python memory at a time.
+    """
+    cur = conn.cursor(name=f"shopease_stream_{next(_cursor_names)}")
+    cur.itersize = itersize
+    try:
+        cur.execute(query, params)
+        for row in cur:
+            yield row
+    finally:
+        try:
+            cur.close()
+        except psycopg2.Error:
+            pass  # the transaction already ended, which dropped the server-side cursor
+
+def iter_chunks(rows, chunk_rows):
+    """
+    Groups an iterable of rows into lists of at most chunk_rows rows.
+    """
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_rows))
+        if not chunk:
+            return
+        yield chunk
+
+def peek_rows(rows):
+    """
+    Returns (first_row, rows) with the first row put back, or (None, None) when there are no rows.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return None, None
+    return first, itertools.chain([first], rows)
+
+#================================================= query instrumentation =================================================
+
+# Statements EXPLAIN accepts; anything else (DDL, COPY, CALL, SET, ...) is only timed
+EXPLAINABLE_STATEMENTS = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "MERGE", "VALUES", "TABLE")
+# Statements EXPLAIN ANALYZE could not fully undo: a savepoint rolls back data changes but not sequence
+# advances (serial/identity defaults, nextval in triggers such as report_invalidation)
+SIDE_EFFECT_PATTERN = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|nextval|setval)\b", re.IGNORECASE)
+# Frames skipped when looking for the function that issued a statement
+INSTRUMENTATION_FRAMES = {"execute", "executemany", "copy_expert", "_record", "_explain", "calling_functions"}
+
+_statement_stats = {}  # (task, statement) -> {"calls", "total_ms", "max_ms", "caller"}
+_statement_stats_lock = threading.Lock()
+
+def calling_functions():
+    """
+    Returns (task, caller) for the current statement: the outermost and innermost functions of this
+    module on the stack, e.g. ("task_14_export_data", "copy_query_to_csv").
+    """
+    task = caller = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        name = frame.f_code.co_name
+        if frame.f_code.co_filename == __file__ and name != "<module>" and name not in INSTRUMENTATION_FRAMES:
+            caller = caller or name
+            task = name
+        frame = frame.f_back
+    return task, caller
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """
+    Cursor that times every statement and, in "explain" mode, captures its plan with
+    EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) inside a savepoint that is rolled back. Statements that may
+    write or advance a sequence, and every statement on an autocommit connection (no savepoint to
+    undo it in), get a plain EXPLAIN instead, so nothing is ever executed twice.
+    """
+    def _explain(self, query, vars):
+        statement = self.mogrify(query, vars).decode(psycopg2.extensions.encodings[self.connection.encoding], "replace")
+        keyword = statement.lstrip().lstrip("(").split(None, 1)[0].upper() if statement.strip() else ""
+        if keyword not in EXPLAINABLE_STATEMENTS:
+            return None
+        autocommit = self.connection.autocommit
+        analyze = not autocommit and not SIDE_EFFECT_PATTERN.search(statement)
+        cur = self.connection.cursor(cursor_factory=psycopg2.extensions.cursor)
+        try:
+            if not autocommit:
+                cur.execute("SAVEPOINT shopease_explain;")
+            try:
+                cur.execute(("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " if analyze else "EXPLAIN (FORMAT JSON) ") + statement)
+                return cur.fetchone()[0][0]
+            except psycopg2.Error:
+                return None  # let the real execute report the error
+            finally:
+                if not autocommit:
+                    cur.execute("ROLLBACK TO SAVEPOINT shopease_explain; RELEASE SAVEPOINT shopease_explain;")
+        finally:
+            cur.close()
+
+    def _record(self, query, started, plan=None):
+        duration_ms = (time.perf_counter() - started) * 1000
+        text = query.as_string(self) if isinstance(query, sql.Composable) else query
+        text = " ".join((text.decode() if isinstance(text, bytes) else str(text)).split())
+        task, caller = calling_functions()
+        entry = {
+            "logged_at": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "pid": os.getpid(),
+            "task": task,
+            "caller": caller,
+            "statement": text,
+            "duration_ms": round(duration_ms, 3),
+            "rowcount": self.rowcount,
+        }
+        if plan is not None:
+            entry["planning_ms"] = plan.get("Planning Time")
+            entry["execution_ms"] = plan.get("Execution Time")
+            entry["plan"] = plan["Plan"]
+        with _statement_stats_lock:
+            stats = _statement_stats.setdefault((task, text), {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "caller": caller})
+            stats["calls"] += 1
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            try:
+                with open(INSTRUMENT_LOG, "a") as log:
+                    log.write(json.dumps(entry, default=str) + "\n")
+            except OSError:
+                pass  # never let logging break the statement
+
+    def execute(self, query, vars=None):
+        plan = self._explain(query, vars) if INSTRUMENT_MODE == "explain" else None
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self._record(query, started, plan)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self._record(query, started)
+
+    def copy_expert(self, query, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(query, file, size)
+        finally:
+            self._record(query, started)
+
+def print_slowest_statements(top_n=INSTRUMENT_TOP_N):
+    """
+    Prints the statements with the highest total time recorded by InstrumentedCursor in this process.
+    """
+    with _statement_stats_lock:
+        slowest = sorted(_statement_stats.items(), key=lambda item: item[1]["total_ms"], reverse=True)[:top_n]
+    if not slowest:
+        return
+    print(f"\nTop {len(slowest)} statements by total time (plans and timings in {INSTRUMENT_LOG}):")
+    print(f"{'Total ms':>10} {'Calls':>6} {'Max ms':>9}  {'Task':<32} Statement")
+    for (task, statement), stats in slowest:
+        print(f"{stats['total_ms']:>10,.1f} {stats['calls']:>6} {stats['max_ms']:>9,.1f}  {str(task):<32} {statement[:100]}")
+
+if INSTRUMENT_MODE in ("timing", "explain"):
+    atexit.register(print_slowest_statements)
+
 #================================================= task 1 create tables =================================================
 # Function to create tables (IF NOT EXISTS)
-def create_tables(conn):
+def create_tables(conn, partitioned=False):
     try:
         cur = conn.cursor()
 
+        # orders and payments can be created as monthly range-partitioned tables (see task 22). A partitioned
+        # table's primary key must include its partition key, so nothing can reference orders(order_id) with a
+        # foreign key any more; triggers enforce those references instead.
+        order_reference = "" if partitioned else " REFERENCES orders(order_id) ON DELETE CASCADE"
+
         # Creating the tables (Using IF NOT EXISTS to avoid errors)
         cur.execute("""
             CREATE TABLE IF NOT EXISTS stores (
@@ -81,36 +607,46 @@ def create_tables(conn):
             );
         """)
 
-        cur.execute("""
+        cur.execute(f"""
             CREATE TABLE IF NOT EXISTS orders (
-                order_id INT PRIMARY KEY,
+                order_id INT NOT NULL,
                 customer_id INT REFERENCES customers(customer_id) ON DELETE CASCADE,
                 store_id INT REFERENCES stores(store_id) ON DELETE SET NULL,
                 order_date DATE NOT NULL DEFAULT CURRENT_DATE,
-                total_amount DECIMAL(10,2) CHECK (total_amount >= 0)
-            );
+                total_amount DECIMAL(10,2) CHECK (total_amount >= 0),
+                PRIMARY KEY (order_id{", order_date" if partitioned else ""})
+            ){" PARTITION BY RANGE (order_date)" if partitioned else ""};
         """)
 
-        cur.execute("""
+        cur.execute(f"""
             CREATE TABLE IF NOT EXISTS order_items (
                 order_item_id INT PRIMARY KEY,
-                order_id INT REFERENCES orders(order_id) ON DELETE CASCADE,
+                order_id INT{order_reference},
                 product_id INT REFERENCES products(product_id) ON DELETE CASCADE,
                 quantity INT CHECK (quantity > 0),
                 price DECIMAL(10,2) CHECK (price >= 0)
             );
         """)
 
-        cur.execute("""
+        cur.execute(f"""
             CREATE TABLE IF NOT EXISTS payments (
-                payment_id INT PRIMARY KEY,
-                order_id INT REFERENCES orders(order_id) ON DELETE CASCADE,
+                payment_id INT NOT NULL,
+                order_id INT{order_reference},
                 amount DECIMAL(10,2) CHECK (amount >= 0),
                 payment_method VARCHAR(50) NOT NULL,
-                payment_date DATE NOT NULL DEFAULT CURRENT_DATE
-            );
+                payment_date DATE NOT NULL DEFAULT CURRENT_DATE,
+                PRIMARY KEY (payment_id{", payment_date" if partitioned else ""})
+            ){" PARTITION BY RANGE (payment_date)" if partitioned else ""};
         """)
 
+        create_order_sequences(cur)
+
+        if partitioned:
+            create_order_reference_triggers(cur)
+            this_month = month_start(datetime.date.today())
+            for table in PARTITIONED_TABLES:
+                ensure_partitions(cur, table, this_month, add_months(this_month, PARTITION_PREMAKE_MONTHS))
+
         conn.commit()
         cur.close()
         print("✅ Tables created successfully (if not already existing)!")
@@ -139,6 +675,23 @@ def create_indexes(conn):
             ON orders (customer_id, order_date);
         """)
 
+        # Index on order_date for date-range scans such as the per-month rollup backfill
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_orders_order_date
+            ON orders (order_date);
+        """)
+
+        # Foreign key indexes: joins and cascading deletes/updates look rows up by these columns
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items (order_id);
+            CREATE INDEX IF NOT EXISTS idx_order_items_product_id ON order_items (product_id);
+            CREATE INDEX IF NOT EXISTS idx_payments_order_id ON payments (order_id);
+            CREATE INDEX IF NOT EXISTS idx_orders_store_id ON orders (store_id);
+            CREATE INDEX IF NOT EXISTS idx_employees_manager_id ON employees (manager_id);
+            CREATE INDEX IF NOT EXISTS idx_employees_store_id ON employees (store_id);
+            CREATE INDEX IF NOT EXISTS idx_products_supplier_id ON products (supplier_id);
+        """)
+
         conn.commit()
         cur.close()
         print("✅ Indexes created successfully!")
@@ -166,16 +719,24 @@ def create_views(conn):
             ORDER BY total_quantity_sold DESC;
         """)
 
-        # View for total revenue per store
+        # Per-store totals maintained incrementally from orders (see create_store_revenue_summary)
+        create_store_revenue_summary(cur)
+
+        # Per-store monthly revenue rollup behind the monthly revenue report
+        create_store_monthly_revenue(cur)
+        cur.execute("SELECT to_regproc('notify_report_invalidation');")
+        if cur.fetchone()[0]:
+            create_report_invalidation_triggers(cur)  # cached reports read the rollup
+
+        # View for total revenue per store: reads the summary table, O(#stores) regardless of order volume
         cur.execute("""
             CREATE OR REPLACE VIEW store_revenue AS
             SELECT 
                 s.store_id,
                 s.name AS store_name,
-                COALESCE(SUM(o.total_amount), 0) AS total_revenue
+                COALESCE(r.total_revenue, 0)::NUMERIC AS total_revenue
             FROM stores s
-            LEFT JOIN orders o ON s.store_id = o.store_id
-            GROUP BY s.store_id, s.name
+            LEFT JOIN store_revenue_summary r ON s.store_id = r.store_id
             ORDER BY total_revenue DESC;
         """)
 
@@ -186,6 +747,928 @@ def create_views(conn):
     except Exception as e:
         print(f"❌ Error creating views: {e}")
 
+# Recomputes store_revenue_summary from orders (full scan)
+STORE_REVENUE_RECOMPUTE_QUERY = """
+    SELECT store_id, SUM(COALESCE(total_amount, 0)) AS total_revenue, COUNT(*) AS order_count
+    FROM orders
+    WHERE store_id IS NOT NULL
+    GROUP BY store_id
+"""
+
+def create_store_revenue_summary(cur):
+    """
+    Creates store_revenue_summary and the statement-level triggers that apply insert/update/delete
+    deltas from the orders transition tables, then fills it from the current orders.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS store_revenue_summary (
+            store_id INT PRIMARY KEY,
+            total_revenue NUMERIC NOT NULL DEFAULT 0,
+            order_count BIGINT NOT NULL DEFAULT 0
+        );
+    """)
+
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION maintain_store_revenue_summary()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                DELETE FROM store_revenue_summary;
+                RETURN NULL;
+            END IF;
+
+            -- Net change per store from the transition tables. Rows are upserted in store_id
+            -- order so concurrent statements lock summary rows in the same order.
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO store_revenue_summary AS summary (store_id, total_revenue, order_count)
+                SELECT store_id, SUM(COALESCE(total_amount, 0)), COUNT(*)
+                FROM new_orders
+                WHERE store_id IS NOT NULL
+                GROUP BY store_id
+                ORDER BY store_id
+                ON CONFLICT (store_id) DO UPDATE
+                SET total_revenue = summary.total_revenue + EXCLUDED.total_revenue,
+                    order_count = summary.order_count + EXCLUDED.order_count;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO store_revenue_summary AS summary (store_id, total_revenue, order_count)
+                SELECT store_id, -SUM(COALESCE(total_amount, 0)), -COUNT(*)
+                FROM old_orders
+                WHERE store_id IS NOT NULL
+                GROUP BY store_id
+                ORDER BY store_id
+                ON CONFLICT (store_id) DO UPDATE
+                SET total_revenue = summary.total_revenue + EXCLUDED.total_revenue,
+                    order_count = summary.order_count + EXCLUDED.order_count;
+            ELSE
+                INSERT INTO store_revenue_summary AS summary (store_id, total_revenue, order_count)
+                SELECT store_id, SUM(amount), SUM(order_delta)
+                FROM (
+                    SELECT store_id, COALESCE(total_amount, 0) AS amount, 1 AS order_delta FROM new_orders
+                    UNION ALL
+                    SELECT store_id, -COALESCE(total_amount, 0), -1 FROM old_orders
+                ) AS changes
+                WHERE store_id IS NOT NULL
+                GROUP BY store_id
+                HAVING SUM(amount) <> 0 OR SUM(order_delta) <> 0
+                ORDER BY store_id
+                ON CONFLICT (store_id) DO UPDATE
+                SET total_revenue = summary.total_revenue + EXCLUDED.total_revenue,
+                    order_count = summary.order_count + EXCLUDED.order_count;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    cur.execute("""
+        CREATE OR REPLACE TRIGGER store_revenue_summary_insert
+        AFTER INSERT ON orders
+        REFERENCING NEW TABLE AS new_orders
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION maintain_store_revenue_summary();
+    """)
+    cur.execute("""
+        CREATE OR REPLACE TRIGGER store_revenue_summary_update
+        AFTER UPDATE ON orders
+        REFERENCING OLD TABLE AS old_orders NEW TABLE AS new_orders
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION maintain_store_revenue_summary();
+    """)
+    cur.execute("""
+        CREATE OR REPLACE TRIGGER store_revenue_summary_delete
+        AFTER DELETE ON orders
+        REFERENCING OLD TABLE AS old_orders
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION maintain_store_revenue_summary();
+    """)
+    cur.execute("""
+        CREATE OR REPLACE TRIGGER store_revenue_summary_truncate
+        AFTER TRUNCATE ON orders
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION maintain_store_revenue_summary();
+    """)
+
+    rebuild_store_revenue_summary(cur)
+
+def rebuild_store_revenue_summary(cur):
+    """
+    Replaces store_revenue_summary with a full recompute. Orders are locked against writes
+    until the caller commits, so no trigger delta can slip in between.
+    """
+    cur.execute("LOCK TABLE orders IN SHARE MODE;")
+    cur.execute("DELETE FROM store_revenue_summary;")
+    cur.execute("INSERT INTO store_revenue_summary (store_id, total_revenue, order_count) " + STORE_REVENUE_RECOMPUTE_QUERY + ";")
+
+def reconcile_store_revenue(conn, repair=False):
+    """
+    Verifies store_revenue_summary against a full recompute from orders and prints any drift.
+    With repair=True the summary is rebuilt when drift is found.
+    """
+    try:
+        cur = conn.cursor()
+        cur.execute(f"""
+            WITH actual AS ({STORE_REVENUE_RECOMPUTE_QUERY})
+            SELECT
+                COALESCE(a.store_id, s.store_id) AS store_id,
+                COALESCE(s.total_revenue, 0), COALESCE(a.total_revenue, 0),
+                COALESCE(s.order_count, 0), COALESCE(a.order_count, 0)
+            FROM actual a
+            FULL JOIN store_revenue_summary s ON s.store_id = a.store_id
+            WHERE COALESCE(s.total_revenue, 0) <> COALESCE(a.total_revenue, 0)
+               OR COALESCE(s.order_count, 0) <> COALESCE(a.order_count, 0)
+            ORDER BY 1;
+        """)
+        drift = cur.fetchall()
+        if not drift:
+            print("✅ store_revenue_summary matches a full recompute from orders.")
+        else:
+            print(f"❌ store_revenue_summary differs from orders for {len(drift)} stores:")
+            for store_id, summary_total, actual_total, summary_count, actual_count in drift:
+                print(f"Store ID: {store_id}, Summary: {summary_total} ({summary_count} orders), Actual: {actual_total} ({actual_count} orders)")
+            if repair:
+                rebuild_store_revenue_summary(cur)
+                print("✅ store_revenue_summary rebuilt from orders.")
+        conn.commit()
+        cur.close()
+        return len(drift)
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error reconciling store revenue: {e}")
+        return None
+# Month bucket of an order, as stored in store_monthly_revenue.month
+ORDER_MONTH_EXPRESSION = "date_trunc('month', order_date)::DATE"
+
+def add_months(month, count):
+    """
+    Returns the first day of the month `count` months after `month`.
+    """
+    years, month_index = divmod(month.month - 1 + count, 12)
+    return datetime.date(month.year + years, month_index + 1, 1)
+
+def create_store_monthly_revenue(cur):
+    """
+    Creates the (store_id, month) revenue rollup and the statement-level triggers on orders
+    that keep it current, then fills it from the current orders.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS store_monthly_revenue (
+            store_id INT NOT NULL,
+            month DATE NOT NULL,
+            revenue NUMERIC NOT NULL DEFAULT 0,
+            order_count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (store_id, month)
+        );
+    """)
+
+    cur.execute(f"""
+        CREATE OR REPLACE FUNCTION maintain_store_monthly_revenue()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                DELETE FROM store_monthly_revenue;
+                RETURN NULL;
+            END IF;
+
+            -- Net change per (store, month) from the transition tables, upserted in key order
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO store_monthly_revenue AS rollup (store_id, month, revenue, order_count)
+                SELECT store_id, {ORDER_MONTH_EXPRESSION}, SUM(COALESCE(total_amount, 0)), COUNT(*)
+                FROM new_orders
+                WHERE store_id IS NOT NULL
+                GROUP BY 1, 2
+                ORDER BY 1, 2
+                ON CONFLICT (store_id, month) DO UPDATE
+                SET revenue = rollup.revenue + EXCLUDED.revenue,
+                    order_count = rollup.order_count + EXCLUDED.order_count;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO store_monthly_revenue AS rollup (store_id, month, revenue, order_count)
+                SELECT store_id, {ORDER_MONTH_EXPRESSION}, -SUM(COALESCE(total_amount, 0)), -COUNT(*)
+                FROM old_orders
+                WHERE store_id IS NOT NULL
+                GROUP BY 1, 2
+                ORDER BY 1, 2
+                ON CONFLICT (store_id, month) DO UPDATE
+                SET revenue = rollup.revenue + EXCLUDED.revenue,
+                    order_count = rollup.order_count + EXCLUDED.order_count;
+            ELSE
+                INSERT INTO store_monthly_revenue AS rollup (store_id, month, revenue, order_count)
+                SELECT store_id, month, SUM(amount), SUM(order_delta)
+                FROM (
+                    SELECT store_id, {ORDER_MONTH_EXPRESSION} AS month, COALESCE(total_amount, 0) AS amount, 1 AS order_delta
+                    FROM new_orders
+                    UNION ALL
+                    SELECT store_id, {ORDER_MONTH_EXPRESSION}, -COALESCE(total_amount, 0), -1
+                    FROM old_orders
+                ) AS changes
+                WHERE store_id IS NOT NULL
+                GROUP BY 1, 2
+                HAVING SUM(amount) <> 0 OR SUM(order_delta) <> 0
+                ORDER BY 1, 2
+                ON CONFLICT (store_id, month) DO UPDATE
+                SET revenue = rollup.revenue + EXCLUDED.revenue,
+                    order_count = rollup.order_count + EXCLUDED.order_count;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    cur.execute("""
+        CREATE OR REPLACE TRIGGER store_monthly_revenue_insert
+        AFTER INSERT ON orders
+        REFERENCING NEW TABLE AS new_orders
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION maintain_store_monthly_revenue();
+    """)
+    cur.execute("""
+        CREATE OR REPLACE TRIGGER store_monthly_revenue_update
+        AFTER UPDATE ON orders
+        REFERENCING OLD TABLE AS old_orders NEW TABLE AS new_orders
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION maintain_store_monthly_revenue();
+    """)
+    cur.execute("""
+        CREATE OR REPLACE TRIGGER store_monthly_revenue_delete
+        AFTER DELETE ON orders
+        REFERENCING OLD TABLE AS old_orders
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION maintain_store_monthly_revenue();
+    """)
+    cur.execute("""
+        CREATE OR REPLACE TRIGGER store_monthly_revenue_truncate
+        AFTER TRUNCATE ON orders
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION maintain_store_monthly_revenue();
+    """)
+
+    rebuild_store_monthly_revenue(cur)
+
+def rebuild_store_monthly_revenue(cur, start_month=None, end_month=None):
+    """
+    Recomputes the rollup from orders for months in [start_month, end_month) (all months by default).
+    Orders are locked against writes until the caller commits.
+    """
+    cur.execute("LOCK TABLE orders IN SHARE MODE;")
+    compute_monthly_revenue_rows(cur, "store_monthly_revenue", start_month, end_month)
+
+def compute_monthly_revenue_rows(cur, table, start_month=None, end_month=None):
+    """
+    Replaces the rows of `table` (store_monthly_revenue or its backfill copy) for months in
+    [start_month, end_month) with fresh totals from orders. Takes no locks.
+    """
+    params = {"start": start_month, "end": end_month}
+    cur.execute(sql.SQL("""
+        DELETE FROM {}
+        WHERE (%(start)s::DATE IS NULL OR month >= %(start)s) AND (%(end)s::DATE IS NULL OR month < %(end)s);
+    """).format(sql.Identifier(table)), params)
+    cur.execute(sql.SQL(f"""
+        INSERT INTO {{}} (store_id, month, revenue, order_count)
+        SELECT store_id, {ORDER_MONTH_EXPRESSION}, SUM(COALESCE(total_amount, 0)), COUNT(*)
+        FROM orders
+        WHERE store_id IS NOT NULL
+          AND (%(start)s::DATE IS NULL OR order_date >= %(start)s)
+          AND (%(end)s::DATE IS NULL OR order_date < %(end)s)
+        GROUP BY 1, 2;
+    """).format(sql.Identifier(table)), params)
+
+def create_monthly_revenue_backfill_log(cur):
+    """
+    Creates the backfill copy of the rollup and triggers that record the month of every order
+    written from now on (NULL after a TRUNCATE: every month), so those months can be recomputed
+    at the swap.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS store_monthly_revenue_backfill (LIKE store_monthly_revenue INCLUDING ALL);
+        TRUNCATE store_monthly_revenue_backfill;
+        CREATE TABLE IF NOT EXISTS store_monthly_revenue_backfill_log (month DATE);
+        TRUNCATE store_monthly_revenue_backfill_log;
+    """)
+    cur.execute(f"""
+        CREATE OR REPLACE FUNCTION log_monthly_revenue_backfill_changes()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                INSERT INTO store_monthly_revenue_backfill_log VALUES (NULL);
+                RETURN NULL;
+            END IF;
+            IF TG_OP <> 'INSERT' THEN
+                INSERT INTO store_monthly_revenue_backfill_log SELECT DISTINCT {ORDER_MONTH_EXPRESSION} FROM old_rows;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                INSERT INTO store_monthly_revenue_backfill_log SELECT DISTINCT {ORDER_MONTH_EXPRESSION} FROM new_rows;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for event, transition_tables in (("INSERT", "REFERENCING NEW TABLE AS new_rows"),
+                                     ("UPDATE", "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+                                     ("DELETE", "REFERENCING OLD TABLE AS old_rows"),
+                                     ("TRUNCATE", "")):
+        cur.execute(f"""
+            CREATE OR REPLACE TRIGGER monthly_revenue_backfill_{event.lower()}
+            AFTER {event} ON orders
+            {transition_tables}
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION log_monthly_revenue_backfill_changes();
+        """)
+
+def drop_monthly_revenue_backfill_log(cur):
+    """
+    Removes the backfill triggers, change log and copy.
+    """
+    for event in ("insert", "update", "delete", "truncate"):
+        cur.execute(f"DROP TRIGGER IF EXISTS monthly_revenue_backfill_{event} ON orders;")
+    cur.execute("""
+        DROP FUNCTION IF EXISTS log_monthly_revenue_backfill_changes();
+        DROP TABLE IF EXISTS store_monthly_revenue_backfill_log, store_monthly_revenue_backfill;
+    """)
+
+def _backfill_month_chunk(start_month, end_month):
+    """
+    Worker process entry point: computes one range of months into the backfill copy over its own connection.
+    """
+    try:
+        conn = psycopg2.connect(**connection_params())  # connect_db() would print a line per worker
+    except psycopg2.Error as e:
+        return start_month, f"could not connect: {str(e).strip()}"
+    try:
+        cur = conn.cursor()
+        compute_monthly_revenue_rows(cur, "store_monthly_revenue_backfill", start_month, end_month)
+        conn.commit()
+        cur.close()
+        return start_month, None
+    except Exception as e:
+        conn.rollback()
+        return start_month, str(e).strip()
+    finally:
+        conn.close()
+
+def backfill_monthly_revenue(conn, workers=None, months_per_chunk=1):
+    """
+    Rebuilds store_monthly_revenue from the whole order history. Chunks of months are computed
+    into a copy by parallel worker processes (each an indexed range scan of orders, without locks)
+    while triggers log the months of orders written meanwhile. A short final transaction locks
+    orders, recomputes only the logged months and swaps the copy in.
+    """
+    try:
+        cur = conn.cursor()
+        create_monthly_revenue_backfill_log(cur)
+        conn.commit()  # orders written from here on are logged; the workers see everything before
+        cur.execute(f"SELECT MIN({ORDER_MONTH_EXPRESSION}), MAX({ORDER_MONTH_EXPRESSION}) FROM orders;")
+        first_month, last_month = cur.fetchone()
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error planning the monthly revenue backfill: {e}")
+        try:
+            drop_monthly_revenue_backfill_log(cur)
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+        return
+
+    chunks = []
+    month = first_month
+    while month is not None and month <= last_month:
+        next_month = add_months(month, months_per_chunk)
+        chunks.append((month, next_month))
+        month = next_month
+
+    started = time.perf_counter()
+    failures = 0
+    if chunks:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = [pool.submit(_backfill_month_chunk, start, end) for start, end in chunks]
+            for future in as_completed(futures):
+                start_month, error = future.result()
+                if error:
+                    failures += 1
+                    print(f"❌ Month chunk starting {start_month}: {error}")
+
+    try:
+        if failures:
+            drop_monthly_revenue_backfill_log(cur)
+            conn.commit()
+            print(f"❌ Monthly revenue backfill abandoned: {failures}/{len(chunks)} chunks failed; the rollup is unchanged")
+            return
+        cur.execute("LOCK TABLE orders IN SHARE MODE;")
+        cur.execute("SELECT DISTINCT month FROM store_monthly_revenue_backfill_log;")
+        changed_months = [row[0] for row in cur.fetchall()]
+        if None in changed_months:
+            compute_monthly_revenue_rows(cur, "store_monthly_revenue_backfill")
+        else:
+            for month in changed_months:
+                compute_monthly_revenue_rows(cur, "store_monthly_revenue_backfill", month, add_months(month, 1))
+        cur.execute("""
+            DELETE FROM store_monthly_revenue;
+            INSERT INTO store_monthly_revenue SELECT * FROM store_monthly_revenue_backfill;
+        """)
+        drop_monthly_revenue_backfill_log(cur)
+        conn.commit()
+        cur.close()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error swapping in the monthly revenue backfill: {e}")
+        try:
+            drop_monthly_revenue_backfill_log(cur)
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+        return
+    elapsed = time.perf_counter() - started
+    if not chunks:
+        print("No orders to backfill.")
+        return
+    print(f"✅ Monthly revenue backfilled: {len(chunks)} chunks in {elapsed:.2f}s "
+          f"({len(changed_months)} months written meanwhile recomputed at the swap)")
+
+#================================================= task 22 table partitioning =================================================
+
+# Tables that can be range-partitioned by month, with their partition key and primary key column
+PARTITIONED_TABLES = {"orders": ("order_date", "order_id"), "payments": ("payment_date", "payment_id")}
+# Months of partitions kept ready ahead of the current month
+PARTITION_PREMAKE_MONTHS = int(os.environ.get("SHOPEASE_PARTITION_PREMAKE_MONTHS", "3"))
+# Rows copied per committed batch when migrating a table into partitions
+PARTITION_MIGRATION_BATCH_ROWS = 50_000
+
+def month_start(day):
+    """
+    Returns the first day of the month containing `day`.
+    """
+    return datetime.date(day.year, day.month, 1)
+
+def partition_name(table, month):
+    """
+    Name of the monthly partition of a table, e.g. orders_2024_03.
+    """
+    return f"{table}_{month:%Y_%m}"
+
+def is_partitioned(cur, table):
+    """
+    True when the table exists and is partitioned.
+    """
+    cur.execute("SELECT EXISTS (SELECT 1 FROM pg_class WHERE oid = to_regclass(%s) AND relkind = 'p');", (table,))
+    return cur.fetchone()[0]
+
+def create_month_partition(cur, table, month, parent=None):
+    """
+    Creates the partition of `parent` (default: `table`) for one month. Rows of that month already
+    sitting in the default partition are moved into the new partition before it is attached.
+    Returns True when a partition was created.
+    """
+    parent = parent or table
+    name = partition_name(table, month)
+    key = PARTITIONED_TABLES[table][0]
+    bounds = {"start": month, "end": add_months(month, 1)}
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL;", (name,))
+    if cur.fetchone()[0]:
+        return False
+
+    default = sql.Identifier(f"{table}_default")
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL;", (f"{table}_default",))
+    default_has_rows = False
+    if cur.fetchone()[0]:
+        cur.execute(sql.SQL("SELECT EXISTS (SELECT 1 FROM {} WHERE {} >= %(start)s AND {} < %(end)s);").format(
+            default, sql.Identifier(key), sql.Identifier(key)), bounds)
+        default_has_rows = cur.fetchone()[0]
+
+    if default_has_rows:
+        # Writes to a partition do not fire the parent's statement triggers, so summaries are untouched
+        cur.execute(sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS);").format(
+            sql.Identifier(name), sql.Identifier(parent)))
+        cur.execute(sql.SQL("""
+            WITH moved AS (DELETE FROM {default} WHERE {key} >= %(start)s AND {key} < %(end)s RETURNING *)
+            INSERT INTO {name} SELECT * FROM moved;
+        """).format(default=default, key=sql.Identifier(key), name=sql.Identifier(name)), bounds)
+        cur.execute(sql.SQL("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM (%(start)s) TO (%(end)s);").format(
+            sql.Identifier(parent), sql.Identifier(name)), bounds)
+    else:
+        cur.execute(sql.SQL("CREATE TABLE {} PARTITION OF {} FOR VALUES FROM (%(start)s) TO (%(end)s);").format(
+            sql.Identifier(name), sql.Identifier(parent)), bounds)
+    return True
+
+def ensure_partitions(cur, table, first_month, last_month, parent=None):
+    """
+    Makes sure a partitioned table has a default partition and a partition for every month in
+    [first_month, last_month]. Does nothing for an unpartitioned table. Returns the number created.
+    """
+    parent = parent or table
+    if not is_partitioned(cur, parent):
+        return 0
+    cur.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF {} DEFAULT;").format(
+        sql.Identifier(f"{table}_default"), sql.Identifier(parent)))
+    created = 0
+    month = month_start(first_month)
+    while month <= last_month:
+        created += create_month_partition(cur, table, month, parent)
+        month = add_months(month, 1)
+    return created
+
+def list_month_partitions(cur, table):
+    """
+    Returns [(month, partition name)] for the monthly partitions of a table, oldest first.
+    """
+    cur.execute("""
+        SELECT c.relname::TEXT
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        ORDER BY 1;
+    """, (table,))
+    partitions = []
+    for (name,) in cur.fetchall():
+        suffix = name[len(table) + 1:]
+        try:
+            partitions.append((datetime.datetime.strptime(suffix, "%Y_%m").date(), name))
+        except ValueError:
+            continue  # the default partition
+    return partitions
+
+def create_order_id_registry(cur, orders_table="orders"):
+    """
+    Keeps order_id unique across the partitions of `orders_table`, whose primary key has to include
+    order_date: triggers mirror its order IDs into order_id_registry, whose primary key rejects a
+    duplicate (concurrent inserts included). A new registry is filled from the table's current rows.
+    """
+    cur.execute("SELECT to_regclass('order_id_registry') IS NULL;")
+    if cur.fetchone()[0]:
+        cur.execute("CREATE TABLE order_id_registry (order_id INT PRIMARY KEY);")
+        rebuild_order_id_registry(cur, orders_table)
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION register_order_ids()
+        RETURNS TRIGGER AS $$
+        DECLARE
+            detail TEXT;
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                TRUNCATE order_id_registry;
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO order_id_registry SELECT order_id FROM new_orders;
+            ELSIF TG_OP = 'DELETE' THEN
+                DELETE FROM order_id_registry WHERE order_id IN (SELECT order_id FROM old_orders);
+            ELSE
+                -- only changed IDs; an order moving to another month keeps its ID
+                DELETE FROM order_id_registry
+                WHERE order_id IN (SELECT order_id FROM old_orders EXCEPT SELECT order_id FROM new_orders);
+                INSERT INTO order_id_registry
+                SELECT order_id FROM new_orders EXCEPT SELECT order_id FROM old_orders;
+            END IF;
+            RETURN NULL;
+        EXCEPTION WHEN unique_violation THEN
+            GET STACKED DIAGNOSTICS detail = PG_EXCEPTION_DETAIL;
+            RAISE EXCEPTION 'duplicate order_id in table "%"', TG_TABLE_NAME
+                USING ERRCODE = 'unique_violation', DETAIL = detail;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for event, transition_tables in (("INSERT", "NEW TABLE AS new_orders"),
+                                     ("UPDATE", "OLD TABLE AS old_orders NEW TABLE AS new_orders"),
+                                     ("DELETE", "OLD TABLE AS old_orders")):
+        cur.execute(sql.SQL("""
+            CREATE OR REPLACE TRIGGER {}
+            AFTER {} ON {}
+            REFERENCING {}
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION register_order_ids();
+        """).format(sql.Identifier(f"orders_register_ids_{event.lower()}"), sql.SQL(event),
+                    sql.Identifier(orders_table), sql.SQL(transition_tables)))
+    cur.execute(sql.SQL("""
+        CREATE OR REPLACE TRIGGER orders_register_ids_truncate
+        AFTER TRUNCATE ON {}
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION register_order_ids();
+    """).format(sql.Identifier(orders_table)))
+
+def rebuild_order_id_registry(cur, orders_table="orders"):
+    """
+    Recomputes order_id_registry from the order IDs in `orders_table` (fails on a duplicate ID).
+    """
+    cur.execute("TRUNCATE order_id_registry;")
+    cur.execute(sql.SQL("INSERT INTO order_id_registry SELECT order_id FROM {};").format(sql.Identifier(orders_table)))
+
+def create_order_reference_triggers(cur):
+    """
+    Enforces order_items.order_id and payments.order_id -> orders.order_id (with ON DELETE CASCADE)
+    using statement-level triggers, because a foreign key cannot reference a partitioned orders table.
+    The order ID registry keeps order_id unique, so these references and partition removal can key
+    on order_id alone.
+    """
+    create_order_id_registry(cur)
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION check_order_references()
+        RETURNS TRIGGER AS $$
+        DECLARE
+            missing_order_id INT;
+        BEGIN
+            -- Lock the referenced orders the way a foreign key check does
+            PERFORM 1 FROM orders WHERE order_id IN (SELECT order_id FROM new_rows) FOR KEY SHARE;
+            SELECT n.order_id INTO missing_order_id
+            FROM new_rows n
+            WHERE n.order_id IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM orders o WHERE o.order_id = n.order_id)
+            LIMIT 1;
+            IF FOUND THEN
+                RAISE EXCEPTION 'insert or update on table "%" violates its reference to orders', TG_TABLE_NAME
+                    USING ERRCODE = 'foreign_key_violation',
+                          DETAIL = format('Key (order_id)=(%s) is not present in table "orders".', missing_order_id);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION cascade_order_deletes()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                -- DELETE rather than TRUNCATE: the same statement may already be truncating these tables
+                DELETE FROM order_items WHERE order_id IS NOT NULL;
+                DELETE FROM payments WHERE order_id IS NOT NULL;
+            ELSE
+                DELETE FROM order_items WHERE order_id IN (SELECT order_id FROM old_orders);
+                DELETE FROM payments WHERE order_id IN (SELECT order_id FROM old_orders);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for table in ("order_items", "payments"):
+        for event in ("INSERT", "UPDATE"):
+            cur.execute(sql.SQL("""
+                CREATE OR REPLACE TRIGGER {}
+                AFTER {} ON {}
+                REFERENCING NEW TABLE AS new_rows
+                FOR EACH STATEMENT
+                EXECUTE FUNCTION check_order_references();
+            """).format(sql.Identifier(f"{table}_order_reference_{event.lower()}"), sql.SQL(event), sql.Identifier(table)))
+    cur.execute("""
+        CREATE OR REPLACE TRIGGER orders_cascade_delete
+        AFTER DELETE ON orders
+        REFERENCING OLD TABLE AS old_orders
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION cascade_order_deletes();
+    """)
+    cur.execute("""
+        CREATE OR REPLACE TRIGGER orders_cascade_truncate
+        AFTER TRUNCATE ON orders
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION cascade_order_deletes();
+    """)
+
+def create_migration_change_log(cur, table):
+    """
+    Creates <table>_migration_log and triggers on `table` that record the keys of every row inserted,
+    updated (old and new keys) or deleted from now on, for replay_migration_changes.
+    """
+    key, id_column = PARTITIONED_TABLES[table]
+    ident = {"table": sql.Identifier(table), "log": sql.Identifier(f"{table}_migration_log"),
+             "function": sql.Identifier(f"log_{table}_migration_changes"),
+             "key": sql.Identifier(key), "id": sql.Identifier(id_column)}
+    cur.execute(sql.SQL("""
+        CREATE TABLE IF NOT EXISTS {log} (
+            log_id BIGINT GENERATED ALWAYS AS IDENTITY,
+            row_id INT NOT NULL,
+            row_key DATE NOT NULL
+        );
+    """).format(**ident))
+    cur.execute(sql.SQL("""
+        CREATE OR REPLACE FUNCTION {function}()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                INSERT INTO {log} (row_id, row_key) SELECT {id}, {key} FROM old_rows;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                INSERT INTO {log} (row_id, row_key) SELECT {id}, {key} FROM new_rows;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """).format(**ident))
+    for event, transition_tables in (("INSERT", "NEW TABLE AS new_rows"),
+                                     ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+                                     ("DELETE", "OLD TABLE AS old_rows")):
+        cur.execute(sql.SQL("""
+            CREATE OR REPLACE TRIGGER {trigger}
+            AFTER {event} ON {table}
+            REFERENCING {transition_tables}
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION {function}();
+        """).format(trigger=sql.Identifier(f"{table}_migration_log_{event.lower()}"), event=sql.SQL(event),
+                    transition_tables=sql.SQL(transition_tables), **ident))
+
+def replay_migration_changes(cur, table, new_table):
+    """
+    Takes the keys logged in <table>_migration_log and re-copies those rows from `table` into
+    `new_table` (deleted rows just disappear). Returns the number of keys replayed.
+    """
+    key, id_column = PARTITIONED_TABLES[table]
+    ident = {"old": sql.Identifier(table), "new": sql.Identifier(new_table), "log": sql.Identifier(f"{table}_migration_log"),
+             "key": sql.Identifier(key), "id": sql.Identifier(id_column)}
+    # Claim the logged keys in one statement: a change committed meanwhile stays in the log for the next pass
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS migration_keys (row_id INT, row_key DATE) ON COMMIT DROP;")
+    cur.execute(sql.SQL("""
+        WITH logged AS (DELETE FROM {log} RETURNING row_id, row_key)
+        INSERT INTO migration_keys SELECT DISTINCT row_id, row_key FROM logged;
+    """).format(**ident))
+    replayed = cur.rowcount
+    if replayed:
+        cur.execute(sql.SQL("DELETE FROM {new} n USING migration_keys k WHERE n.{id} = k.row_id AND n.{key} = k.row_key;").format(**ident))
+        cur.execute(sql.SQL("""
+            INSERT INTO {new}
+            SELECT o.* FROM {old} o JOIN migration_keys k ON o.{id} = k.row_id AND o.{key} = k.row_key;
+        """).format(**ident))
+    cur.execute("TRUNCATE migration_keys;")
+    return replayed
+
+def migrate_to_partitioned(conn, table, batch_rows=PARTITION_MIGRATION_BATCH_ROWS):
+    """
+    Converts an existing orders or payments table into a monthly range-partitioned table.
+    Rows are copied in committed keyset batches (resumable: a rerun continues after the last copied
+    key) while a change log records the keys written meanwhile. The logged rows are replayed until
+    few are left, then a short final transaction locks the old table, replays the rest and swaps
+    the tables. The old table is kept as <table>_unpartitioned.
+    """
+    key, id_column = PARTITIONED_TABLES[table]
+    new_table = f"{table}_partitioned"
+    ident = {"old": sql.Identifier(table), "new": sql.Identifier(new_table),
+             "key": sql.Identifier(key), "id": sql.Identifier(id_column)}
+    try:
+        cur = conn.cursor()
+        if is_partitioned(cur, table):
+            print(f"✅ {table} is already partitioned.")
+            return
+        cur.execute(sql.SQL("""
+            CREATE TABLE IF NOT EXISTS {new} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            PARTITION BY RANGE ({key});
+        """).format(**ident))
+        cur.execute("SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p');", (new_table,))
+        if not cur.fetchone()[0]:
+            cur.execute(sql.SQL("ALTER TABLE {new} ADD PRIMARY KEY ({id}, {key});").format(**ident))
+        if table == "orders":
+            # order_id must stay unique once the primary key includes order_date; registering IDs
+            # during the copy keeps that work out of the final lock
+            create_order_id_registry(cur, new_table)
+        # Foreign keys from the old table move over while the new table is still empty: checking them row
+        # by row during the copy keeps their validation out of the final lock (a partitioned table cannot
+        # take a NOT VALID foreign key to validate later)
+        cur.execute("""
+            SELECT conname::TEXT, pg_get_constraintdef(oid) FROM pg_constraint c
+            WHERE conrelid = to_regclass(%s) AND contype = 'f'
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint n WHERE n.conrelid = to_regclass(%s) AND n.conname = c.conname);
+        """, (table, new_table))
+        for name, definition in cur.fetchall():
+            cur.execute(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} " + definition.replace("%", "%%") + ";").format(
+                ident["new"], sql.Identifier(name)))
+        cur.execute(sql.SQL("SELECT MIN({key}), MAX({key}) FROM {old};").format(**ident))
+        first_day, last_day = cur.fetchone()
+        this_month = month_start(datetime.date.today())
+        first_month = min(month_start(first_day), this_month) if first_day else this_month
+        last_month = max(month_start(last_day), this_month) if last_day else this_month
+        ensure_partitions(cur, table, first_month, add_months(last_month, PARTITION_PREMAKE_MONTHS), parent=new_table)
+        # From here on every write to the old table logs its keys, so the copy may miss nothing
+        create_migration_change_log(cur, table)
+        conn.commit()
+
+        # Copy in keyset batches, each in its own transaction
+        cur.execute(sql.SQL("SELECT COALESCE(MAX({id}), -2147483648) FROM {new};").format(**ident))
+        last_id = cur.fetchone()[0]
+        started = time.perf_counter()
+        copied = 0
+        while True:
+            cur.execute(sql.SQL("""
+                WITH batch AS (
+                    INSERT INTO {new}
+                    SELECT * FROM {old} WHERE {id} > %s ORDER BY {id} LIMIT %s
+                    RETURNING {id}
+                )
+                SELECT MAX({id}), COUNT(*) FROM batch;
+            """).format(**ident), (last_id, batch_rows))
+            batch_last_id, batch_count = cur.fetchone()
+            conn.commit()
+            if not batch_count:
+                break
+            last_id = batch_last_id
+            copied += batch_count
+            print(f"{table}: {copied:,} rows copied ({copied / max(time.perf_counter() - started, 1e-9):,.0f} rows/sec)")
+
+        # Catch up on the changes logged during the copy while writers still run
+        while True:
+            replayed = replay_migration_changes(cur, table, new_table)
+            conn.commit()
+            if replayed < batch_rows:
+                break
+
+        # Final swap: block writers, replay only what was logged since the last pass, rename
+        cur.execute(sql.SQL("LOCK TABLE {old} IN EXCLUSIVE MODE;").format(**ident))
+        replay_migration_changes(cur, table, new_table)
+
+        # References *to* orders become triggers
+        cur.execute("""
+            SELECT conrelid::regclass::TEXT, conname::TEXT FROM pg_constraint
+            WHERE confrelid = to_regclass(%s) AND contype = 'f';
+        """, (table,))
+        for referencing_table, name in cur.fetchall():
+            cur.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT {};").format(sql.Identifier(referencing_table), sql.Identifier(name)))
+
+        # The old table keeps its data but loses its triggers; its indexes are renamed out of the way
+        cur.execute("SELECT tgname::TEXT FROM pg_trigger WHERE tgrelid = to_regclass(%s) AND NOT tgisinternal;", (table,))
+        for (trigger,) in cur.fetchall():
+            cur.execute(sql.SQL("DROP TRIGGER {} ON {};").format(sql.Identifier(trigger), ident["old"]))
+        cur.execute("SELECT indexrelid::regclass::TEXT FROM pg_index WHERE indrelid = to_regclass(%s);", (table,))
+        for (index,) in cur.fetchall():
+            cur.execute(sql.SQL("ALTER INDEX {} RENAME TO {};").format(sql.Identifier(index), sql.Identifier(f"{index}_unpartitioned"[:63])))
+        cur.execute(sql.SQL("ALTER TABLE {old} RENAME TO {};").format(sql.Identifier(f"{table}_unpartitioned"), **ident))
+        cur.execute(sql.SQL("ALTER TABLE {new} RENAME TO {old};").format(**ident))
+        cur.execute(sql.SQL("ALTER INDEX {} RENAME TO {};").format(sql.Identifier(f"{new_table}_pkey"), sql.Identifier(f"{table}_pkey")))
+        if is_partitioned(cur, "orders"):
+            create_order_reference_triggers(cur)
+        cur.execute("SELECT to_regproc('notify_report_invalidation');")
+        if cur.fetchone()[0] and table in REPORT_CACHE_TABLES:
+            create_report_invalidation_triggers(cur)
+        cur.execute(sql.SQL("DROP TABLE {}; DROP FUNCTION {}();").format(
+            sql.Identifier(f"{table}_migration_log"), sql.Identifier(f"log_{table}_migration_changes")))
+        conn.commit()
+        cur.close()
+        print(f"✅ {table} migrated to monthly partitions ({copied:,} rows copied in batches); "
+              f"the old table is kept as {table}_unpartitioned.")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error migrating {table} to partitions: {e}")
+        return
+
+    # Rebuild indexes, views and the order summaries' triggers on the new table
+    create_indexes(conn)
+    create_views(conn)
+
+def maintain_partitions(conn, premake_months=PARTITION_PREMAKE_MONTHS, retention_months=None, drop=False):
+    """
+    Pre-creates partitions up to premake_months ahead, moves rows out of the default partition into
+    monthly partitions, and with retention_months detaches (or, with drop=True, drops) partitions
+    older than that. Removing order partitions also removes their order items and payments and
+    subtracts them from the revenue summaries, all in one transaction per partition.
+    """
+    this_month = month_start(datetime.date.today())
+    try:
+        cur = conn.cursor()
+        for table, (key, _) in PARTITIONED_TABLES.items():
+            if not is_partitioned(cur, table):
+                print(f"{table} is not partitioned; skipping.")
+                continue
+            created = ensure_partitions(cur, table, this_month, add_months(this_month, premake_months))
+            cur.execute(sql.SQL("SELECT DISTINCT date_trunc('month', {})::DATE FROM {} ORDER BY 1;").format(
+                sql.Identifier(key), sql.Identifier(f"{table}_default")))
+            for (month,) in cur.fetchall():
+                created += create_month_partition(cur, table, month)
+            conn.commit()
+            print(f"✅ {table}: {created} partitions created")
+
+            if retention_months is None:
+                continue
+            cutoff = add_months(this_month, -retention_months)
+            for month, name in list_month_partitions(cur, table):
+                if month >= cutoff:
+                    break
+                if table == "orders":
+                    subtract_order_partition(cur, name, month)
+                cur.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {};").format(sql.Identifier(table), sql.Identifier(name)))
+                if drop:
+                    cur.execute(sql.SQL("DROP TABLE {};").format(sql.Identifier(name)))
+                conn.commit()
+                print(f"✅ {name} {'dropped' if drop else 'detached'}")
+        cur.close()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error maintaining partitions: {e}")
+
+def subtract_order_partition(cur, partition, month):
+    """
+    Removes an order partition's contribution before it is detached: its order items and payments,
+    its registered order IDs, its store revenue totals and its month in the monthly rollup (DETACH
+    fires no triggers).
+    """
+    partition = sql.Identifier(partition)
+    cur.execute(sql.SQL("DELETE FROM order_items WHERE order_id IN (SELECT order_id FROM {});").format(partition))
+    cur.execute(sql.SQL("DELETE FROM payments WHERE order_id IN (SELECT order_id FROM {});").format(partition))
+    cur.execute(sql.SQL("DELETE FROM order_id_registry WHERE order_id IN (SELECT order_id FROM {});").format(partition))
+    cur.execute("SELECT to_regclass('store_revenue_summary') IS NOT NULL, to_regclass('store_monthly_revenue') IS NOT NULL;")
+    has_summary, has_rollup = cur.fetchone()
+    if has_summary:
+        cur.execute(sql.SQL("""
+            UPDATE store_revenue_summary s
+            SET total_revenue = s.total_revenue - d.total_revenue, order_count = s.order_count - d.order_count
+            FROM (
+                SELECT store_id, SUM(COALESCE(total_amount, 0)) AS total_revenue, COUNT(*) AS order_count
+                FROM {} WHERE store_id IS NOT NULL GROUP BY store_id
+            ) AS d
+            WHERE s.store_id = d.store_id;
+        """).format(partition))
+    if has_rollup:
+        cur.execute("DELETE FROM store_monthly_revenue WHERE month = %s;", (month,))
+
 #================================================= task 4 create triggers =================================================
 
 # Function to create triggers
@@ -193,33 +1676,64 @@ def create_triggers(conn):
     try:
         cur = conn.cursor()
 
-        # 1️⃣ Trigger to prevent orders for out-of-stock products
+        # 1️⃣ Trigger to prevent orders for out-of-stock products: one statement-level reservation per
+        # INSERT, however many line items it carries
         cur.execute("""
-            CREATE OR REPLACE FUNCTION prevent_out_of_stock_orders()
+            CREATE OR REPLACE FUNCTION reserve_stock_for_order_items()
             RETURNS TRIGGER AS $$
+            DECLARE
+                short_product_id INT;
             BEGIN
-                -- Check if there is enough stock
-                IF (SELECT stock FROM products WHERE product_id = NEW.product_id) < NEW.quantity THEN
-                    RAISE EXCEPTION 'Cannot place order: Not enough stock for product ID %', NEW.product_id;
+                -- Lock the products in product_id order so concurrent inserts cannot deadlock. NO KEY
+                -- UPDATE is what the stock UPDATE takes anyway, and unlike FOR UPDATE it does not conflict
+                -- with the KEY SHARE locks the order_items foreign key checks already hold.
+                PERFORM 1 FROM products
+                WHERE product_id IN (SELECT product_id FROM new_items)
+                ORDER BY product_id
+                FOR NO KEY UPDATE;
+
+                -- Reserve the requested quantity per product in one conditional UPDATE; any product it
+                -- could not reserve (stock tracked but too low) rejects the whole statement
+                WITH requested AS (
+                    SELECT product_id, SUM(quantity) AS quantity
+                    FROM new_items
+                    WHERE product_id IS NOT NULL
+                    GROUP BY product_id
+                ), reserved AS (
+                    UPDATE products p
+                    SET stock = p.stock - r.quantity
+                    FROM requested r
+                    WHERE p.product_id = r.product_id AND p.stock >= r.quantity
+                    RETURNING p.product_id
+                )
+                SELECT r.product_id INTO short_product_id
+                FROM requested r
+                JOIN products p ON p.product_id = r.product_id
+                WHERE p.stock IS NOT NULL
+                  AND r.product_id NOT IN (SELECT product_id FROM reserved)
+                ORDER BY r.product_id
+                LIMIT 1;
+
+                IF FOUND THEN
+                    RAISE EXCEPTION 'Cannot place order: Not enough stock for product ID %', short_product_id;
                 END IF;
-
-                -- Reduce stock after successful order placement
-                UPDATE products
-                SET stock = stock - NEW.quantity
-                WHERE product_id = NEW.product_id;
-
-                RETURN NEW;
+                RETURN NULL;
             END;
             $$ LANGUAGE plpgsql;
         """)
 
         cur.execute("""
-            CREATE OR REPLACE TRIGGER check_stock_before_order
-            BEFORE INSERT ON order_items
-            FOR EACH ROW
-            EXECUTE FUNCTION prevent_out_of_stock_orders();
+            CREATE OR REPLACE TRIGGER reserve_stock_after_order_items
+            AFTER INSERT ON order_items
+            REFERENCING NEW TABLE AS new_items
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION reserve_stock_for_order_items();
         """)
 
+        # Replaced by the statement-level reservation above
+        cur.execute("DROP TRIGGER IF EXISTS check_stock_before_order ON order_items;")
+        cur.execute("DROP FUNCTION IF EXISTS prevent_out_of_stock_orders();")
+
         # 2️⃣ Create an audit table for deleted employees
         cur.execute("""
             CREATE TABLE IF NOT EXISTS employee_audit (
@@ -253,6 +1767,13 @@ def create_triggers(conn):
             EXECUTE FUNCTION log_deleted_employee();
         """)
 
+        # 4️⃣ Closure table of the reporting hierarchy, maintained by triggers on employees
+        create_employee_closure(cur)
+        create_employee_change_notifications(cur)
+
+        # 5️⃣ Report cache invalidation: writes to the tables reports read bump a version and NOTIFY
+        create_report_invalidation_triggers(cur)
+
         conn.commit()
         cur.close()
         print("✅ Triggers created successfully!")
@@ -497,7 +2018,7 @@ def insert_sample_data(conn):
             (99, 19, 4, '2024-11-13', 6200.00),
             (100, 20, 5, '2021-04-15', 4900.00)
             
-            ON CONFLICT (order_id) DO NOTHING;
+            ON CONFLICT DO NOTHING;
         """)
 
         conn.commit()
@@ -507,53 +2028,710 @@ def insert_sample_data(conn):
     except Exception as e:
         print(f"❌ Error inserting sample data: {e}")
 
+#================================================= task 19 synthetic data generator =================================================
+
+# Rows per table at scale factor 1; every count scales linearly with the scale factor (like TPC-H SF)
+SYNTHETIC_BASE_ROWS = {
+    "stores": 10,
+    "employees": 2_000,
+    "customers": 15_000,
+    "suppliers": 100,
+    "products": 2_000,
+    "orders": 150_000,  # plus ITEMS_PER_ORDER order_items and one payment per order
+}
+SYNTHETIC_ITEMS_PER_ORDER = 4
+SYNTHETIC_EMPLOYEE_FANOUT = 5  # direct reports per manager in the generated org chart
+SYNTHETIC_CHUNK_ROWS = 100_000
+SYNTHETIC_HISTORY_DAYS = 3 * 365
+SYNTHETIC_FIRST_ORDER_DATE = datetime.date(2022, 1, 1)
+# Tables loaded together; each level only references tables from earlier levels
+SYNTHETIC_LOAD_LEVELS = [["stores", "customers", "suppliers"], ["employees", "products"], ["orders"]]
+
+SYNTHETIC_CITIES = ["Chennai", "Mumbai", "Bengaluru", "New Delhi", "Hyderabad", "Pune", "Ahmedabad", "Jaipur",
+                    "Lucknow", "Chandigarh", "Bhopal", "Indore", "Surat", "Vadodara", "Coimbatore", "Nagpur", "Patna"]
+SYNTHETIC_FIRST_NAMES = ["Anjali", "Vikram", "Sita", "Arun", "Neeraj", "Meena", "Anita", "Ramesh", "Neha", "Kiran",
+                         "Deepak", "Pooja", "Raj", "Manish", "Kavita", "Dev", "Nisha", "Varun", "Ravi", "Priya"]
+SYNTHETIC_LAST_NAMES = ["Nair", "Khanna", "Agarwal", "Dev", "Malhotra", "Reddy", "Joshi", "Singh", "Patel", "Desai",
+                        "Menon", "Iyer", "Gupta", "Sharma", "Rao", "Kumar", "Verma", "Pillai", "Das", "Mehta"]
+SYNTHETIC_CATEGORIES = ["Groceries", "Electronics", "Sports", "Personal Care", "Accessories", "Home Supplies",
+                        "Beverages", "Fitness", "Home Appliances", "Computers", "Stationery", "Kitchen", "Furniture"]
+SYNTHETIC_ROLES = ["Cashier", "Sales Associate", "Stock Clerk"]
+SYNTHETIC_PAYMENT_METHODS = ["Credit Card", "Debit Card", "UPI", "Cash", "Net Banking"]
+
+def synthetic_row_counts(scale_factor):
+    """
+    Returns the number of rows generated per table at a scale factor.
+    """
+    counts = {table: max(1, int(rows * scale_factor)) for table, rows in SYNTHETIC_BASE_ROWS.items()}
+    counts["order_items"] = counts["orders"] * SYNTHETIC_ITEMS_PER_ORDER
+    counts["payments"] = counts["orders"]
+    return counts
+
+def synthetic_product_price(product_id, seed):
+    """
+    Deterministic product price in paise, so order workers can price items without reading products.
+    """
+    return ((product_id * 2654435761 + seed * 97) % 4990 + 10) * 100
+
+def synthetic_employee_level(employee_id):
+    """
+    Depth of an employee in the generated org chart (employee 1 is the root).
+    """
+    level = 0
+    while employee_id > 1:
+        employee_id = (employee_id - 2) // SYNTHETIC_EMPLOYEE_FANOUT + 1
+        level += 1
+    return level
+
+def _synthetic_rows(table, first_id, last_id, counts, seed):
+    """
+    Generates the rows of one chunk as {table: list of tuples}. Each chunk has its own seeded
+    random stream, so the output depends only on (seed, scale factor, chunk).
+    """
+    rng = random.Random(f"{seed}:{table}:{first_id}")
+    ids = range(first_id, last_id + 1)
+    if table == "stores":
+        return {"stores": [(store_id, f"ShopEase Mart - Store {store_id}", rng.choice(SYNTHETIC_CITIES),
+                            min(store_id + 1, counts["employees"])) for store_id in ids]}
+    if table == "employees":
+        rows = []
+        for employee_id in ids:
+            level = synthetic_employee_level(employee_id)
+            role = ["CEO", "Regional Manager", "Manager"][level] if level < 3 else rng.choice(SYNTHETIC_ROLES)
+            rows.append((employee_id, f"{rng.choice(SYNTHETIC_FIRST_NAMES)} {rng.choice(SYNTHETIC_LAST_NAMES)}", role,
+                         (employee_id - 1) % counts["stores"] + 1, 25000 + 80000 // (level + 1) + rng.randrange(10000),
+                         None if employee_id == 1 else (employee_id - 2) // SYNTHETIC_EMPLOYEE_FANOUT + 1))
+        return {"employees": rows}
+    if table == "customers":
+        return {"customers": [(customer_id, f"{rng.choice(SYNTHETIC_FIRST_NAMES)} {rng.choice(SYNTHETIC_LAST_NAMES)}",
+                               f"customer{customer_id}@example.com", f"9{customer_id:010d}", rng.choice(SYNTHETIC_CITIES))
+                              for customer_id in ids]}
+    if table == "suppliers":
+        return {"suppliers": [(supplier_id, f"Supplier {supplier_id}", f"{rng.choice(SYNTHETIC_FIRST_NAMES)} {rng.choice(SYNTHETIC_LAST_NAMES)}",
+                               f"8{supplier_id:010d}", rng.choice(SYNTHETIC_CITIES)) for supplier_id in ids]}
+    if table == "products":
+        return {"products": [(product_id, f"Product {product_id}", rng.choice(SYNTHETIC_CATEGORIES),
+                              f"{synthetic_product_price(product_id, seed) / 100:.2f}", 1_000_000,
+                              rng.randint(1, counts["suppliers"])) for product_id in ids]}
+
+    # orders chunk: orders, their items and one payment each, all priced consistently
+    order_dates = [(SYNTHETIC_FIRST_ORDER_DATE + datetime.timedelta(days=day)).isoformat()
+                   for day in range(SYNTHETIC_HISTORY_DAYS + 4)]
+    orders, order_items, payments = [], [], []
+    for order_id in ids:
+        day = rng.randrange(SYNTHETIC_HISTORY_DAYS)
+        total = 0
+        for item in range(SYNTHETIC_ITEMS_PER_ORDER):
+            product_id = rng.randint(1, counts["products"])
+            quantity = rng.randint(1, 5)
+            price = synthetic_product_price(product_id, seed)
+            total += price * quantity
+            order_items.append(((order_id - 1) * SYNTHETIC_ITEMS_PER_ORDER + item + 1, order_id, product_id, quantity, f"{price / 100:.2f}"))
+        orders.append((order_id, rng.randint(1, counts["customers"]), rng.randint(1, counts["stores"]), order_dates[day], f"{total / 100:.2f}"))
+        payments.append((order_id, order_id, f"{total / 100:.2f}", rng.choice(SYNTHETIC_PAYMENT_METHODS), order_dates[day + rng.randrange(4)]))
+    return {"orders": orders, "order_items": order_items, "payments": payments}
+
+SYNTHETIC_COLUMNS = {
+    "stores": ["store_id", "name", "location", "manager_id"],
+    "employees": ["employee_id", "name", "role", "store_id", "salary", "manager_id"],
+    "customers": ["customer_id", "name", "email", "phone", "city"],
+    "suppliers": ["supplier_id", "name", "contact_person", "phone", "city"],
+    "products": ["product_id", "name", "category", "price", "stock", "supplier_id"],
+    "orders": ["order_id", "customer_id", "store_id", "order_date", "total_amount"],
+    "order_items": ["order_item_id", "order_id", "product_id", "quantity", "price"],
+    "payments": ["payment_id", "order_id", "amount", "payment_method", "payment_date"],
+}
+
+def _generate_synthetic_chunk(table, first_id, last_id, counts, seed):
+    """
+    Worker process entry point: generates one chunk and COPYs it in over its own connection.
+    Triggers and FK checks are skipped (session_replication_role = replica) when the role allows it;
+    the generated data is consistent by construction.
+    """
+    try:
+        conn = psycopg2.connect(**connection_params())  # connect_db() would print a line per worker
+    except psycopg2.Error as e:
+        return table, 0, False, f"could not connect: {str(e).strip()}"
+    try:
+        cur = conn.cursor()
+        try:
+            cur.execute("SET session_replication_role = replica;")
+            fast_path = True
+        except psycopg2.Error:
+            conn.rollback()
+            fast_path = False
+        row_count = 0
+        for target, rows in _synthetic_rows(table, first_id, last_id, counts, seed).items():
+            copy_rows_to_table(cur, rows, target, SYNTHETIC_COLUMNS[target])
+            row_count += len(rows)
+        conn.commit()
+        cur.close()
+        return table, row_count, fast_path, None
+    except Exception as e:
+        conn.rollback()
+        return table, 0, False, str(e).strip()
+    finally:
+        conn.close()
+
+def refresh_derived_tables(conn):
+    """
+    Rebuilds trigger-maintained tables after a load that bypassed triggers.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT to_regclass('store_revenue_summary'), to_regclass('store_monthly_revenue'),
+               to_regclass('employee_closure'), to_regclass('order_id_registry');
+    """)
+    has_summary, has_rollup, has_closure, has_registry = cur.fetchone()
+    if has_summary:
+        rebuild_store_revenue_summary(cur)
+    if has_rollup:
+        rebuild_store_monthly_revenue(cur)
+    if has_closure:
+        rebuild_employee_closure(cur)
+    if has_registry:
+        rebuild_order_id_registry(cur)
+    # The load bypassed the change notifications too; tell hierarchy caches to reload
+    cur.execute("SELECT pg_notify(%s, %s);", (EMPLOYEE_CHANGES_CHANNEL, json.dumps({"op": "RELOAD"})))
+    cur.execute("SELECT to_regproc('notify_report_invalidation');")
+    if cur.fetchone()[0]:
+        invalidate_reports(cur)
+    create_order_sequences(cur)  # new orders are numbered after the generated ones
+    conn.commit()
+    cur.close()
+
+def generate_synthetic_data(conn, scale_factor=1, seed=42, workers=None):
+    """
+    Replaces the data in the core tables with a deterministic, referentially consistent synthetic
+    data set at the given scale factor. Chunks are generated and COPYed in parallel worker processes.
+    """
+    counts = synthetic_row_counts(scale_factor)
+    print(f"\nGenerating SF={scale_factor} (seed {seed}): " + ", ".join(f"{table} {rows:,}" for table, rows in counts.items()))
+    try:
+        cur = conn.cursor()
+        cur.execute("TRUNCATE stores, employees, customers, suppliers, products, orders, order_items, payments CASCADE;")
+        last_day = SYNTHETIC_FIRST_ORDER_DATE + datetime.timedelta(days=SYNTHETIC_HISTORY_DAYS + 3)
+        for table in PARTITIONED_TABLES:
+            ensure_partitions(cur, table, SYNTHETIC_FIRST_ORDER_DATE, last_day)  # no-op unless partitioned
+        conn.commit()
+        cur.close()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error clearing tables before generating data: {e}")
+        return
+
+    started = time.perf_counter()
+    total_rows = 0
+    fast_path = True
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for level in SYNTHETIC_LOAD_LEVELS:
+            futures = []
+            for table in level:
+                # employees go in one COPY so every manager is present when its reports are checked
+                chunk_rows = counts[table] if table == "employees" else SYNTHETIC_CHUNK_ROWS
+                if table == "orders":
+                    chunk_rows = max(1, SYNTHETIC_CHUNK_ROWS // SYNTHETIC_ITEMS_PER_ORDER)
+                for first_id in range(1, counts[table] + 1, chunk_rows):
+                    last_id = min(first_id + chunk_rows - 1, counts[table])
+                    futures.append(pool.submit(_generate_synthetic_chunk, table, first_id, last_id, counts, seed))
+            errors = []
+            for future in as_completed(futures):
+                table, rows, chunk_fast_path, error = future.result()
+                total_rows += rows
+                fast_path = fast_path and chunk_fast_path
+                if error:
+                    errors.append(f"{table}: {error}")
+            if errors:
+                print("❌ Error generating synthetic data:\n" + "\n".join(errors))
+                return
+            print(f"✅ Loaded {', '.join(level)}")
+
+    try:
+        if fast_path:
+            refresh_derived_tables(conn)
+        cur = conn.cursor()
+        cur.execute("ANALYZE stores, employees, customers, suppliers, products, orders, order_items, payments;")
+        conn.commit()
+        cur.close()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error refreshing derived tables: {e}")
+    elapsed = time.perf_counter() - started
+    print(f"✅ Synthetic data generated: {total_rows:,} rows in {elapsed:.1f}s ({total_rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+
 #================================================= task 6 load xlsx to db =================================================
 
+# Rows sent per COPY statement when bulk loading a DataFrame
+COPY_CHUNK_ROWS = 100_000
+# Rows per committed batch when streaming large XLSX files
+STREAM_BATCH_ROWS = 50_000
+
+def table_identifier(table_name):
+    """
+    Builds a safely quoted (optionally schema-qualified) identifier, folding case like unquoted SQL.
+    """
+    return sql.Identifier(*table_name.strip().lower().split('.'))
+
+def copy_from_stdin_query(table_name, columns):
+    """
+    Builds a COPY ... FROM STDIN (CSV) statement for the given table and columns.
+    """
+    return sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+        table_identifier(table_name),
+        sql.SQL(', ').join(sql.Identifier(str(column).strip().lower()) for column in columns)
+    )
+
+def copy_rows_to_table(cursor, rows, table_name, columns):
+    """
+    Streams an iterable of row tuples into a table with a single COPY ... FROM STDIN.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(copy_from_stdin_query(table_name, columns), buffer)
+
+def copy_dataframe_to_table(cursor, df, table_name, chunk_rows=COPY_CHUNK_ROWS):
+    """
+    Streams a DataFrame into a table with COPY ... FROM STDIN, one round trip per chunk.
+    Returns the number of rows copied.
+    """
+    df = df.convert_dtypes()  # keep integer columns with blanks as integers, not floats
+    copy_query = copy_from_stdin_query(table_name, df.columns)
+    for start in range(0, len(df), chunk_rows):
+        buffer = io.StringIO()
+        df.iloc[start:start + chunk_rows].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cursor.copy_expert(copy_query, buffer)
+    return len(df)
+
 # Function to Load XLSX into PostgreSQL
 def load_xlsx_to_db(file_path, table_name, conn):
     cursor = conn.cursor()
     try:
         df = pd.read_excel(file_path)
-        for _, row in df.iterrows():
-            columns = ', '.join(df.columns)
-            values = ', '.join(['%s'] * len(row))
-            insert_query = f"INSERT INTO {table_name} ({columns}) VALUES ({values})"
-            cursor.execute(insert_query, tuple(row))
+        started = time.perf_counter()
+        row_count = copy_dataframe_to_table(cursor, df, table_name)
         conn.commit()
+        elapsed = time.perf_counter() - started
         print(f"Data loaded successfully into {table_name} from {file_path}")
+        print(f"{row_count} rows in {elapsed:.2f}s ({row_count / max(elapsed, 1e-9):,.0f} rows/sec)")
     except Exception as e:
+        conn.rollback()
         print(f"Error loading XLSX: {e}")
     finally:
         cursor.close()
         
-#================================================= task 7 display employee hierarchy =================================================
+def iter_xlsx_rows(file_path, sheet_name=None):
+    """
+    Yields the rows of a sheet (header first) using openpyxl read-only mode, so memory stays flat.
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.active
+        for row in sheet.iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+def copy_xlsx_in_batches(file_path, table_name, conn, batch_rows=STREAM_BATCH_ROWS, start_batch=0, sheet_name=None, progress=None):
+    """
+    Streams an XLSX sheet into a table in fixed-size batches, committing after every batch.
+    progress (a dict) is updated with the next batch number and the rows loaded; errors propagate.
+    """
+    progress = {} if progress is None else progress
+    progress.update(batch=start_batch, rows=0)
+    cursor = conn.cursor()
+    try:
+        rows = iter_xlsx_rows(file_path, sheet_name)
+        # keep each named header's cell index so a blank header cell doesn't shift the data left
+        header = [(index, str(column).strip()) for index, column in enumerate(next(rows)) if column is not None]
+        indexes = [index for index, _ in header]
+        columns = [column for _, column in header]
+        rows_to_skip = start_batch * batch_rows  # already committed by a previous run
+        batch = []
+
+        for row in rows:
+            values = tuple(row[index] if index < len(row) else None for index in indexes)
+            if all(value is None for value in values):
+                continue  # blank rows at the end of a sheet
+            if rows_to_skip:
+                rows_to_skip -= 1
+                continue
+            batch.append(values)
+            if len(batch) >= batch_rows:
+                copy_rows_to_table(cursor, batch, table_name, columns)
+                conn.commit()
+                progress["batch"] += 1
+                progress["rows"] += len(batch)
+                batch = []
+
+        if batch:
+            copy_rows_to_table(cursor, batch, table_name, columns)
+            conn.commit()
+            progress["batch"] += 1
+            progress["rows"] += len(batch)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return progress
+
+def load_xlsx_to_db_streaming(file_path, table_name, conn, batch_rows=STREAM_BATCH_ROWS, start_batch=0, sheet_name=None):
+    """
+    Streams a large XLSX sheet into a table with constant memory, committing fixed-size batches.
+    Returns the number of the next batch to load; pass it back as start_batch to resume a failed load.
+    """
+    progress = {}
+    started = time.perf_counter()
+    try:
+        copy_xlsx_in_batches(file_path, table_name, conn, batch_rows, start_batch, sheet_name, progress)
+        elapsed = time.perf_counter() - started
+        print(f"Data loaded successfully into {table_name} from {file_path}")
+        print(f"{progress['rows']} rows in {progress['batch'] - start_batch} batches, {elapsed:.2f}s ({progress['rows'] / max(elapsed, 1e-9):,.0f} rows/sec)")
+    except Exception as e:
+        print(f"Error loading XLSX: {e}")
+        print(f"{progress['batch']} batches are committed; resume with start batch {progress['batch']}.")
+    return progress["batch"]
+
+#================================================= task 15 parallel workbook loader =================================================
+
+def get_fk_dependencies(conn, tables):
+    """
+    Reads the foreign keys between the given tables from the catalog (the schema built by create_tables).
+    Returns {table: set of parent tables}; self-references such as employees.manager_id are ignored.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT DISTINCT child.relname, parent.relname
+        FROM pg_constraint con
+        JOIN pg_class child ON child.oid = con.conrelid
+        JOIN pg_class parent ON parent.oid = con.confrelid
+        WHERE con.contype = 'f'
+          AND con.conrelid <> con.confrelid
+          AND pg_table_is_visible(child.oid)
+          AND child.relname = ANY(%s)
+          AND parent.relname = ANY(%s);
+    """, (list(tables), list(tables)))
+    dependencies = {table: set() for table in tables}
+    for child, parent in cur.fetchall():
+        dependencies[child].add(parent)
+    cur.close()
+    return dependencies
+
+def fk_load_levels(dependencies):
+    """
+    Orders tables into levels so that every table only references tables from earlier levels.
+    Tables within one level are independent of each other and can be loaded in parallel.
+    """
+    remaining = {table: set(parents) for table, parents in dependencies.items()}
+    levels = []
+    while remaining:
+        ready = sorted(table for table, parents in remaining.items() if not parents)
+        if not ready:
+            raise ValueError(f"Circular foreign keys between tables: {', '.join(sorted(remaining))}")
+        levels.append(ready)
+        for table in ready:
+            del remaining[table]
+        for parents in remaining.values():
+            parents.difference_update(ready)
+    return levels
+
+def discover_load_sources(paths, conn):
+    """
+    Maps tables to the XLSX sources that feed them: a sheet named after a table, or a
+    single-sheet file named after a table (e.g. orders.xlsx). Returns {table: [(file_path, sheet_name)]}.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT relname FROM pg_class WHERE relkind IN ('r', 'p') AND pg_table_is_visible(oid);")
+    known_tables = {row[0] for row in cur.fetchall()}
+    cur.close()
+
+    sources = {}
+    for path in paths:
+        workbook = load_workbook(path, read_only=True)
+        sheet_names = workbook.sheetnames
+        workbook.close()
+        matched = [sheet for sheet in sheet_names if sheet.strip().lower() in known_tables]
+        for sheet in matched:
+            sources.setdefault(sheet.strip().lower(), []).append((path, sheet))
+        file_table = os.path.splitext(os.path.basename(path))[0].strip().lower()
+        if not matched and file_table in known_tables:
+            sources.setdefault(file_table, []).append((path, None))
+        elif not matched:
+            print(f"⚠️ Skipping {path}: no sheet or file name matches a table.")
+    return sources
+
+def _load_source_worker(file_path, sheet_name, table_name):
+    """
+    Worker process entry point: loads one sheet over its own connection.
+    """
+    try:
+        conn = psycopg2.connect(**connection_params())  # connect_db() would print a line per worker
+    except psycopg2.Error as e:
+        return table_name, file_path, sheet_name, 0, f"could not connect: {str(e).strip()}"
+    progress = {}
+    try:
+        copy_xlsx_in_batches(file_path, table_name, conn, sheet_name=sheet_name, progress=progress)
+        return table_name, file_path, sheet_name, progress["rows"], None
+    except Exception as e:
+        return table_name, file_path, sheet_name, progress.get("rows", 0), f"{str(e).strip()} (resume with start batch {progress.get('batch', 0)})"
+    finally:
+        conn.close()
+
+def load_workbooks_parallel(paths, conn, workers=None):
+    """
+    Loads sheets/files into their tables in foreign-key order. Tables in the same dependency
+    level are loaded concurrently by worker processes, each with its own connection.
+    """
+    try:
+        sources = discover_load_sources(paths, conn)
+        if not sources:
+            print("No sheets or files matching a table were found.")
+            return
+        levels = fk_load_levels(get_fk_dependencies(conn, sources))
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error planning the workbook load: {e}")
+        return
+
+    started = time.perf_counter()
+    total_rows = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for level_number, level in enumerate(levels, start=1):
+            print(f"\nLevel {level_number}: {', '.join(level)}")
+            futures = [pool.submit(_load_source_worker, file_path, sheet_name, table)
+                       for table in level for file_path, sheet_name in sources[table]]
+            failed = False
+            for future in as_completed(futures):
+                table, file_path, sheet_name, rows, error = future.result()
+                source = f"{file_path}" + (f" [{sheet_name}]" if sheet_name else "")
+                total_rows += rows
+                if error:
+                    failed = True
+                    print(f"❌ {table} from {source}: {error}")
+                else:
+                    print(f"✅ {table} from {source}: {rows} rows")
+            if failed:
+                skipped = [table for later in levels[level_number:] for table in later]
+                if skipped:
+                    print(f"Skipping dependent tables: {', '.join(skipped)}")
+                break
+
+    elapsed = time.perf_counter() - started
+    print(f"\nLoaded {total_rows} rows in {elapsed:.2f}s ({total_rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+        
+#================================================= task 23 order placement =================================================
+
+# Order placement benchmark: orders placed per batch size, line items per order
+ORDER_BENCHMARK_BATCH_SIZES = (1, 100, 10_000)
+ORDER_BENCHMARK_ORDERS = 10_000
+ORDER_BENCHMARK_ITEMS_PER_ORDER = 4
+
+# One statement per batch: number the orders and items from sequences, price items from products,
+# compute each order's total, and insert both tables (the stock trigger runs once for all items)
+PLACE_ORDERS_QUERY = """
+    WITH new_orders AS (
+        SELECT o.idx, nextval('orders_order_id_seq')::INT AS order_id, o.customer_id, o.store_id,
+               COALESCE(o.order_date, CURRENT_DATE) AS order_date
+        FROM unnest(%(customer_ids)s::INT[], %(store_ids)s::INT[], %(order_dates)s::DATE[])
+             WITH ORDINALITY AS o(customer_id, store_id, order_date, idx)
+    ), new_items AS (
+        SELECT n.order_id, i.product_id, i.quantity, p.price
+        FROM unnest(%(item_orders)s::INT[], %(product_ids)s::INT[], %(quantities)s::INT[]) AS i(idx, product_id, quantity)
+        JOIN new_orders n ON n.idx = i.idx
+        LEFT JOIN products p ON p.product_id = i.product_id
+    ), inserted_orders AS (
+        INSERT INTO orders (order_id, customer_id, store_id, order_date, total_amount)
+        SELECT n.order_id, n.customer_id, n.store_id, n.order_date, COALESCE(t.total_amount, 0)
+        FROM new_orders n
+        LEFT JOIN (
+            SELECT order_id, SUM(quantity * price) AS total_amount FROM new_items GROUP BY order_id
+        ) AS t ON t.order_id = n.order_id
+    ), inserted_items AS (
+        INSERT INTO order_items (order_item_id, order_id, product_id, quantity, price)
+        SELECT nextval('order_items_order_item_id_seq')::INT, order_id, product_id, quantity, price
+        FROM new_items
+    )
+    SELECT order_id FROM new_orders ORDER BY idx;
+"""
+
+def create_order_sequences(cur):
+    """
+    Creates the sequences that number new orders and order items, and moves them past the
+    highest IDs already in use (e.g. after sample data or a bulk load).
+    """
+    cur.execute("""
+        CREATE SEQUENCE IF NOT EXISTS orders_order_id_seq AS INT;
+        CREATE SEQUENCE IF NOT EXISTS order_items_order_item_id_seq AS INT;
+        SELECT setval('orders_order_id_seq', GREATEST(
+            (SELECT COALESCE(MAX(order_id), 0) + 1 FROM orders),
+            (SELECT CASE WHEN is_called THEN last_value + 1 ELSE last_value END FROM orders_order_id_seq)), false);
+        SELECT setval('order_items_order_item_id_seq', GREATEST(
+            (SELECT COALESCE(MAX(order_item_id), 0) + 1 FROM order_items),
+            (SELECT CASE WHEN is_called THEN last_value + 1 ELSE last_value END FROM order_items_order_item_id_seq)), false);
+    """)
+
+def place_orders(conn, batch, commit=True):
+    """
+    Places a batch of orders in one round trip and returns their new order IDs, in batch order.
+    Each order is a dict with customer_id, store_id, an optional order_date and items, a list of
+    (product_id, quantity) pairs or {"product_id", "quantity"} dicts. Prices come from products and
+    totals are computed by the server. The whole batch fails if any product is out of stock.
+    """
+    params = {"customer_ids": [], "store_ids": [], "order_dates": [], "item_orders": [], "product_ids": [], "quantities": []}
+    for idx, order in enumerate(batch, start=1):
+        params["customer_ids"].append(order["customer_id"])
+        params["store_ids"].append(order.get("store_id"))
+        params["order_dates"].append(order.get("order_date"))
+        for item in order.get("items", []):
+            product_id, quantity = (item["product_id"], item["quantity"]) if isinstance(item, dict) else item
+            params["item_orders"].append(idx)
+            params["product_ids"].append(product_id)
+            params["quantities"].append(quantity)
+
+    cur = conn.cursor()
+    try:
+        for attempt in range(2):
+            cur.execute("SAVEPOINT place_orders;")
+            try:
+                cur.execute(PLACE_ORDERS_QUERY, params)
+                order_ids = [order_id for (order_id,) in cur.fetchall()]
+                cur.execute("RELEASE SAVEPOINT place_orders;")
+                break
+            except (psycopg2.errors.UniqueViolation, psycopg2.errors.UndefinedTable):
+                # IDs were inserted behind the sequences' back (or they do not exist yet): resync, retry once
+                cur.execute("ROLLBACK TO SAVEPOINT place_orders;")
+                if attempt:
+                    raise
+                create_order_sequences(cur)
+        if commit:
+            conn.commit()
+        return order_ids
+    except Exception:
+        if commit:
+            conn.rollback()
+        raise
+    finally:
+        cur.close()
 
-def display_employee_hierarchy(conn):
+def remove_placed_orders(conn, order_ids):
+    """
+    Deletes orders (and, by cascade, their items) and gives their reserved stock back.
     """
-    Displays the hierarchical reporting structure of employees using a recursive CTE.
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE products p
+        SET stock = p.stock + returned.quantity
+        FROM (
+            SELECT product_id, SUM(quantity) AS quantity
+            FROM order_items WHERE order_id = ANY(%s) GROUP BY product_id
+        ) AS returned
+        WHERE p.product_id = returned.product_id;
+    """, (order_ids,))
+    cur.execute("DELETE FROM orders WHERE order_id = ANY(%s);", (order_ids,))
+    conn.commit()
+    cur.close()
+
+def benchmark_place_orders(conn, batch_sizes=ORDER_BENCHMARK_BATCH_SIZES, total_orders=ORDER_BENCHMARK_ORDERS,
+                           items_per_order=ORDER_BENCHMARK_ITEMS_PER_ORDER):
+    """
+    Measures place_orders throughput (orders/sec) at each batch size, committing every batch.
+    The benchmark orders are removed and their stock returned after each run.
     """
     try:
         cur = conn.cursor()
+        cur.execute("SELECT customer_id FROM customers ORDER BY customer_id LIMIT 1000;")
+        customer_ids = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT store_id FROM stores ORDER BY store_id;")
+        store_ids = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT product_id FROM products WHERE stock IS NULL OR stock >= %s ORDER BY product_id LIMIT 1000;",
+                    (total_orders * items_per_order * 3,))
+        product_ids = [row[0] for row in cur.fetchall()]
+        create_order_sequences(cur)
+        conn.commit()
+        cur.close()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error preparing the order placement benchmark: {e}")
+        return
+    if not (customer_ids and store_ids and product_ids):
+        print("❌ Need customers, stores and well-stocked products to benchmark order placement (try menu option 19).")
+        return
+
+    rng = random.Random(42)
+    orders = [{"customer_id": rng.choice(customer_ids), "store_id": rng.choice(store_ids),
+               "items": [(rng.choice(product_ids), rng.randint(1, 3)) for _ in range(items_per_order)]}
+              for _ in range(total_orders)]
+    print(f"\nPlacing {total_orders:,} orders ({items_per_order} items each), one commit per batch:")
+    for batch_size in batch_sizes:
+        order_ids = []
+        started = time.perf_counter()
+        try:
+            for chunk in iter_chunks(orders, batch_size):
+                order_ids.extend(place_orders(conn, chunk))
+            elapsed = time.perf_counter() - started
+            print(f"Batch size {batch_size:>6,}: {total_orders / elapsed:>10,.0f} orders/sec "
+                  f"({-(-total_orders // batch_size):,} round trips, {elapsed:.2f}s)")
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ Batch size {batch_size:,}: {e}")
+        finally:
+            remove_placed_orders(conn, order_ids)
 
-        #  -- Recursive CTE to get the employee hierarchy (USER PROVIDED QUERY)
-        cur.execute("""
-            WITH RECURSIVE EmployeeHierarchy AS (
-                -- Anchor member: Select the CEO (manager_id is NULL)
-                SELECT employee_id, name, role, manager_id, 0 AS level
-                FROM Employees
-                WHERE manager_id IS NULL
-
-                UNION ALL
-
-                -- Recursive member: Join with Employees to find subordinates
-                SELECT e.employee_id, e.name, e.role, e.manager_id, eh.level + 1 AS level
-                FROM Employees e
-                JOIN EmployeeHierarchy eh ON e.manager_id = eh.employee_id
-            )
-            SELECT *
-            FROM EmployeeHierarchy
-            ORDER BY level, employee_id;
-        """)
+#================================================= task 7 display employee hierarchy =================================================
+
+def display_employee_hierarchy(conn, root_id=None, cache=None):
+    """
+    Displays the hierarchical reporting structure of employees (everyone under a top-level manager,
+    or only the subtree under root_id) from the employee_closure table, without recursion.
+    Before create_triggers has built that table it falls back to a recursive CTE.
+    With an EmployeeHierarchyCache it is rendered from memory instead.
+    """
+    cur = None
+    if cache is not None:
+        try:
+            tree = cache.render(root_id)
+            if not tree:
+                print("No employees found or hierarchy could not be determined.")
+                return
+            print("\nEmployee Hierarchy:")
+            print("--------------------")
+            print(tree)
+        except Exception as e:
+            print(f"❌ Error displaying employee hierarchy: {e}")
+        return
+
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT to_regclass('employee_closure') IS NOT NULL;")
+        if cur.fetchone()[0]:
+            # One closure row per (top-level manager or root_id, employee); its depth is the employee's level
+            cur.execute("""
+                SELECT e.employee_id, e.name, e.role, e.manager_id, c.depth AS level
+                FROM employee_closure c
+                JOIN employees r ON r.employee_id = c.ancestor_id
+                JOIN employees e ON e.employee_id = c.descendant_id
+                WHERE (%(root_id)s::INT IS NULL AND r.manager_id IS NULL) OR c.ancestor_id = %(root_id)s
+                ORDER BY level, employee_id;
+            """, {"root_id": root_id})
+        else:
+            cur.execute("""
+                WITH RECURSIVE EmployeeHierarchy AS (
+                    SELECT employee_id, name, role, manager_id, 0 AS level
+                    FROM Employees
+                    WHERE (%(root_id)s::INT IS NULL AND manager_id IS NULL) OR employee_id = %(root_id)s
+
+                    UNION ALL
+
+                    SELECT e.employee_id, e.name, e.role, e.manager_id, eh.level + 1 AS level
+                    FROM Employees e
+                    JOIN EmployeeHierarchy eh ON e.manager_id = eh.employee_id
+                )
+                SELECT *
+                FROM EmployeeHierarchy
+                ORDER BY level, employee_id;
+            """, {"root_id": root_id})
 
         results = cur.fetchall()
 
@@ -575,91 +2753,626 @@ def display_employee_hierarchy(conn):
     finally:
         if cur:
             cur.close()
-            
-            
-#================================================= task 8 display monthly sales pivot crosstab =================================================
 
-def display_monthly_sales_pivot_crosstab(conn):
+#================================================= task 24 employee hierarchy closure table =================================================
+
+def create_employee_closure(cur):
+    """
+    Creates employee_closure (one row per ancestor/descendant pair, including each employee with
+    itself at depth 0) and the triggers on employees that keep it current, then fills it.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS employee_closure (
+            ancestor_id INT NOT NULL,
+            descendant_id INT NOT NULL,
+            depth INT NOT NULL,
+            PRIMARY KEY (ancestor_id, descendant_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_employee_closure_descendant
+        ON employee_closure (descendant_id) INCLUDE (ancestor_id, depth);
+    """)
+
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION link_employee_subtree(subtree_root INT, new_manager INT)
+        RETURNS VOID AS $$
+            -- Every ancestor of the manager (and the manager) becomes an ancestor of the whole subtree
+            INSERT INTO employee_closure (ancestor_id, descendant_id, depth)
+            SELECT up.ancestor_id, down.descendant_id, up.depth + down.depth + 1
+            FROM employee_closure up
+            JOIN employee_closure down ON down.ancestor_id = subtree_root
+            WHERE up.descendant_id = new_manager
+            ON CONFLICT (ancestor_id, descendant_id) DO NOTHING;
+        $$ LANGUAGE sql;
+    """)
+
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION maintain_employee_closure()
+        RETURNS TRIGGER AS $$
+        DECLARE
+            child INT;
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                DELETE FROM employee_closure;
+                RETURN NULL;
+            END IF;
+
+            IF TG_OP = 'DELETE' THEN
+                -- Reports were already detached by the manager_id ON DELETE SET NULL update
+                DELETE FROM employee_closure WHERE ancestor_id = OLD.employee_id OR descendant_id = OLD.employee_id;
+                RETURN NULL;
+            END IF;
+
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO employee_closure VALUES (NEW.employee_id, NEW.employee_id, 0)
+                ON CONFLICT (ancestor_id, descendant_id) DO NOTHING;
+                -- Adopt reports that arrived before their manager (e.g. later in the same bulk insert)
+                FOR child IN
+                    SELECT e.employee_id FROM employees e
+                    WHERE e.manager_id = NEW.employee_id AND e.employee_id <> NEW.employee_id
+                      AND EXISTS (SELECT 1 FROM employee_closure WHERE ancestor_id = e.employee_id AND descendant_id = e.employee_id)
+                LOOP
+                    PERFORM link_employee_subtree(child, NEW.employee_id);
+                END LOOP;
+                IF NEW.manager_id IS NOT NULL THEN
+                    PERFORM link_employee_subtree(NEW.employee_id, NEW.manager_id);
+                END IF;
+                RETURN NULL;
+            END IF;
+
+            -- UPDATE
+            IF NEW.employee_id <> OLD.employee_id THEN
+                UPDATE employee_closure SET ancestor_id = NEW.employee_id WHERE ancestor_id = OLD.employee_id;
+                UPDATE employee_closure SET descendant_id = NEW.employee_id WHERE descendant_id = OLD.employee_id;
+            END IF;
+            IF NEW.manager_id IS NOT DISTINCT FROM OLD.manager_id THEN
+                RETURN NULL;
+            END IF;
+            IF EXISTS (SELECT 1 FROM employee_closure WHERE ancestor_id = NEW.employee_id AND descendant_id = NEW.manager_id) THEN
+                RAISE EXCEPTION 'Employee % cannot report to % (it would create a reporting cycle)', NEW.employee_id, NEW.manager_id;
+            END IF;
+            -- Detach the subtree from its old ancestors, then hang it under the new manager
+            DELETE FROM employee_closure c
+            USING employee_closure sub
+            WHERE sub.ancestor_id = NEW.employee_id
+              AND c.descendant_id = sub.descendant_id
+              AND c.ancestor_id NOT IN (SELECT descendant_id FROM employee_closure WHERE ancestor_id = NEW.employee_id);
+            IF NEW.manager_id IS NOT NULL THEN
+                PERFORM link_employee_subtree(NEW.employee_id, NEW.manager_id);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    cur.execute("""
+        CREATE OR REPLACE TRIGGER employee_closure_insert
+        AFTER INSERT ON employees
+        FOR EACH ROW
+        EXECUTE FUNCTION maintain_employee_closure();
+    """)
+    cur.execute("""
+        CREATE OR REPLACE TRIGGER employee_closure_update
+        AFTER UPDATE OF employee_id, manager_id ON employees
+        FOR EACH ROW
+        EXECUTE FUNCTION maintain_employee_closure();
+    """)
+    cur.execute("""
+        CREATE OR REPLACE TRIGGER employee_closure_delete
+        AFTER DELETE ON employees
+        FOR EACH ROW
+        EXECUTE FUNCTION maintain_employee_closure();
+    """)
+    cur.execute("""
+        CREATE OR REPLACE TRIGGER employee_closure_truncate
+        AFTER TRUNCATE ON employees
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION maintain_employee_closure();
+    """)
+
+    rebuild_employee_closure(cur)
+
+def rebuild_employee_closure(cur):
+    """
+    Replaces employee_closure with a full recompute from employees (one recursive pass).
+    Employees are locked against writes until the caller commits.
+    """
+    cur.execute("LOCK TABLE employees IN SHARE MODE;")
+    cur.execute("DELETE FROM employee_closure;")
+    cur.execute("""
+        INSERT INTO employee_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE paths AS (
+            SELECT employee_id AS ancestor_id, employee_id AS descendant_id, 0 AS depth
+            FROM employees
+            UNION ALL
+            SELECT p.ancestor_id, e.employee_id, p.depth + 1
+            FROM paths p
+            JOIN employees e ON e.manager_id = p.descendant_id
+        ) CYCLE descendant_id SET is_cycle USING path
+        SELECT ancestor_id, descendant_id, depth FROM paths WHERE NOT is_cycle;
+    """)
+
+def get_subtree(conn, employee_id, max_depth=None):
+    """
+    Returns (employee_id, name, role, manager_id, depth) for an employee and everyone under them,
+    nearest first, optionally limited to max_depth levels below them.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT e.employee_id, e.name, e.role, e.manager_id, c.depth
+        FROM employee_closure c
+        JOIN employees e ON e.employee_id = c.descendant_id
+        WHERE c.ancestor_id = %(employee_id)s AND (%(max_depth)s::INT IS NULL OR c.depth <= %(max_depth)s)
+        ORDER BY c.depth, e.employee_id;
+    """, {"employee_id": employee_id, "max_depth": max_depth})
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+def get_ancestors(conn, employee_id):
+    """
+    Returns (employee_id, name, role, distance) for the chain of managers above an employee,
+    direct manager first.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT e.employee_id, e.name, e.role, c.depth
+        FROM employee_closure c
+        JOIN employees e ON e.employee_id = c.ancestor_id
+        WHERE c.descendant_id = %s AND c.depth > 0
+        ORDER BY c.depth;
+    """, (employee_id,))
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+def get_employee_depth(conn, employee_id):
+    """
+    Returns an employee's level below the top of their reporting chain (0 for a top-level manager),
+    or None for an unknown employee.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT MAX(depth) FROM employee_closure WHERE descendant_id = %s;", (employee_id,))
+    depth = cur.fetchone()[0]
+    cur.close()
+    return depth
+
+def get_headcount_per_manager(conn, manager_ids=None):
+    """
+    Returns (manager_id, direct_reports, total_headcount) for every manager, or only the given ones.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT ancestor_id, COUNT(*) FILTER (WHERE depth = 1), COUNT(*) - 1
+        FROM employee_closure
+        WHERE %(manager_ids)s::INT[] IS NULL OR ancestor_id = ANY(%(manager_ids)s::INT[])
+        GROUP BY ancestor_id
+        HAVING COUNT(*) > 1
+        ORDER BY ancestor_id;
+    """, {"manager_ids": list(manager_ids) if manager_ids is not None else None})
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+def task_employee_hierarchy_lookups(conn, employee_id):
     """
-    Displays monthly sales data per store in pivot table format using PostgreSQL's crosstab function.
+    Prints an employee's reporting chain, depth, headcount and direct reports.
     """
     try:
-        cur = conn.cursor()
+        depth = get_employee_depth(conn, employee_id)
+        if depth is None:
+            print(f"No employee with ID {employee_id}.")
+            return
+        print(f"\nEmployee {employee_id} is at level {depth}.")
+        for manager_id, name, role, distance in get_ancestors(conn, employee_id):
+            print(f"{'  ' * distance}↑ {distance}: Employee ID: {manager_id}, Name: {name}, Role: {role}")
+        headcount = get_headcount_per_manager(conn, [employee_id])
+        direct, total = (headcount[0][1], headcount[0][2]) if headcount else (0, 0)
+        print(f"Direct reports: {direct}, total headcount below: {total}")
+        for report_id, name, role, _, _ in get_subtree(conn, employee_id, max_depth=1)[1:]:
+            print(f"  ↓ Employee ID: {report_id}, Name: {name}, Role: {role}")
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error looking up the employee hierarchy: {e}")
 
-        # --- Setup: Create extension and table if they don't exist ---
-        cur.execute("CREATE EXTENSION IF NOT EXISTS tablefunc;")
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS monthly_sales (
-                store_id INT REFERENCES stores(store_id),
-                month TEXT,
-                total_sales DECIMAL(10,2)
-            );
-        """)
-        conn.commit() # Commit after schema changes
-
-        # --- Insert sample data (clearing existing data first for demonstration) ---
-        cur.execute("DELETE FROM monthly_sales;") # Clear existing data for consistent output
-        cur.executemany("""
-            INSERT INTO monthly_sales (store_id, month, total_sales) VALUES (%s, %s, %s);
-        """, [
-            (1, 'Jan', 5000.00), (1, 'Feb', 7000.00), (1, 'Mar', 8000.00),
-            (2, 'Jan', 6000.00), (2, 'Feb', 7500.00), (2, 'Mar', 9000.00)
-        ])
-        conn.commit() # Commit inserted data
-
-        # --- Execute crosstab query ---
-        cur.execute("""
-            SELECT * FROM crosstab(
-                'SELECT store_id, month, total_sales FROM monthly_sales ORDER BY store_id, month',
-                'SELECT DISTINCT month FROM monthly_sales ORDER BY month'
-            )
-            AS pivot_table (
-                store_id INT, Jan DECIMAL(10,2), Feb DECIMAL(10,2), Mar DECIMAL(10,2)
-            );
-        """)
+#================================================= task 25 employee hierarchy cache =================================================
 
-        pivot_results = cur.fetchall()
+# Channel the employees trigger publishes row changes on
+EMPLOYEE_CHANGES_CHANNEL = "employee_changes"
 
-        if not pivot_results:
-            print("No pivoted sales data to display.")
+def create_employee_change_notifications(cur):
+    """
+    Creates the triggers that NOTIFY EMPLOYEE_CHANGES_CHANNEL with each changed employee row
+    (as JSON) once the change commits, so in-process caches can apply it without re-reading the table.
+    """
+    cur.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_employee_change()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                PERFORM pg_notify('{EMPLOYEE_CHANGES_CHANNEL}', json_build_object('op', 'RELOAD')::TEXT);
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('{EMPLOYEE_CHANGES_CHANNEL}', json_build_object('op', 'DELETE', 'employee_id', OLD.employee_id)::TEXT);
+            ELSE
+                IF TG_OP = 'UPDATE' AND NEW.employee_id <> OLD.employee_id THEN
+                    PERFORM pg_notify('{EMPLOYEE_CHANGES_CHANNEL}', json_build_object('op', 'DELETE', 'employee_id', OLD.employee_id)::TEXT);
+                END IF;
+                PERFORM pg_notify('{EMPLOYEE_CHANGES_CHANNEL}', json_build_object(
+                    'op', 'UPSERT', 'employee_id', NEW.employee_id, 'name', NEW.name,
+                    'role', NEW.role, 'manager_id', NEW.manager_id)::TEXT);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    cur.execute("""
+        CREATE OR REPLACE TRIGGER employee_changes_notify
+        AFTER INSERT OR DELETE OR UPDATE OF employee_id, name, role, manager_id ON employees
+        FOR EACH ROW
+        EXECUTE FUNCTION notify_employee_change();
+    """)
+    cur.execute("""
+        CREATE OR REPLACE TRIGGER employee_changes_notify_truncate
+        AFTER TRUNCATE ON employees
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION notify_employee_change();
+    """)
+
+class EmployeeHierarchyCache:
+    """
+    In-memory copy of the employee hierarchy (rows, children per manager and the level of every
+    employee under a top-level manager). It owns an autocommit connection that LISTENs on
+    EMPLOYEE_CHANGES_CHANNEL; render() applies pending notifications to the affected subtrees
+    and otherwise answers without a database round trip.
+    """
+    def __init__(self, conn=None):
+        self.conn = conn or psycopg2.connect(**connection_params())
+        self.conn.autocommit = True
+        self.reloads = 0
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_trigger WHERE tgname = 'employee_changes_notify';")
+            if cur.fetchone() is None:
+                raise RuntimeError("employee change notifications are not set up (create the triggers first)")
+            # Listen before the snapshot: a change committed in between is replayed, and every
+            # notification carries the full row, so applying it twice is harmless
+            cur.execute(sql.SQL("LISTEN {};").format(sql.Identifier(EMPLOYEE_CHANGES_CHANNEL)))
+        self.reload()
+
+    def reload(self):
+        """
+        Replaces the cached tree with the current contents of employees.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT employee_id, name, role, manager_id FROM employees;")
+            rows = cur.fetchall()
+        self.employees = {}
+        self.children = {}
+        self.levels = {}
+        self._rendered = {}
+        for employee_id, name, role, manager_id in rows:
+            self.employees[employee_id] = (name, role, manager_id)
+            self.children.setdefault(manager_id, set()).add(employee_id)
+        self._relevel(self.children.get(None, ()))
+        self.reloads += 1
+
+    def refresh(self):
+        """
+        Applies the change notifications received since the last call and returns how many there were.
+        """
+        self.conn.poll()
+        notifies = [n for n in self.conn.notifies if n.channel == EMPLOYEE_CHANGES_CHANNEL]
+        self.conn.notifies.clear()
+        for notify in notifies:
+            change = json.loads(notify.payload)
+            if change["op"] == "RELOAD":
+                self.reload()
+            elif change["op"] == "DELETE":
+                self._remove(change["employee_id"])
+            else:
+                self._upsert(change["employee_id"], change["name"], change["role"], change["manager_id"])
+        if notifies:
+            self._rendered.clear()
+        return len(notifies)
+
+    def _upsert(self, employee_id, name, role, manager_id):
+        if employee_id in self.employees:
+            self.children.get(self.employees[employee_id][2], set()).discard(employee_id)
+        self.employees[employee_id] = (name, role, manager_id)
+        self.children.setdefault(manager_id, set()).add(employee_id)
+        self._relevel([employee_id])
+
+    def _remove(self, employee_id):
+        if employee_id not in self.employees:
             return
+        self.children.get(self.employees.pop(employee_id)[2], set()).discard(employee_id)
+        # Reports lose their manager (ON DELETE SET NULL); their own UPDATE notifications follow
+        orphans = self.children.pop(employee_id, set())
+        for orphan in orphans:
+            name, role, _ = self.employees[orphan]
+            self.employees[orphan] = (name, role, None)
+        self.children.setdefault(None, set()).update(orphans)
+        self.levels.pop(employee_id, None)
+        self._relevel(orphans)
+
+    def _relevel(self, employee_ids):
+        """
+        Recomputes the levels of the given employees and everyone under them. Employees whose
+        manager is not (yet) known have no level and are left out of renders, like in the database view.
+        """
+        pending = list(employee_ids)
+        seen = set()
+        while pending:
+            employee_id = pending.pop()
+            if employee_id in seen or employee_id not in self.employees:
+                continue
+            seen.add(employee_id)
+            manager_id = self.employees[employee_id][2]
+            if manager_id is None:
+                self.levels[employee_id] = 0
+            elif manager_id in self.levels:
+                self.levels[employee_id] = self.levels[manager_id] + 1
+            else:
+                self.levels.pop(employee_id, None)
+            pending.extend(self.children.get(employee_id, ()))
+
+    def subtree(self, root_id=None):
+        """
+        Returns (employee_id, depth) for everyone under a top-level manager (depth = level), or for
+        root_id and everyone under it (depth relative to root_id), ordered like display_employee_hierarchy.
+        """
+        self.refresh()
+        if root_id is None:
+            return sorted(((e, level) for e, level in self.levels.items()), key=lambda row: (row[1], row[0]))
+        if root_id not in self.employees:
+            return []
+        rows, frontier, depth = [], [root_id], 0
+        while frontier:
+            rows.extend((employee_id, depth) for employee_id in sorted(frontier))
+            frontier = [child for employee_id in frontier for child in self.children.get(employee_id, ())]
+            depth += 1
+        return rows
+
+    def render(self, root_id=None):
+        """
+        Returns the hierarchy as display_employee_hierarchy prints it, cached until the next change.
+        """
+        self.refresh()
+        if root_id not in self._rendered:
+            lines = []
+            for employee_id, level in self.subtree(root_id):
+                name, role, manager_id = self.employees[employee_id]
+                lines.append(f"{'  ' * level}Level {level}: Employee ID: {employee_id}, Name: {name}, Role: {role}, Manager ID: {manager_id}")
+            self._rendered[root_id] = "\n".join(lines)
+        return self._rendered[root_id]
+
+    def wait(self, timeout=None):
+        """
+        Blocks until a change notification arrives (or timeout seconds pass), then applies it.
+        """
+        select.select([self.conn], [], [], timeout)
+        return self.refresh()
+
+    def close(self):
+        self.conn.close()
+
+def watch_employee_hierarchy(root_id=None):
+    """
+    Shows the hierarchy from an EmployeeHierarchyCache and re-renders it from memory whenever an
+    employee change is committed, until interrupted.
+    """
+    try:
+        cache = EmployeeHierarchyCache()
+    except Exception as e:
+        print(f"❌ Error building the employee hierarchy cache: {e}")
+        return
+    try:
+        display_employee_hierarchy(None, root_id, cache)
+        print("\nWatching for employee changes (Ctrl+C to stop)...")
+        while True:
+            changes = cache.wait()
+            if changes:
+                print(f"\n🔄 Applied {changes} employee change(s)")
+                display_employee_hierarchy(None, root_id, cache)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        cache.close()
+
+#================================================= task 8 display monthly sales pivot crosstab =================================================
 
-        # --- Print the pivoted table ---
-        print("\nMonthly Sales per Store (Pivot Table using crosstab):")
-        print("----------------------------------------------------")
-
-        # Header row
-        header_row = ["Store ID", "Jan", "Feb", "Mar"]
-        print("| " + " | ".join(header_row) + " |")
-        print("-" * (len(header_row) * 12 + 5)) # Adjust separator length
-
-        # Data rows
-        for row in pivot_results:
-            store_id, jan_sales, feb_sales, mar_sales = row
-            data_row = [str(store_id), f"{jan_sales:.2f}" if jan_sales else '0.00',
-                        f"{feb_sales:.2f}" if feb_sales else '0.00',
-                        f"{mar_sales:.2f}" if mar_sales else '0.00'] # Handle NULL sales and format
+# Pivot sources: dimension expressions and measure aggregates per table. store_monthly_revenue is the
+# trigger-maintained rollup of orders, used whenever it holds every dimension a pivot asks for
+PIVOT_SOURCES = {
+    "store_monthly_revenue": {
+        "date_column": "month",
+        "dimensions": {
+            "store": "store_id",
+            "month": "month",
+            "quarter": "date_trunc('quarter', month)::DATE",
+            "year": "date_trunc('year', month)::DATE",
+        },
+        "measures": {"revenue": "SUM(revenue)", "orders": "SUM(order_count)"},
+    },
+    "orders": {
+        "date_column": "order_date",
+        "dimensions": {
+            "store": "store_id",
+            "customer": "customer_id",
+            "month": ORDER_MONTH_EXPRESSION,
+            "quarter": "date_trunc('quarter', order_date)::DATE",
+            "year": "date_trunc('year', order_date)::DATE",
+        },
+        "measures": {"revenue": "SUM(COALESCE(total_amount, 0))", "orders": "COUNT(*)"},
+    },
+}
+# Column headers for period dimensions
+PIVOT_LABELS = {
+    "month": lambda value: value.strftime("%Y-%m"),
+    "quarter": lambda value: f"{value.year}-Q{(value.month - 1) // 3 + 1}",
+    "year": lambda value: str(value.year),
+}
+# Above this many pivot columns the pivot is done client-side with pandas instead of one
+# FILTER aggregate per column (PostgreSQL caps a SELECT list at 1664 entries)
+PIVOT_MAX_SQL_COLUMNS = 200
+
+def pivot_source(cur, rows, columns, start=None, end=None):
+    """
+    Returns the PIVOT_SOURCES entry to read: the monthly rollup when it exists and covers both
+    dimensions and the date range at month granularity, otherwise orders.
+    """
+    rollup = PIVOT_SOURCES["store_monthly_revenue"]
+    month_aligned = all(bound is None or bound.day == 1 for bound in (start, end))
+    if rows in rollup["dimensions"] and columns in rollup["dimensions"] and month_aligned:
+        cur.execute("SELECT to_regclass('store_monthly_revenue');")
+        if cur.fetchone()[0]:
+            return "store_monthly_revenue"
+    dimensions = PIVOT_SOURCES["orders"]["dimensions"]
+    if rows not in dimensions or columns not in dimensions:
+        raise ValueError(f"Unknown pivot dimension: choose from {', '.join(dimensions)}")
+    return "orders"
+
+def pivot_date_filter(source, start=None, end=None):
+    """
+    Returns the WHERE clause and parameters restricting a pivot to [start, end).
+    """
+    date_column = PIVOT_SOURCES[source]["date_column"]
+    conditions, params = [], []
+    if start is not None:
+        conditions.append(f"{date_column} >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append(f"{date_column} < %s")
+        params.append(end)
+    return ("WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+def build_pivot_query(source, rows, columns, measure, column_values, start=None, end=None):
+    """
+    Returns the conditional-aggregation pivot query (one FILTER aggregate per column value, in
+    order) and its parameters.
+    """
+    spec = PIVOT_SOURCES[source]
+    aggregate = spec["measures"][measure]
+    column_expression = spec["dimensions"][columns]
+    where, params = pivot_date_filter(source, start, end)
+    pivot_columns = ",\n               ".join(f"{aggregate} FILTER (WHERE {column_expression} = %s)" for _ in column_values)
+    query = f"""
+        SELECT {spec["dimensions"][rows]} AS pivot_row,
+               {pivot_columns}
+        FROM {source}
+        {where}
+        GROUP BY 1
+        ORDER BY 1;
+    """
+    return query, list(column_values) + params
+
+def _pandas_pivot_rows(conn, query, params, column_values, itersize):
+    """
+    Pivots long-form (row, column, value) results, ordered by row, with pandas one chunk at a time.
+    The last row key of each chunk is held back until the next chunk, since its values may continue there.
+    """
+    carry = None
+    for chunk in iter_chunks(stream_query(conn, query, params, itersize=itersize), itersize):
+        frame = pd.DataFrame(chunk, columns=["pivot_row", "pivot_column", "value"])
+        if carry is not None:
+            frame = pd.concat([carry, frame], ignore_index=True)
+        last = frame["pivot_row"].iloc[-1]
+        carry = frame[frame["pivot_row"] == last]
+        yield from _unstack_pivot_frame(frame[frame["pivot_row"] != last], column_values)
+    if carry is not None:
+        yield from _unstack_pivot_frame(carry, column_values)
+
+def _unstack_pivot_frame(frame, column_values):
+    if frame.empty:
+        return
+    wide = frame.pivot(index="pivot_row", columns="pivot_column", values="value").reindex(columns=column_values)
+    wide = wide.astype(object).where(wide.notna(), None)
+    for key, values in zip(wide.index, wide.to_numpy()):
+        yield (key, *values)
+
+def stream_pivot(conn, rows="store", columns="month", measure="revenue", start=None, end=None,
+                 method="auto", itersize=DEFAULT_ITERSIZE):
+    """
+    Pivots a measure ("revenue" or "orders") by two dimensions (store, customer, month, quarter,
+    year) over the orders in [start, end). The pivot columns are the periods or keys present in
+    the data. Returns (column labels, row iterator); rows stream from a server-side cursor.
+    method "sql" pivots with conditional aggregation, "pandas" client-side, "auto" picks by width.
+    """
+    cur = conn.cursor()
+    source = pivot_source(cur, rows, columns, start, end)
+    spec = PIVOT_SOURCES[source]
+    if measure not in spec["measures"]:
+        raise ValueError(f"Unknown pivot measure: choose from {', '.join(spec['measures'])}")
+    where, params = pivot_date_filter(source, start, end)
+    cur.execute(f"""
+        SELECT DISTINCT {spec["dimensions"][columns]}
+        FROM {source}
+        {where}
+        ORDER BY 1;
+    """, params)
+    column_values = [row[0] for row in cur.fetchall() if row[0] is not None]
+    cur.close()
+
+    label = PIVOT_LABELS.get(columns, str)
+    labels = [label(value) for value in column_values]
+    if method == "auto":
+        method = "sql" if len(column_values) <= PIVOT_MAX_SQL_COLUMNS else "pandas"
+    if method == "sql":
+        query, query_params = build_pivot_query(source, rows, columns, measure, column_values, start, end)
+        return labels, stream_query(conn, query, query_params, itersize=itersize)
+    long_form = f"""
+        SELECT {spec["dimensions"][rows]}, {spec["dimensions"][columns]}, ({spec["measures"][measure]})::FLOAT8
+        FROM {source}
+        {where}
+        GROUP BY 1, 2
+        ORDER BY 1;
+    """
+    return labels, _pandas_pivot_rows(conn, long_form, params, column_values, itersize)
+
+def display_monthly_sales_pivot_crosstab(conn, rows="store", columns="month", measure="revenue",
+                                         start=None, end=None, method="auto"):
+    """
+    Displays monthly sales per store (or any pivot stream_pivot supports) as a table with one
+    column per period present in the orders, printing rows as they stream in.
+    """
+    try:
+        labels, pivot_rows = stream_pivot(conn, rows, columns, measure, start, end, method)
+        empty = "0.00" if measure == "revenue" else "0"
+
+        row_count = 0
+        for row in pivot_rows:
+            if not row_count:
+                # --- Print the pivoted table ---
+                print(f"\n{measure.capitalize()} per {rows.capitalize()} by {columns.capitalize()} (Pivot Table):")
+                print("----------------------------------------------------")
+                header_row = [f"{rows.capitalize()} ID"] + labels
+                print("| " + " | ".join(header_row) + " |")
+                print("-" * (len(header_row) * 12 + 5)) # Adjust separator length
+            row_count += 1
+            data_row = [str(row[0])] + [empty if value is None else f"{value:.2f}" if measure == "revenue" else f"{value:.0f}"
+                                        for value in row[1:]] # Handle NULL (no sales in that period) and format
             print("| " + " | ".join(data_row) + " |")
 
-        cur.close()
+        if not row_count:
+            print("No pivoted sales data to display.")
+        conn.commit()
 
     except Exception as e:
-        print(f"❌ Error displaying pivoted sales data using crosstab: {e}")
-    finally:
-        if cur:
-            cur.close()
-            
+        conn.rollback()
+        print(f"❌ Error displaying pivoted sales data: {e}")
+
 #================================================= task 9 display data joins =================================================
 
-def query_data_joins(conn):
+def query_data_joins(conn, itersize=DEFAULT_ITERSIZE):
     """
     Executes and displays results for different types of JOIN queries.
+    Rows are streamed from server-side cursors, so unbounded joins are printed in bounded memory.
     """
     try:
-        cur = conn.cursor()
-
         # 1. INNER JOIN: Customers who have placed orders
-        cur.execute("""
+        print("\n✅ INNER JOIN: Customers with Orders")
+        print("------------------------------------")
+        row_count = 0
+        for row in stream_query(conn, """
             SELECT
                 c.customer_id,
                 c.name AS customer_name,
@@ -669,18 +3382,17 @@ def query_data_joins(conn):
             FROM customers c
             INNER JOIN orders o ON c.customer_id = o.customer_id
             ORDER BY c.customer_id;
-        """)
-        inner_join_results = cur.fetchall()
-        print("\n✅ INNER JOIN: Customers with Orders")
-        print("------------------------------------")
-        if inner_join_results:
-            for row in inner_join_results:
-                print(f"Customer ID: {row[0]}, Name: {row[1]}, Order ID: {row[2]}, Order Date: {row[3]}, Total Amount: {row[4]}")
-        else:
+        """, itersize=itersize):
+            row_count += 1
+            print(f"Customer ID: {row[0]}, Name: {row[1]}, Order ID: {row[2]}, Order Date: {row[3]}, Total Amount: {row[4]}")
+        if not row_count:
             print("No customers found with orders.")
 
         # 2. LEFT JOIN: All customers and their orders (if any)
-        cur.execute("""
+        print("\n✅ LEFT JOIN: All Customers and Orders (if any)")
+        print("-----------------------------------------------")
+        row_count = 0
+        for row in stream_query(conn, """
             SELECT
                 c.customer_id,
                 c.name AS customer_name,
@@ -690,21 +3402,20 @@ def query_data_joins(conn):
             FROM customers c
             LEFT JOIN orders o ON c.customer_id = o.customer_id
             ORDER BY c.customer_id;
-        """)
-        left_join_results = cur.fetchall()
-        print("\n✅ LEFT JOIN: All Customers and Orders (if any)")
-        print("-----------------------------------------------")
-        if left_join_results:
-            for row in left_join_results:
-                order_id_str = str(row[2]) if row[2] else 'No Order' # Handle NULL Order ID
-                order_date_str = str(row[3]) if row[3] else 'N/A' # Handle NULL Order Date
-                total_amount_str = str(row[4]) if row[4] else '0.00' # Handle NULL Total Amount
-                print(f"Customer ID: {row[0]}, Name: {row[1]}, Order ID: {order_id_str}, Order Date: {order_date_str}, Total Amount: {total_amount_str}")
-        else:
+        """, itersize=itersize):
+            row_count += 1
+            order_id_str = str(row[2]) if row[2] else 'No Order' # Handle NULL Order ID
+            order_date_str = str(row[3]) if row[3] else 'N/A' # Handle NULL Order Date
+            total_amount_str = str(row[4]) if row[4] else '0.00' # Handle NULL Total Amount
+            print(f"Customer ID: {row[0]}, Name: {row[1]}, Order ID: {order_id_str}, Order Date: {order_date_str}, Total Amount: {total_amount_str}")
+        if not row_count:
             print("No customer data found.")
 
         # 3. RIGHT JOIN: All orders and their customers (if any - should behave like INNER JOIN here due to data)
-        cur.execute("""
+        print("\n✅ RIGHT JOIN: All Orders and Customers (if any)")
+        print("------------------------------------------------")
+        row_count = 0
+        for row in stream_query(conn, """
             SELECT
                 c.customer_id,
                 c.name AS customer_name,
@@ -714,21 +3425,20 @@ def query_data_joins(conn):
             FROM customers c
             RIGHT JOIN orders o ON c.customer_id = o.customer_id
             ORDER BY o.order_id;
-        """)
-        right_join_results = cur.fetchall()
-        print("\n✅ RIGHT JOIN: All Orders and Customers (if any)")
-        print("------------------------------------------------")
-        if right_join_results:
-            for row in right_join_results:
-                customer_id_str = str(row[0]) if row[0] else 'No Customer' # Handle potential NULL Customer ID (though unlikely with current data)
-                customer_name_str = row[1] if row[1] else 'N/A' # Handle potential NULL customer name
-                print(f"Customer ID: {customer_id_str}, Name: {customer_name_str}, Order ID: {row[2]}, Order Date: {row[3]}, Total Amount: {row[4]}")
-        else:
+        """, itersize=itersize):
+            row_count += 1
+            customer_id_str = str(row[0]) if row[0] else 'No Customer' # Handle potential NULL Customer ID (though unlikely with current data)
+            customer_name_str = row[1] if row[1] else 'N/A' # Handle potential NULL customer name
+            print(f"Customer ID: {customer_id_str}, Name: {customer_name_str}, Order ID: {row[2]}, Order Date: {row[3]}, Total Amount: {row[4]}")
+        if not row_count:
             print("No order data found.")
 
 
         # 4. FULL JOIN: All customers and orders, including unmatched records from both
-        cur.execute("""
+        print("\n✅ FULL JOIN: All Customers and Orders (including unmatched)")
+        print("--------------------------------------------------------")
+        row_count = 0
+        for row in stream_query(conn, """
             SELECT
                 c.customer_id,
                 c.name AS customer_name,
@@ -738,24 +3448,23 @@ def query_data_joins(conn):
             FROM customers c
             FULL JOIN orders o ON c.customer_id = o.customer_id
             ORDER BY c.customer_id, o.order_id;
-        """)
-        full_join_results = cur.fetchall()
-        print("\n✅ FULL JOIN: All Customers and Orders (including unmatched)")
-        print("--------------------------------------------------------")
-        if full_join_results:
-            for row in full_join_results:
-                customer_id_str = str(row[0]) if row[0] else 'No Customer' # Handle NULL Customer ID
-                customer_name_str = row[1] if row[1] else 'N/A' # Handle NULL customer name
-                order_id_str = str(row[2]) if row[2] else 'No Order' # Handle NULL Order ID
-                order_date_str = str(row[3]) if row[3] else 'N/A' # Handle NULL Order Date
-                total_amount_str = str(row[4]) if row[4] else '0.00' # Handle NULL Total Amount
-
-                print(f"Customer ID: {customer_id_str}, Name: {customer_name_str}, Order ID: {order_id_str}, Order Date: {order_date_str}, Total Amount: {total_amount_str}")
-        else:
+        """, itersize=itersize):
+            row_count += 1
+            customer_id_str = str(row[0]) if row[0] else 'No Customer' # Handle NULL Customer ID
+            customer_name_str = row[1] if row[1] else 'N/A' # Handle NULL customer name
+            order_id_str = str(row[2]) if row[2] else 'No Order' # Handle NULL Order ID
+            order_date_str = str(row[3]) if row[3] else 'N/A' # Handle NULL Order Date
+            total_amount_str = str(row[4]) if row[4] else '0.00' # Handle NULL Total Amount
+
+            print(f"Customer ID: {customer_id_str}, Name: {customer_name_str}, Order ID: {order_id_str}, Order Date: {order_date_str}, Total Amount: {total_amount_str}")
+        if not row_count:
             print("No data found for customers or orders.")
 
         # 5. SELF JOIN: Find employees who report to the same manager
-        cur.execute("""
+        print("\n✅ SELF JOIN: Employees under Same Manager")
+        print("------------------------------------------")
+        row_count = 0
+        for row in stream_query(conn, """
             SELECT
                 e1.employee_id AS emp1_id,
                 e1.name AS emp1_name,
@@ -766,24 +3475,17 @@ def query_data_joins(conn):
             INNER JOIN employees e2 ON e1.manager_id = e2.manager_id
             WHERE e1.employee_id != e2.employee_id
             ORDER BY e1.manager_id, e1.employee_id;
-        """)
-        self_join_results = cur.fetchall()
-        print("\n✅ SELF JOIN: Employees under Same Manager")
-        print("------------------------------------------")
-        if self_join_results:
-            for row in self_join_results:
-                print(f"Employee 1 ID: {row[0]}, Employee 1 Name: {row[1]}, Employee 2 ID: {row[2]}, Employee 2 Name: {row[3]}, Manager ID: {row[4]}")
-        else:
+        """, itersize=itersize):
+            row_count += 1
+            print(f"Employee 1 ID: {row[0]}, Employee 1 Name: {row[1]}, Employee 2 ID: {row[2]}, Employee 2 Name: {row[3]}, Manager ID: {row[4]}")
+        if not row_count:
             print("No employees found under the same manager.")
 
-
-        cur.close()
+        conn.commit()  # end the read transaction that held the server-side cursors
 
     except Exception as e:
+        conn.rollback()
         print(f"❌ Error querying data with joins: {e}")
-    finally:
-        if cur:
-            cur.close()
             
 #================================================= task 10 union and union all =================================================
             
@@ -824,23 +3526,312 @@ def task_union_union_all(conn):
         """)
         union_all_results = cur.fetchall()
 
-        print("\n✅ UNION ALL: Combined List of Active and Inactive Orders (All Orders)")
-        print("------------------------------------------------------------------")
-        if union_all_results:
-            for row in union_all_results:
-                print(f"Order ID: {row[0]}, Order Date: {row[1]}, Status: {row[2]}")
+        print("\n✅ UNION ALL: Combined List of Active and Inactive Orders (All Orders)")
+        print("------------------------------------------------------------------")
+        if union_all_results:
+            for row in union_all_results:
+                print(f"Order ID: {row[0]}, Order Date: {row[1]}, Status: {row[2]}")
+        else:
+            print("No order data found to UNION ALL Active and Inactive Orders.")
+
+        cur.close()
+
+    except Exception as e:
+        print(f"❌ Error performing UNION/UNION ALL operations for Task 10: {e}")
+    finally:
+        if cur:
+            cur.close()
+            
+#================================================= task 11 update data =================================================
+# Rows staged and applied per committed transaction by bulk_update
+BULK_UPDATE_CHUNK_ROWS = 100_000
+
+def read_update_frame(source):
+    """
+    Returns a DataFrame of new values from a DataFrame, a CSV file or an XLSX file.
+    """
+    if isinstance(source, pd.DataFrame):
+        return source
+    if str(source).lower().endswith((".xlsx", ".xlsm")):
+        return pd.read_excel(source)
+    return pd.read_csv(source)
+
+def bulk_update(conn, table, key, frame, chunk_rows=BULK_UPDATE_CHUNK_ROWS, fill_nulls_only=False):
+    """
+    Applies per-row values to a table: frame (a DataFrame, or a CSV/XLSX path) has the key
+    column(s) plus the columns to set. Each chunk is COPYed into a temporary staging table
+    typed like the target, applied with one UPDATE ... FROM staging and committed. Rows whose
+    values are already current are not rewritten. With fill_nulls_only only NULL columns are set.
+    Returns {"matched", "unmatched", "updated"} (keys found, keys not found, rows changed).
+    """
+    keys = [key] if isinstance(key, str) else list(key)
+    try:
+        frame = read_update_frame(frame)
+        frame = frame.rename(columns=lambda column: str(column).strip().lower())
+        keys = [column.strip().lower() for column in keys]
+        columns = [column for column in frame.columns if column not in keys]
+        if not columns or any(column not in frame.columns for column in keys):
+            raise ValueError(f"The data needs the key column(s) {', '.join(keys)} and at least one column to update")
+        frame = frame[keys + columns].drop_duplicates(subset=keys, keep="last")  # the last value for a key wins
+
+        target = table_identifier(table)
+        staging = sql.Identifier("bulk_update_staging")
+        key_match = sql.SQL(" AND ").join(sql.SQL("t.{0} = s.{0}").format(sql.Identifier(column)) for column in keys)
+        if fill_nulls_only:
+            assignments = sql.SQL(", ").join(sql.SQL("{0} = COALESCE(t.{0}, s.{0})").format(sql.Identifier(column)) for column in columns)
+        else:
+            assignments = sql.SQL(", ").join(sql.SQL("{0} = s.{0}").format(sql.Identifier(column)) for column in columns)
+        target_columns = sql.SQL(", ").join(sql.SQL("t.{}").format(sql.Identifier(column)) for column in columns)
+        new_columns = sql.SQL(", ").join(
+            sql.SQL("COALESCE(t.{0}, s.{0})" if fill_nulls_only else "s.{0}").format(sql.Identifier(column)) for column in columns)
+
+        totals = {"matched": 0, "unmatched": 0, "updated": 0}
+        started = time.perf_counter()
+        cur = conn.cursor()
+        for start in range(0, len(frame), chunk_rows):
+            chunk = frame.iloc[start:start + chunk_rows]
+            cur.execute(sql.SQL("CREATE TEMP TABLE {} ON COMMIT DROP AS SELECT {} FROM {} WITH NO DATA;").format(
+                staging, sql.SQL(", ").join(sql.Identifier(column) for column in keys + columns), target))
+            copy_dataframe_to_table(cur, chunk, "bulk_update_staging")
+            cur.execute(sql.SQL("ANALYZE {};").format(staging))  # temp tables get no autovacuum statistics
+            cur.execute(sql.SQL("""
+                UPDATE {target} AS t SET {assignments}
+                FROM {staging} AS s
+                WHERE {key_match} AND ({target_columns}) IS DISTINCT FROM ({new_columns});
+            """).format(target=target, assignments=assignments, staging=staging, key_match=key_match,
+                        target_columns=target_columns, new_columns=new_columns))
+            totals["updated"] += cur.rowcount
+            cur.execute(sql.SQL("SELECT COUNT(*) FROM {staging} AS s WHERE NOT EXISTS (SELECT 1 FROM {target} AS t WHERE {key_match});").format(
+                staging=staging, target=target, key_match=key_match))
+            unmatched = cur.fetchone()[0]
+            totals["unmatched"] += unmatched
+            totals["matched"] += len(chunk) - unmatched
+            conn.commit()
+        cur.close()
+
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        print(f"✅ Bulk update of {table}: {totals['matched']:,} keys matched, {totals['unmatched']:,} not found, "
+              f"{totals['updated']:,} rows changed in {elapsed:.2f}s ({len(frame) / elapsed:,.0f} rows/sec)")
+        return totals
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error bulk updating {table}: {e}")
+        return None
+
+# Shipment feed rows staged, applied and committed per micro-batch, and how often a watched
+# feed directory is checked for new files
+SHIPMENT_BATCH_ROWS = 10_000
+SHIPMENT_POLL_SECONDS = 5.0
+SHIPMENT_COLUMNS = ["shipment_id", "product_id", "quantity", "shipment_date"]
+
+def create_shipment_tables(cur):
+    """
+    Creates shipments with an applied_at marker (NULL until the quantity has been added to stock).
+    Rows that predate the marker were already added to stock, so they are marked applied.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS Shipments (
+            shipment_id INT PRIMARY KEY,
+            product_id INT REFERENCES Products(product_id),
+            quantity INT NOT NULL,
+            shipment_date DATE DEFAULT CURRENT_DATE
+        );
+    """)
+    cur.execute("SELECT 1 FROM information_schema.columns WHERE table_name = 'shipments' AND column_name = 'applied_at';")
+    if cur.fetchone() is None:
+        cur.execute("ALTER TABLE shipments ADD COLUMN applied_at TIMESTAMPTZ DEFAULT now();")
+        cur.execute("ALTER TABLE shipments ALTER COLUMN applied_at DROP DEFAULT;")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_shipments_unapplied ON shipments (shipment_id) WHERE applied_at IS NULL;")
+
+def apply_pending_shipments(cur):
+    """
+    Adds every unapplied shipment's quantity to products.stock and marks it applied, in one
+    statement. Products are locked in product_id order, like the stock reservation trigger does.
+    Returns the number of products whose stock changed.
+    """
+    cur.execute("""
+        WITH applied AS (
+            UPDATE shipments SET applied_at = now()
+            WHERE applied_at IS NULL
+            RETURNING product_id, quantity
+        ),
+        totals AS (
+            SELECT product_id, SUM(quantity) AS quantity FROM applied GROUP BY product_id
+        ),
+        locked AS (
+            SELECT p.product_id, t.quantity
+            FROM products p
+            JOIN totals t ON t.product_id = p.product_id
+            ORDER BY p.product_id
+            FOR NO KEY UPDATE OF p
+        )
+        MERGE INTO products p
+        USING locked l ON p.product_id = l.product_id
+        WHEN MATCHED THEN UPDATE SET stock = COALESCE(p.stock, 0) + l.quantity;
+    """)
+    return cur.rowcount
+
+def ingest_shipments(conn, source, batch_rows=SHIPMENT_BATCH_ROWS):
+    """
+    Ingests a shipment feed: a CSV file (header with shipment_id, product_id, quantity and
+    optionally shipment_date), a DataFrame or an iterable of row tuples. Each micro-batch is
+    COPYed into a staging table, deduplicated by shipment_id against itself and every shipment
+    already received, then new shipments are added to stock and committed. Re-ingesting a feed
+    therefore changes nothing. Rows for unknown products are rejected, and so is every row of a
+    shipment_id that arrives with a different product, quantity or date than another row or the
+    shipment already received (a conflict, reported rather than resolved).
+    Returns {"received", "new", "duplicates", "conflicts", "rejected", "products_restocked"}.
+    """
+    try:
+        return _ingest_shipment_batches(conn, source, batch_rows)
+    except Exception as e:
+        if not conn.closed:
+            conn.rollback()
+        print(f"❌ Error ingesting shipments: {e}")
+        return None
+
+def _ingest_shipment_batches(conn, source, batch_rows):
+    """
+    ingest_shipments without the error handling: exceptions propagate, so the feed watcher can
+    tell a lost connection from a bad feed.
+    """
+    totals = {"received": 0, "new": 0, "duplicates": 0, "conflicts": 0, "rejected": 0, "products_restocked": 0}
+    conflicting_ids = []
+    feed = None
+    try:
+        if isinstance(source, pd.DataFrame):
+            frame = source.reindex(columns=SHIPMENT_COLUMNS).convert_dtypes()  # an int column with blanks stays int
+            rows = frame.astype(object).where(frame.notna(), None).itertuples(index=False)
+        elif isinstance(source, (str, os.PathLike)):
+            feed = open(source, newline="")
+            reader = csv.DictReader(feed)
+            rows = ([row.get(column) or None for column in SHIPMENT_COLUMNS] for row in reader)
         else:
-            print("No order data found to UNION ALL Active and Inactive Orders.")
+            rows = source
 
+        cur = conn.cursor()
+        create_shipment_tables(cur)
+        conn.commit()
+        started = time.perf_counter()
+        for batch in iter_chunks(rows, batch_rows):
+            batch = [tuple(row) + (None,) * (len(SHIPMENT_COLUMNS) - len(row)) for row in batch]
+            cur.execute("""
+                CREATE TEMP TABLE shipment_staging (
+                    shipment_id INT, product_id INT, quantity INT, shipment_date DATE
+                ) ON COMMIT DROP;
+            """)
+            copy_rows_to_table(cur, batch, "shipment_staging", SHIPMENT_COLUMNS)
+            cur.execute("""
+                DELETE FROM shipment_staging s
+                WHERE s.shipment_id IS NULL OR s.product_id IS NULL OR s.quantity IS NULL
+                   OR NOT EXISTS (SELECT 1 FROM products p WHERE p.product_id = s.product_id);
+            """)
+            rejected = cur.rowcount
+            # A shipment_id repeated within the batch with different values: no row of it can be trusted
+            cur.execute("""
+                WITH conflicting AS (
+                    SELECT shipment_id FROM shipment_staging
+                    GROUP BY shipment_id
+                    HAVING COUNT(DISTINCT (product_id, quantity)) > 1 OR COUNT(DISTINCT shipment_date) > 1
+                )
+                DELETE FROM shipment_staging s USING conflicting c
+                WHERE s.shipment_id = c.shipment_id
+                RETURNING s.shipment_id;
+            """)
+            conflicts = [row[0] for row in cur.fetchall()]
+            cur.execute("""
+                INSERT INTO shipments (shipment_id, product_id, quantity, shipment_date)
+                SELECT DISTINCT ON (s.shipment_id) s.shipment_id, s.product_id, s.quantity, COALESCE(s.shipment_date, CURRENT_DATE)
+                FROM shipment_staging s
+                ORDER BY s.shipment_id, s.shipment_date NULLS LAST
+                ON CONFLICT (shipment_id) DO NOTHING;
+            """)
+            new = cur.rowcount
+            # Compared after the insert, so a shipment a concurrent ingester just committed is checked too
+            cur.execute("""
+                SELECT s.shipment_id
+                FROM shipment_staging s
+                JOIN shipments r ON r.shipment_id = s.shipment_id
+                WHERE r.product_id <> s.product_id OR r.quantity <> s.quantity OR r.shipment_date <> s.shipment_date;
+            """)
+            conflicts += [row[0] for row in cur.fetchall()]
+            totals["products_restocked"] += apply_pending_shipments(cur)
+            conn.commit()
+            totals["received"] += len(batch)
+            totals["new"] += new
+            totals["rejected"] += rejected
+            totals["conflicts"] += len(conflicts)
+            totals["duplicates"] += len(batch) - new - rejected - len(conflicts)
+            conflicting_ids.extend(sorted(set(conflicts)))
         cur.close()
 
-    except Exception as e:
-        print(f"❌ Error performing UNION/UNION ALL operations for Task 10: {e}")
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        print(f"✅ Shipments ingested: {totals['received']:,} received, {totals['new']:,} new, "
+              f"{totals['duplicates']:,} duplicates skipped, {totals['rejected']:,} rejected, "
+              f"{totals['products_restocked']:,} product stock levels updated ({totals['received'] / elapsed:,.0f} rows/sec)")
+        if conflicting_ids:
+            shown = ", ".join(str(shipment_id) for shipment_id in conflicting_ids[:10])
+            more = f" and {len(conflicting_ids) - 10:,} more" if len(conflicting_ids) > 10 else ""
+            print(f"⚠️ {totals['conflicts']:,} rows rejected: their shipment_id arrived with a different product, "
+                  f"quantity or date (shipment IDs {shown}{more})")
+        return totals
     finally:
-        if cur:
-            cur.close()
-            
-#================================================= task 11 update data =================================================
+        if feed is not None:
+            feed.close()
+
+def watch_shipment_feeds(conn, directory, poll_seconds=SHIPMENT_POLL_SECONDS, batch_rows=SHIPMENT_BATCH_ROWS):
+    """
+    Ingests every finished *.csv feed dropped into directory, oldest first, moving each into
+    directory/processed afterwards (or directory/failed when its data cannot be ingested), and keeps
+    polling for new files until interrupted. Producers should write to a .part or .tmp name and
+    rename it when done; in any case a feed is only picked up once its size and modification time
+    are unchanged since the previous poll. Database errors that may pass (a lost connection, a lock
+    or statement timeout, a deadlock) leave the feed in place to be retried on the next poll, over a
+    new connection if the old one was lost. A feed interrupted half-way is simply ingested again;
+    already received shipments are skipped.
+    """
+    processed = os.path.join(directory, "processed")
+    failed = os.path.join(directory, "failed")
+    os.makedirs(processed, exist_ok=True)
+    os.makedirs(failed, exist_ok=True)
+    print(f"Watching {directory} for shipment feeds (Ctrl+C to stop)...")
+    watch_conn = conn
+    previous = {}  # path -> (size, mtime) at the previous poll
+    try:
+        while True:
+            feeds = sorted((entry for entry in os.scandir(directory) if entry.is_file() and entry.name.lower().endswith(".csv")),
+                           key=lambda entry: entry.stat().st_mtime)
+            current = {feed.path: (feed.stat().st_size, feed.stat().st_mtime_ns) for feed in feeds}
+            for feed in feeds:
+                if previous.get(feed.path) != current[feed.path]:
+                    continue  # new or still being written
+                print(f"\n📦 {feed.name}")
+                try:
+                    if watch_conn.closed:
+                        watch_conn = psycopg2.connect(**connection_params())
+                    _ingest_shipment_batches(watch_conn, feed.path, batch_rows)
+                except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                    if not watch_conn.closed:
+                        watch_conn.rollback()
+                    print(f"⚠️ {feed.name} will be retried: {str(e).strip()}")
+                    break  # the database is unavailable or busy; try again after the next poll
+                except Exception as e:
+                    if not watch_conn.closed:
+                        watch_conn.rollback()
+                    print(f"❌ Error ingesting shipments: {e}")
+                    os.replace(feed.path, os.path.join(failed, feed.name))
+                    print(f"⚠️ {feed.name} moved to {failed}")
+                else:
+                    os.replace(feed.path, os.path.join(processed, feed.name))
+                del current[feed.path]
+            previous = current
+            time.sleep(poll_seconds)
+    except KeyboardInterrupt:
+        print("\nStopped watching shipment feeds.")
+    finally:
+        if watch_conn is not conn:
+            watch_conn.close()
+
 def demonstrate_data_updates(conn):
     """
     Demonstrates data update operations: price increase, salary update, stock update.
@@ -882,18 +3873,13 @@ def demonstrate_data_updates(conn):
         cur.execute("ALTER TABLE Employees ADD COLUMN IF NOT EXISTS hire_date DATE;")
         conn.commit()
 
-        # Update hire_date for employees if it's currently NULL (example dates - adjust as needed)
-        cur.execute("UPDATE Employees SET hire_date = '2016-01-15' WHERE employee_id = 1 AND hire_date IS NULL;")
-        cur.execute("UPDATE Employees SET hire_date = '2021-03-20' WHERE employee_id = 2 AND hire_date IS NULL;")
-        cur.execute("UPDATE Employees SET hire_date = '2022-05-10' WHERE employee_id = 3 AND hire_date IS NULL;")
-        cur.execute("UPDATE Employees SET hire_date = '2019-11-01' WHERE employee_id = 4 AND hire_date IS NULL;")
-        cur.execute("UPDATE Employees SET hire_date = '2023-01-05' WHERE employee_id = 5 AND hire_date IS NULL;")
-        cur.execute("UPDATE Employees SET hire_date = '2018-09-22' WHERE employee_id = 6 AND hire_date IS NULL;")
-        cur.execute("UPDATE Employees SET hire_date = '2022-12-12' WHERE employee_id = 7 AND hire_date IS NULL;")
-        cur.execute("UPDATE Employees SET hire_date = '2017-07-08' WHERE employee_id = 8 AND hire_date IS NULL;")
-        cur.execute("UPDATE Employees SET hire_date = '2021-08-18' WHERE employee_id = 9 AND hire_date IS NULL;")
-        cur.execute("UPDATE Employees SET hire_date = '2020-05-03' WHERE employee_id = 10 AND hire_date IS NULL;")
-        conn.commit()
+        # Set hire_date for employees where it is currently NULL (example dates - adjust as needed)
+        hire_dates = pd.DataFrame({
+            "employee_id": [1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
+            "hire_date": ["2016-01-15", "2021-03-20", "2022-05-10", "2019-11-01", "2023-01-05",
+                          "2018-09-22", "2022-12-12", "2017-07-08", "2021-08-18", "2020-05-03"],
+        })
+        bulk_update(conn, "employees", "employee_id", hire_dates, fill_nulls_only=True)
 
 
         # Before update: Retrieve salaries of eligible employees
@@ -931,30 +3917,17 @@ def demonstrate_data_updates(conn):
         # --- 3. Update product stock based on new supplier shipments. ---
         print("\n--- 3. Update Product Stock based on Shipments ---")
 
-        # Create Shipments table if it doesn't exist
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS Shipments (
-                shipment_id INT PRIMARY KEY,
-                product_id INT REFERENCES Products(product_id),
-                quantity INT NOT NULL,
-                shipment_date DATE DEFAULT CURRENT_DATE
-            );
-        """)
+        # Create Shipments (with its applied marker) if it doesn't exist
+        create_shipment_tables(cur)
         conn.commit()
 
-        # Insert sample shipments (clearing existing data for demonstration)
-        cur.execute("DELETE FROM Shipments;") # Clear existing shipment data
-        cur.executemany("""
-            INSERT INTO Shipments (shipment_id, product_id, quantity) VALUES (%s, %s, %s);
-        """, [
+        sample_shipments = [
             (101, 1, 50),  # 50 more Cotton Kurtas
             (102, 10, 20), # 20 more Mixer Grinders
             (103, 21, 10), # 10 more Smart LED TVs
             (104, 30, 100),# 100 more Wooden Toys
             (105, 40, 25)   # 25 more Basmati Rice
-        ])
-        conn.commit()
-        print("✅ Sample shipments data inserted.")
+        ]
 
 
         # Before update: Retrieve stock levels of affected products
@@ -969,15 +3942,8 @@ def demonstrate_data_updates(conn):
             print(f"Product ID: {row[0]}, Name: {row[1]}, Stock: {row[2]}")
 
 
-        # Perform the stock update using JOIN
-        cur.execute("""
-            UPDATE Products
-            SET stock = Products.stock + Shipments.quantity
-            FROM Shipments
-            WHERE Products.product_id = Shipments.product_id;
-        """)
-        conn.commit()
-        print("✅ Product stock levels updated based on shipments.")
+        # Ingest the shipments: only ones not received before are added to stock, so re-running is safe
+        ingest_shipments(conn, sample_shipments)
 
         # After update: Retrieve updated stock levels of affected products
         cur.execute(f"""
@@ -999,6 +3965,103 @@ def demonstrate_data_updates(conn):
             
 #================================================= task 12 delete data =================================================
             
+# Inactive-customer purge: customers per transaction, and the pause between batches so other
+# sessions get the locks and I/O in between
+PURGE_BATCH_ROWS = int(os.environ.get("SHOPEASE_PURGE_BATCH_ROWS", "1000"))
+PURGE_SLEEP_SECONDS = float(os.environ.get("SHOPEASE_PURGE_SLEEP", "0"))
+# A customer is inactive without an order this recent (anti-join on idx_customer_order_date)
+INACTIVE_CUSTOMER_CONDITION = """
+    NOT EXISTS (
+        SELECT 1 FROM orders o
+        WHERE o.customer_id = c.customer_id AND o.order_date >= CURRENT_DATE - make_interval(years => %(years)s)
+    )
+"""
+
+def purge_inactive_customers(conn, inactive_years=2, batch_size=PURGE_BATCH_ROWS, sleep_seconds=PURGE_SLEEP_SECONDS, dry_run=False):
+    """
+    Deletes customers without an order in the last inactive_years, together with their (older)
+    orders, order items and payments. Customers are taken in customer_id order, batch_size per
+    transaction, deleting payments and order items, then orders, then the customers themselves.
+    That way each table is hit with one set-based DELETE per batch instead of row-by-row cascades,
+    and locks are only held for one batch. With dry_run it only counts what would be deleted.
+    Returns the number of rows deleted (or that would be) per table.
+    """
+    params = {"years": inactive_years}
+    try:
+        cur = conn.cursor()
+        if dry_run:
+            cur.execute(f"""
+                WITH inactive AS (SELECT c.customer_id FROM customers c WHERE {INACTIVE_CUSTOMER_CONDITION}),
+                     inactive_orders AS (SELECT o.order_id FROM orders o JOIN inactive USING (customer_id))
+                SELECT (SELECT COUNT(*) FROM inactive),
+                       (SELECT COUNT(*) FROM inactive_orders),
+                       (SELECT COUNT(*) FROM order_items oi JOIN inactive_orders USING (order_id)),
+                       (SELECT COUNT(*) FROM payments p JOIN inactive_orders USING (order_id));
+            """, params)
+            counts = dict(zip(("customers", "orders", "order_items", "payments"), cur.fetchone()))
+            conn.rollback()
+            print(f"Dry run: {counts['customers']:,} inactive customers (no orders in {inactive_years} years) would be purged "
+                  f"with {counts['orders']:,} orders, {counts['order_items']:,} order items and {counts['payments']:,} payments.")
+            return counts
+
+        totals = {"customers": 0, "orders": 0, "order_items": 0, "payments": 0}
+        last_id = None
+        batches = 0
+        started = time.perf_counter()
+        while True:
+            # Next keyset batch of candidates, locked so no new order can reference them meanwhile
+            cur.execute(f"""
+                SELECT c.customer_id FROM customers c
+                WHERE (%(last_id)s::INT IS NULL OR c.customer_id > %(last_id)s) AND {INACTIVE_CUSTOMER_CONDITION}
+                ORDER BY c.customer_id
+                LIMIT %(batch_size)s
+                FOR UPDATE;
+            """, {**params, "last_id": last_id, "batch_size": batch_size})
+            candidates = [row[0] for row in cur.fetchall()]
+            if not candidates:
+                conn.rollback()
+                break
+            last_id = candidates[-1]
+            # Re-check with a fresh snapshot: an order committed before the locks were granted keeps its customer
+            cur.execute(f"""
+                SELECT c.customer_id FROM customers c
+                WHERE c.customer_id = ANY(%(candidates)s) AND {INACTIVE_CUSTOMER_CONDITION};
+            """, {**params, "candidates": candidates})
+            customer_ids = [row[0] for row in cur.fetchall()]
+
+            cur.execute("""
+                DELETE FROM payments p USING orders o
+                WHERE p.order_id = o.order_id AND o.customer_id = ANY(%s);
+            """, (customer_ids,))
+            totals["payments"] += cur.rowcount
+            cur.execute("""
+                DELETE FROM order_items oi USING orders o
+                WHERE oi.order_id = o.order_id AND o.customer_id = ANY(%s);
+            """, (customer_ids,))
+            totals["order_items"] += cur.rowcount
+            cur.execute("DELETE FROM orders WHERE customer_id = ANY(%s);", (customer_ids,))
+            totals["orders"] += cur.rowcount
+            cur.execute("DELETE FROM customers WHERE customer_id = ANY(%s);", (customer_ids,))
+            totals["customers"] += cur.rowcount
+            conn.commit()
+
+            batches += 1
+            elapsed = max(time.perf_counter() - started, 1e-9)
+            print(f"  batch {batches}: up to customer ID {last_id}, {totals['customers']:,} customers purged "
+                  f"({totals['customers'] / elapsed:,.0f}/sec), {totals['orders']:,} orders, "
+                  f"{totals['order_items']:,} order items, {totals['payments']:,} payments")
+            if sleep_seconds:
+                time.sleep(sleep_seconds)
+
+        cur.close()
+        print(f"✅ {totals['customers']:,} inactive customers purged in {batches} batches "
+              f"({time.perf_counter() - started:.2f}s).")
+        return totals
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error purging inactive customers: {e}")
+        return None
+
 def demonstrate_data_deletion(conn):
     """
     Demonstrates data deletion operations:
@@ -1012,32 +4075,8 @@ def demonstrate_data_deletion(conn):
         # --- 1. Delete inactive customers (who haven’t ordered in the last 2 years). ---
         print("\n--- 1. Delete Inactive Customers (No orders in last 2 years) ---")
 
-        # Before deletion: Count of inactive customers
-        cur.execute("""
-            SELECT COUNT(*)
-            FROM customers
-            WHERE customer_id NOT IN (SELECT DISTINCT customer_id FROM orders WHERE order_date >= CURRENT_DATE - INTERVAL '2 years');
-        """)
-        inactive_customers_count_before = cur.fetchone()[0]
-        print(f"Inactive customers count before deletion: {inactive_customers_count_before}")
-
-        # Perform the deletion of inactive customers
-        cur.execute("""
-            DELETE FROM customers
-            WHERE customer_id NOT IN (SELECT DISTINCT customer_id FROM orders WHERE order_date >= CURRENT_DATE - INTERVAL '2 years');
-        """)
-        deleted_customer_count = cur.rowcount
-        conn.commit()
-        print(f"✅ {deleted_customer_count} inactive customers deleted.")
-
-        # After deletion: Count of inactive customers
-        cur.execute("""
-            SELECT COUNT(*)
-            FROM customers
-            WHERE customer_id NOT IN (SELECT DISTINCT customer_id FROM orders WHERE order_date >= CURRENT_DATE - INTERVAL '2 years');
-        """)
-        inactive_customers_count_after = cur.fetchone()[0]
-        print(f"Inactive customers count after deletion: {inactive_customers_count_after}")
+        # Batched anti-join purge; it reports how many customers it removed as it goes
+        purge_inactive_customers(conn, inactive_years=2)
 
 
         # --- 2. Delete an order and ensure order items are also deleted (Cascading Delete). ---
@@ -1046,7 +4085,7 @@ def demonstrate_data_deletion(conn):
         order_id_to_delete = 1  # Choose an order ID to delete (e.g., Order ID 1)
 
         # Before deletion: Count of order items for the order to be deleted
-        cur.execute("SELECT COUNT(*) FROM order_items WHERE order_id = %s;", (order_id_to_delete,))
+        execute_prepared(cur, "order_item_count", (order_id_to_delete,))
         order_items_count_before = cur.fetchone()[0]
         print(f"Order items count for Order ID {order_id_to_delete} before deletion: {order_items_count_before}")
 
@@ -1057,7 +4096,7 @@ def demonstrate_data_deletion(conn):
         print(f"✅ Order ID {order_id_to_delete} deleted.")
 
         # After deletion: Count of order items for the deleted order (should be 0 due to CASCADE DELETE)
-        cur.execute("SELECT COUNT(*) FROM order_items WHERE order_id = %s;", (order_id_to_delete,))
+        execute_prepared(cur, "order_item_count", (order_id_to_delete,))
         order_items_count_after = cur.fetchone()[0]
         print(f"Order items count for Order ID {order_id_to_delete} after deletion: {order_items_count_after} (Cascade Delete verified)")
 
@@ -1123,7 +4162,7 @@ def demonstrate_stored_procedures(conn):
         cur.callproc('sp_AddCustomer', new_customer_data)
         print(f"✅ Customer '{new_customer_data[0]}' added using sp_AddCustomer.")
 
-        cur.execute("SELECT * FROM customers WHERE name = %s;", (new_customer_data[0],))
+        execute_prepared(cur, "customer_by_name", (new_customer_data[0],))
         added_customer = cur.fetchone()
         print("\nNew customer details:")
         print(f"Customer ID: {added_customer[0]}, Name: {added_customer[1]}, Email: {added_customer[2]}, Phone: {added_customer[3]}, Address: {added_customer[4]}")
@@ -1160,7 +4199,7 @@ def demonstrate_stored_procedures(conn):
         cur.callproc('sp_UpdateCustomer', (customer_id_to_update,) + updated_customer_data)
         print(f"✅ Customer ID {customer_id_to_update} updated using sp_UpdateCustomer.")
 
-        cur.execute("SELECT * FROM customers WHERE customer_id = %s;", (customer_id_to_update,))
+        execute_prepared(cur, "customer_by_id", (customer_id_to_update,))
         updated_customer = cur.fetchone()
         print("\nUpdated customer details:")
         print(f"Customer ID: {updated_customer[0]}, Name: {updated_customer[1]}, Email: {updated_customer[2]}, Phone: {updated_customer[3]}, Address: {updated_customer[4]}")
@@ -1196,7 +4235,7 @@ def demonstrate_stored_procedures(conn):
             print(f"❌ Error calling sp_DeleteCustomer for Customer ID {customer_id_to_delete}: {e}") # Exception expected if customer had active orders
 
 
-        cur.execute("SELECT * FROM customers WHERE customer_id = %s;", (customer_id_to_delete,))
+        execute_prepared(cur, "customer_by_id", (customer_id_to_delete,))
         deleted_customer_check = cur.fetchone()
         print(f"\nCustomer ID {customer_id_to_delete} exists after (attempted) deletion: {'No' if deleted_customer_check is None else 'Yes'}")
 
@@ -1250,14 +4289,14 @@ def demonstrate_stored_procedures(conn):
         product_id_stock_update = 1 # Example product
         stock_to_add = 30
 
-        cur.execute("SELECT stock FROM products WHERE product_id = %s;", (product_id_stock_update,))
+        execute_prepared(cur, "product_stock", (product_id_stock_update,))
         stock_before = cur.fetchone()[0]
         print(f"\nStock for Product ID {product_id_stock_update} before update: {stock_before}")
 
         cur.callproc('sp_AddProductStock', (product_id_stock_update, stock_to_add))
         print(f"✅ Added {stock_to_add} stock for Product ID {product_id_stock_update} using sp_AddProductStock.")
 
-        cur.execute("SELECT stock FROM products WHERE product_id = %s;", (product_id_stock_update,))
+        execute_prepared(cur, "product_stock", (product_id_stock_update,))
         stock_after = cur.fetchone()[0]
         print(f"Stock for Product ID {product_id_stock_update} after update: {stock_after}")
 
@@ -1451,99 +4490,705 @@ def create_stored_procedures(conn):
         if cur:
             cur.close()
 
+#================================================= report result cache (task 14 exports) =================================================
+
+# Channel on which writes to the tables reports read announce themselves (payload: table name)
+REPORT_INVALIDATION_CHANNEL = "report_invalidation"
+# Tables whose writes invalidate cached reports; each also gets a report_version_<table> sequence
+# that is bumped on every write, so entries cached on disk by another process can be validated
+REPORT_CACHE_TABLES = ("orders", "order_items", "customers", "stores", "store_monthly_revenue")
+REPORT_CACHE_TTL_SECONDS = float(os.environ.get("SHOPEASE_REPORT_CACHE_TTL", "300"))
+REPORT_CACHE_MAX_ENTRIES = int(os.environ.get("SHOPEASE_REPORT_CACHE_ENTRIES", "64"))
+# Results with more rows than this are streamed without being cached
+REPORT_CACHE_MAX_ROWS = int(os.environ.get("SHOPEASE_REPORT_CACHE_MAX_ROWS", "1000000"))
+# Directory for the on-disk copy of cached reports (empty: memory only); "off" disables the cache
+REPORT_CACHE_DIR = os.environ.get("SHOPEASE_REPORT_CACHE_DIR", "")
+REPORT_CACHE_MODE = os.environ.get("SHOPEASE_REPORT_CACHE", "on").lower()
+
+def create_report_invalidation_triggers(cur):
+    """
+    Creates the statement-level triggers that bump report_version_<table> and NOTIFY
+    REPORT_INVALIDATION_CHANNEL whenever one of REPORT_CACHE_TABLES is written to. Tables that do not
+    exist yet (the rollup before create_views) get their trigger when they are created.
+    """
+    for table in REPORT_CACHE_TABLES:
+        cur.execute(sql.SQL("CREATE SEQUENCE IF NOT EXISTS {};").format(sql.Identifier(f"report_version_{table}")))
+    cur.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_report_invalidation()
+        RETURNS TRIGGER AS $$
+        DECLARE
+            done TEXT := 'shopease.report_invalidated_' || TG_TABLE_NAME;
+        BEGIN
+            -- Once per table and transaction: later statements of the same transaction add nothing.
+            -- A notifying transaction still commits under PostgreSQL's global NOTIFY lock, so
+            -- concurrent writers to these tables serialize their commits on it.
+            IF current_setting(done, true) IS DISTINCT FROM 'on' THEN
+                PERFORM nextval(format('report_version_%s', TG_TABLE_NAME));
+                PERFORM pg_notify('{REPORT_INVALIDATION_CHANNEL}', TG_TABLE_NAME);
+                PERFORM set_config(done, 'on', true);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for table in REPORT_CACHE_TABLES:
+        cur.execute("SELECT to_regclass(%s);", (table,))
+        if cur.fetchone()[0] is None:
+            continue
+        cur.execute(sql.SQL("""
+            CREATE OR REPLACE TRIGGER report_invalidation
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {}
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION notify_report_invalidation();
+        """).format(sql.Identifier(table)))
+
+def invalidate_reports(cur, tables=REPORT_CACHE_TABLES):
+    """
+    Announces writes that bypassed the triggers (e.g. a load with session_replication_role = replica).
+    """
+    for table in tables:
+        cur.execute("SELECT nextval(%s), pg_notify(%s, %s);", (f"report_version_{table}", REPORT_INVALIDATION_CHANNEL, table))
+
+def _encode_report_value(value):
+    """
+    json.dump default for cached report rows: tags the values JSON has no type for.
+    """
+    if isinstance(value, Decimal):
+        return {"$decimal": str(value)}
+    if isinstance(value, datetime.datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"cannot cache a {type(value).__name__} value")
+
+def _decode_report_value(obj):
+    """
+    json.load object_hook undoing _encode_report_value.
+    """
+    if "$decimal" in obj:
+        return Decimal(obj["$decimal"])
+    if "$datetime" in obj:
+        return datetime.datetime.fromisoformat(obj["$datetime"])
+    if "$date" in obj:
+        return datetime.date.fromisoformat(obj["$date"])
+    return obj
+
+class ReportCache:
+    """
+    Caches report query results (header and rows) keyed by database, query text and parameters: an
+    in-process LRU of max_entries, optionally mirrored to JSON files in `directory`, each entry living
+    at most ttl seconds. Entries name the tables they read; a NOTIFY for one of them (received on the
+    cache's own LISTEN connection) drops them. Entries read back from disk are checked against the
+    report_version_<table> sequences first, since writes may have happened while nobody listened.
+    A writer bumps those sequences before it commits, so a result is only written to disk once every
+    transaction that could have been in flight during its query has ended and been polled for.
+    """
+    def __init__(self, ttl=REPORT_CACHE_TTL_SECONDS, max_entries=REPORT_CACHE_MAX_ENTRIES, directory=REPORT_CACHE_DIR):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.directory = directory or None
+        self.entries = OrderedDict()  # key -> {"tables", "versions", "expires", "header", "rows"}
+        self.pending = {}  # key -> xid horizon: written to disk once every older transaction has ended
+        self.hits = self.misses = 0
+        self.conn = psycopg2.connect(**connection_params())
+        self.conn.autocommit = True
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT to_regproc('notify_report_invalidation');")
+            if cur.fetchone()[0] is None:
+                self.conn.close()
+                raise RuntimeError("report invalidation triggers are not set up (create the triggers first)")
+            cur.execute(sql.SQL("LISTEN {};").format(sql.Identifier(REPORT_INVALIDATION_CHANNEL)))
+            self._sync_channel = f"report_cache_sync_{self.conn.get_backend_pid()}"
+            cur.execute(sql.SQL("LISTEN {};").format(sql.Identifier(self._sync_channel)))
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, query, params=None):
+        # the server and database are part of the key: caches of several databases may share a directory
+        database = (self.conn.info.host, self.conn.info.port, self.conn.info.dbname)
+        return hashlib.sha256(repr((database, query.strip(), params)).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load(self, path):
+        # JSON rather than pickle: loading a pickle from a shared directory could run arbitrary code
+        with open(path, encoding="utf-8") as f:
+            entry = json.load(f, object_hook=_decode_report_value)
+        entry["rows"] = [tuple(row) for row in entry["rows"]]
+        return entry
+
+    def _versions(self, tables):
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT sequencename::TEXT, last_value FROM pg_sequences WHERE sequencename = ANY(%s);",
+                        ([f"report_version_{table}" for table in tables],))
+            return dict(cur.fetchall())
+
+    def _xid_horizon(self):
+        # a fresh transaction ID is above every one assigned so far (a snapshot's xmax may not be)
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT pg_current_xact_id()::TEXT::BIGINT;")
+            return cur.fetchone()[0]
+
+    def poll(self):
+        """
+        Drops the entries that read a table written to since the last poll and writes the pending
+        entries that are safe to keep on disk; returns how many entries were dropped.
+        """
+        ended_below = None
+        if self.pending:
+            # A writer queues its NOTIFY before it commits and the queue is delivered in order, so once
+            # our own marker arrives we have heard from every transaction that had ended when it was sent
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::TEXT::BIGINT, pg_notify(%s, '');",
+                            (self._sync_channel,))
+                ended_below = cur.fetchone()[0]
+        self.conn.poll()
+        notifies = list(self.conn.notifies)
+        self.conn.notifies.clear()
+        tables = {n.payload for n in notifies if n.channel == REPORT_INVALIDATION_CHANNEL}
+        synced = ended_below is not None and any(n.channel == self._sync_channel for n in notifies)
+        ready = [key for key, horizon in self.pending.items() if horizon <= ended_below] if synced else []
+        dropped = self.invalidate(tables) if tables else 0
+        for key in ready:
+            if self.pending.pop(key, None) is not None and key in self.entries:
+                self._write(key, self.entries[key])
+        return dropped
+
+    def invalidate(self, tables=None):
+        """
+        Drops the entries (in memory and on disk) that read any of the tables, or all entries.
+        """
+        stale = [key for key, entry in self.entries.items() if tables is None or set(entry["tables"]) & set(tables)]
+        for key in stale:
+            del self.entries[key]
+            self.pending.pop(key, None)
+        if self.directory:
+            for filename in os.listdir(self.directory):
+                if not filename.endswith(".json"):
+                    continue
+                path = os.path.join(self.directory, filename)
+                if tables is not None and filename[:-len(".json")] not in stale:
+                    try:
+                        if not set(self._load(path)["tables"]) & set(tables):
+                            continue
+                    except (OSError, ValueError, KeyError, TypeError):
+                        pass  # unreadable: drop it
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return len(stale)
+
+    def get(self, query, params=None):
+        """
+        Returns the cached (header, rows) for a query, or None.
+        """
+        self.poll()
+        key = self.key(query, params)
+        entry = self.entries.get(key)
+        if entry is None and self.directory and os.path.exists(self._path(key)):
+            try:
+                entry = self._load(self._path(key))
+            except (OSError, ValueError, KeyError, TypeError):
+                entry = None
+            if entry is not None and self._versions(entry["tables"]) != entry["versions"]:
+                entry = None
+                os.remove(self._path(key))
+        if entry is None or entry["expires"] < time.time():
+            self.entries.pop(key, None)
+            self.misses += 1
+            return None
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry["header"], entry["rows"]
+
+    def put(self, query, params, tables, header, rows, versions=None, xid_horizon=None):
+        """
+        Stores a result. versions are the report_version_<table> values read before the query ran;
+        with an xid_horizon (read after it ran) the disk copy waits for the transactions before it.
+        """
+        key = self.key(query, params)
+        entry = {"tables": tuple(tables), "versions": versions if versions is not None else self._versions(tables),
+                 "expires": time.time() + self.ttl, "header": list(header), "rows": rows}
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            evicted, _ = self.entries.popitem(last=False)
+            self.pending.pop(evicted, None)
+        if self.directory:
+            if xid_horizon is None:
+                self._write(key, entry)
+            else:
+                self.pending[key] = xid_horizon
+
+    def _write(self, key, entry):
+        if entry["expires"] > time.time():
+            partial = self._path(key) + f".{os.getpid()}.tmp"
+            try:
+                with open(partial, "w", encoding="utf-8") as f:
+                    json.dump(entry, f, default=_encode_report_value)
+                os.replace(partial, self._path(key))
+            except TypeError:
+                os.remove(partial)  # a column type JSON cannot hold: keep the entry in memory only
+
+    def rows(self, conn, query, tables, params=None, itersize=DEFAULT_ITERSIZE):
+        """
+        Yields a query's rows from the cache, or streams them from the database (server-side
+        cursor) and caches them if there are at most REPORT_CACHE_MAX_ROWS.
+        """
+        cached = self.get(query, params)
+        if cached is not None:
+            yield from cached[1]
+            return
+        versions = self._versions(tables)  # read first; writers that bumped them but commit later are polled for
+        rows = []
+        for row in stream_query(conn, query, params, itersize=itersize):
+            if rows is not None:
+                rows.append(row)
+                if len(rows) > REPORT_CACHE_MAX_ROWS:
+                    rows = None
+            yield row
+        if rows is not None:
+            self.put(query, params, tables, [column.name for column in describe_query(conn, query, params)], rows,
+                     versions, self._xid_horizon())
+
+    def close(self):
+        if self.conn.closed:
+            return
+        try:
+            self.poll()  # writes the pending entries whose racing writers have ended
+        except psycopg2.Error:
+            pass
+        finally:
+            self.conn.close()
+
+_report_cache = None
+
+def report_cache():
+    """
+    Returns the process-wide ReportCache, or None when it is disabled (SHOPEASE_REPORT_CACHE=off)
+    or the invalidation triggers are missing, in which case reports always query the database.
+    """
+    global _report_cache
+    if REPORT_CACHE_MODE == "off":
+        return None
+    if _report_cache is None or _report_cache.conn.closed:
+        try:
+            _report_cache = ReportCache()
+        except Exception as e:
+            print(f"⚠️ Report cache unavailable ({e}); querying the database directly.")
+            return None
+        atexit.register(_report_cache.close)
+    return _report_cache
+
 #================================================= task 14 data export =================================================            
             
-def get_monthly_revenue_per_store(conn):
+MONTHLY_REVENUE_QUERY = """
+    SELECT r.store_id, s.name AS store_name, r.month, r.revenue::NUMERIC(14,2) AS monthly_revenue
+    FROM store_monthly_revenue r
+    JOIN stores s ON s.store_id = r.store_id
+    WHERE r.order_count > 0
+    ORDER BY r.store_id, r.month;
+"""
+
+CUSTOMER_SPENDING_QUERY = """
+    SELECT
+        c.customer_id,
+        c.name AS customer_name,
+        COALESCE(SUM(o.total_amount), 0)::NUMERIC(14,2) AS total_spending
+    FROM customers c
+    LEFT JOIN orders o ON c.customer_id = o.customer_id
+    GROUP BY c.customer_id, c.name
+    ORDER BY total_spending DESC;
+"""
+
+# Tables each report reads, for ReportCache invalidation
+REPORT_QUERY_TABLES = {
+    MONTHLY_REVENUE_QUERY: ("store_monthly_revenue", "orders", "stores"),  # rebuilds write the rollup without touching orders
+    CUSTOMER_SPENDING_QUERY: ("orders", "customers"),
+}
+
+def get_monthly_revenue_per_store(conn, itersize=DEFAULT_ITERSIZE, cache=None):
+    """
+    Streams monthly revenue per store from the store_monthly_revenue rollup through a server-side cursor,
+    or from a ReportCache when one is given and holds a current result.
+    """
+    if cache is not None:
+        return cache.rows(conn, MONTHLY_REVENUE_QUERY, REPORT_QUERY_TABLES[MONTHLY_REVENUE_QUERY], itersize=itersize)
+    return stream_query(conn, MONTHLY_REVENUE_QUERY, itersize=itersize)
+
+def get_customer_total_spending(conn, itersize=DEFAULT_ITERSIZE, cache=None):
+    """
+    Streams a list of customers and their total spending through a server-side cursor,
+    or from a ReportCache when one is given and holds a current result.
+    """
+    if cache is not None:
+        return cache.rows(conn, CUSTOMER_SPENDING_QUERY, REPORT_QUERY_TABLES[CUSTOMER_SPENDING_QUERY], itersize=itersize)
+    return stream_query(conn, CUSTOMER_SPENDING_QUERY, itersize=itersize)
+
+# Compressed exports get these suffixes appended to the file name
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+def open_export_file(filename, compression=None):
+    """
+    Opens a binary file for writing, optionally through gzip or zstd compression.
     """
-    Retrieves monthly revenue per store from the store_revenue view.
+    if compression in (None, "", "none"):
+        return open(filename, "wb")
+    if compression == "gzip":
+        return gzip.open(filename, "wb", compresslevel=6)
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd compression needs the 'zstandard' package (pip install zstandard)")
+        return zstandard.ZstdCompressor(level=3).stream_writer(open(filename, "wb"))
+    raise ValueError(f"Unknown compression '{compression}'. Choose none, gzip or zstd.")
+
+def copy_query_to_csv(conn, query, filename, compression=None):
     """
+    Streams a query result from PostgreSQL straight into a CSV file with COPY (...) TO STDOUT,
+    bypassing Python row objects entirely. Returns the number of rows written.
+    """
+    copy_query = sql.SQL("COPY ({}) TO STDOUT WITH (FORMAT csv, HEADER)").format(sql.SQL(query.strip().rstrip(";")))
+    cur = conn.cursor()
     try:
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM store_revenue;")
-        results = cur.fetchall()
+        with open_export_file(filename, compression) as export_file:
+            cur.copy_expert(copy_query, export_file, size=1024 * 1024)
+        return cur.rowcount
+    finally:
         cur.close()
-        return results
-    except Exception as e:
-        print(f"❌ Error retrieving monthly revenue per store: {e}")
-        return None
 
-def get_customer_total_spending(conn):
+def export_to_csv(data, filename, header, chunk_rows=DEFAULT_ITERSIZE, compression=None):
     """
-    Retrieves a list of customers and their total spending.
+    Exports data (any iterable of tuples, e.g. a server-side cursor) to a CSV file, chunk by chunk.
+    This pandas path is the fallback for export_query_to_csv. Returns the number of rows written.
     """
     try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT
-                c.customer_id,
-                c.name AS customer_name,
-                COALESCE(SUM(o.total_amount), 0) AS total_spending
-            FROM customers c
-            LEFT JOIN orders o ON c.customer_id = o.customer_id
-            GROUP BY c.customer_id, c.name
-            ORDER BY total_spending DESC;
-        """)
-        results = cur.fetchall()
-        cur.close()
-        return results
+        row_count = 0
+        with io.TextIOWrapper(open_export_file(filename, compression), newline="") as csv_file:
+            for chunk in iter_chunks(data, chunk_rows):
+                pd.DataFrame(chunk, columns=header).to_csv(csv_file, index=False, header=row_count == 0)
+                row_count += len(chunk)
+            if row_count == 0:
+                pd.DataFrame(columns=header).to_csv(csv_file, index=False)
+        print(f"✅ Data exported to CSV file: {filename} ({row_count} rows)")
+        return row_count
     except Exception as e:
-        print(f"❌ Error retrieving customer total spending: {e}")
+        print(f"❌ Error exporting to CSV: {e}")
         return None
 
-def export_to_csv(data, filename, header):
+def export_query_to_csv(conn, query, filename, header, compression=None):
     """
-    Exports data (list of tuples) to a CSV file.
+    Exports a query to CSV with the native COPY TO STDOUT engine, falling back to the
+    pandas exporter if COPY fails. Returns the number of rows written.
     """
+    filename += COMPRESSION_SUFFIXES.get(compression, "")
+    started = time.perf_counter()
     try:
-        df = pd.DataFrame(data, columns=header)
-        df.to_csv(filename, index=False)
-        print(f"✅ Data exported to CSV file: {filename}")
-    except Exception as e:
+        row_count = copy_query_to_csv(conn, query, filename, compression)
+        conn.commit()
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        size_mb = os.path.getsize(filename) / (1024 * 1024)
+        print(f"✅ Data exported to CSV file: {filename} ({row_count} rows, {size_mb:.1f} MB, {size_mb / elapsed:.1f} MB/s)")
+        return row_count
+    except (ValueError, RuntimeError) as e:
         print(f"❌ Error exporting to CSV: {e}")
+        return None
+    except Exception as e:
+        conn.rollback()
+        print(f"⚠️ COPY export failed ({e}); falling back to the pandas exporter.")
+        try:
+            return export_to_csv(stream_query(conn, query), filename, header, compression=compression)
+        finally:
+            conn.rollback()
 
-def export_to_xlsx(data, filename, sheet_name, header):
+# Excel's hard limit of rows per worksheet (including the header row)
+EXCEL_MAX_ROWS = 1_048_576
+
+def peak_memory_mb():
+    """
+    Returns the peak resident memory of this process in MB, or None where it cannot be measured.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB elsewhere
+
+def export_to_xlsx(data, filename, sheet_name, header, max_rows_per_sheet=EXCEL_MAX_ROWS):
     """
-    Exports data (list of tuples) to an XLSX file.
+    Exports data (any iterable of tuples, e.g. a server-side cursor) to an XLSX file with a
+    write-only (constant-memory) workbook, rolling over to a new sheet at Excel's row limit.
+    Returns the number of rows written.
     """
     try:
-        df = pd.DataFrame(data, columns=header)
-        df.to_excel(filename, sheet_name=sheet_name, index=False)
-        print(f"✅ Data exported to XLSX file: {filename} - Sheet: {sheet_name}")
+        started = time.perf_counter()
+        workbook = Workbook(write_only=True)
+        sheet = None
+        sheet_count = 0
+        sheet_rows = max_rows_per_sheet
+        row_count = 0
+
+        for row in data:
+            if sheet_rows >= max_rows_per_sheet:
+                sheet_count += 1
+                suffix = "" if sheet_count == 1 else f" ({sheet_count})"
+                sheet = workbook.create_sheet(title=sheet_name[:31 - len(suffix)] + suffix)  # 31-char sheet name limit
+                sheet.append(header)
+                sheet_rows = 1
+            sheet.append(row)
+            sheet_rows += 1
+            row_count += 1
+
+        if sheet is None:
+            sheet_count = 1
+            workbook.create_sheet(title=sheet_name[:31]).append(header)
+        workbook.save(filename)
+
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        peak = peak_memory_mb()
+        print(f"✅ Data exported to XLSX file: {filename} - Sheet: {sheet_name}"
+              + (f" (+{sheet_count - 1} overflow sheets)" if sheet_count > 1 else ""))
+        print(f"{row_count} rows in {elapsed:.2f}s ({row_count / elapsed:,.0f} rows/sec)"
+              + (f", peak memory {peak:.0f} MB" if peak is not None else ""))
+        return row_count
     except Exception as e:
         print(f"❌ Error exporting to XLSX: {e}")
+        return None
+
+# Rows per Parquet row group / Arrow record batch
+ARROW_BATCH_ROWS = 100_000
+# Scale used for NUMERIC columns without a declared scale (e.g. SUM/AVG results)
+UNCONSTRAINED_NUMERIC_SCALE = 6
+EXPORT_FORMATS = ("CSV", "XLSX", "PARQUET", "ARROW")
+EXPORT_EXTENSIONS = {"CSV": ".csv", "XLSX": ".xlsx", "PARQUET": ".parquet", "ARROW": ".arrow"}
+
+def describe_query(conn, query, params=None):
+    """
+    Returns the cursor description (column names and type OIDs) of a query without fetching rows.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(sql.SQL("SELECT * FROM ({}) AS described LIMIT 0").format(sql.SQL(query.strip().rstrip(";"))), params)
+        return cur.description
+    finally:
+        cur.close()
 
-def export_monthly_revenue_to_file(conn, file_format):
+def arrow_column_types(description):
     """
-    Exports monthly revenue per store to either CSV or XLSX format based on user choice.
+    Maps PostgreSQL result columns to Arrow types: integers, floats, booleans, dates, timestamps
+    and NUMERIC as decimal128 with its declared precision/scale. Anything else becomes a string.
+    Returns a list of (arrow type, value converter or None).
     """
-    monthly_revenue_data = get_monthly_revenue_per_store(conn)
-    if monthly_revenue_data:
-        revenue_header = ["store_id", "store_name", "total_revenue"]
-        if file_format.upper() == "CSV":
-            export_to_csv(monthly_revenue_data, "monthly_revenue_per_store.csv", revenue_header)
-        elif file_format.upper() == "XLSX":
-            export_to_xlsx(monthly_revenue_data, "monthly_revenue_per_store.xlsx", "Store Revenue", revenue_header)
+    fixed_types = {
+        16: pa.bool_(), 20: pa.int64(), 21: pa.int16(), 23: pa.int32(),
+        700: pa.float32(), 701: pa.float64(), 1082: pa.date32(), 1083: pa.time64("us"),
+        1114: pa.timestamp("us"), 1184: pa.timestamp("us", tz="UTC"),
+        25: pa.string(), 1042: pa.string(), 1043: pa.string(),
+    }
+    column_types = []
+    for column in description:
+        if column.type_code in fixed_types:
+            column_types.append((fixed_types[column.type_code], None))
+        elif column.type_code in (114, 3802):  # JSON / JSONB arrive as Python objects
+            column_types.append((pa.string(), json.dumps))
+        elif column.type_code == 1700:  # NUMERIC
+            if column.precision and column.precision <= 38 and column.scale is not None:  # 65535 = no typmod
+                column_types.append((pa.decimal128(column.precision, column.scale), None))
+            else:
+                quantum = Decimal(1).scaleb(-UNCONSTRAINED_NUMERIC_SCALE)
+                column_types.append((pa.decimal128(38, UNCONSTRAINED_NUMERIC_SCALE),
+                                     lambda value, quantum=quantum: value.quantize(quantum, ROUND_HALF_EVEN)))
         else:
-            print("❌ Invalid file format. Please choose CSV or XLSX.")
-    else:
-        print("No monthly revenue data to export.")
+            column_types.append((pa.string(), str))
+    return column_types
+
+def rows_to_record_batch(rows, names, column_types):
+    """
+    Converts a list of row tuples into a typed Arrow record batch.
+    """
+    arrays = []
+    for values, (arrow_type, convert) in zip(zip(*rows), column_types):
+        if convert is not None:
+            values = [None if value is None else convert(value) for value in values]
+        arrays.append(pa.array(values, type=arrow_type))
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+def clear_previous_dataset(directory):
+    """
+    Removes the part files of an earlier partitioned export from directory. Anything else in it
+    means it is not one of our datasets, so it is left alone and the export is refused.
+    """
+    if not os.path.exists(directory):
+        return
+    if not os.path.isdir(directory):
+        raise ValueError(f"{directory} exists and is not a directory")
+    part_files, partition_dirs = [], []
+    for entry in os.scandir(directory):
+        if entry.is_dir(follow_symlinks=False) and "=" in entry.name:
+            for child in os.scandir(entry.path):
+                if not (child.is_file(follow_symlinks=False) and fnmatch.fnmatch(child.name, "part-*.parquet")):
+                    raise ValueError(f"{directory} is not empty and not a previous export; choose another name")
+                part_files.append(child.path)
+            partition_dirs.append(entry.path)
+        else:
+            raise ValueError(f"{directory} is not empty and not a previous export; choose another name")
+    for path in part_files:
+        os.remove(path)
+    for path in partition_dirs:
+        os.rmdir(path)
 
+def export_to_columnar(conn, query, filename, file_format="PARQUET", partition_by=None, batch_rows=ARROW_BATCH_ROWS):
+    """
+    Streams a query into a Parquet file (one row group per batch) or an Arrow IPC file with typed
+    columns. With partition_by, Parquet is written as a directory partitioned by that column
+    (e.g. store_id or month). Returns the number of rows written.
+    """
+    if pa is None:
+        print("❌ Parquet/Arrow export needs the 'pyarrow' package (pip install pyarrow)")
+        return None
+    started = time.perf_counter()
+    writer = None
+    row_count = 0
+    try:
+        description = describe_query(conn, query)
+        names = [column.name for column in description]
+        if partition_by and (file_format != "PARQUET" or partition_by not in names):
+            raise ValueError(f"Partitioning needs PARQUET and one of the columns: {', '.join(names)}")
+        column_types = arrow_column_types(description)
+        schema = pa.schema([(name, arrow_type) for name, (arrow_type, _) in zip(names, column_types)])
+
+        if partition_by:
+            # part files of an earlier, larger export would otherwise linger
+            # (existing_data_behavior="delete_matching" would also delete this run's earlier batches)
+            clear_previous_dataset(filename)
+            os.makedirs(filename, exist_ok=True)
+        elif file_format == "PARQUET":
+            writer = pq.ParquetWriter(filename, schema, compression="snappy")
+        else:
+            writer = pa.ipc.new_file(filename, schema)
+
+        for batch_number, chunk in enumerate(iter_chunks(stream_query(conn, query, itersize=batch_rows), batch_rows)):
+            batch = rows_to_record_batch(chunk, names, column_types)
+            if partition_by:
+                pq.write_to_dataset(pa.Table.from_batches([batch], schema=schema), filename,
+                                    partition_cols=[partition_by], basename_template=f"part-{batch_number}-{{i}}.parquet")
+            elif file_format == "PARQUET":
+                writer.write_table(pa.Table.from_batches([batch], schema=schema), row_group_size=batch_rows)
+            else:
+                writer.write_batch(batch)
+            row_count += len(chunk)
+
+        if writer is not None:
+            writer.close()
+            writer = None
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        print(f"✅ Data exported to {file_format} {'dataset' if partition_by else 'file'}: {filename} "
+              f"({row_count} rows, {row_count / elapsed:,.0f} rows/sec)")
+        return row_count
+    except Exception as e:
+        print(f"❌ Error exporting to {file_format}: {e}")
+        return None
+    finally:
+        if writer is not None:
+            writer.close()
+        conn.rollback()  # closes the server-side cursor and its snapshot
 
-def export_customer_spending_to_file(conn, file_format):
+def export_query_to_file(conn, query, file_format, base_filename, sheet_name=None, header=None,
+                         empty_message="No data to export.", compression=None, partition_by=None, cache=None):
     """
-    Exports customer total spending data to either CSV or XLSX format based on user choice.
+    Exports a query to <base_filename> with the extension of the format: CSV (native COPY),
+    XLSX (streamed rows), PARQUET or ARROW (typed columnar batches). With a ReportCache, CSV and
+    XLSX rows come from the cache (filling it on a miss) for queries listed in REPORT_QUERY_TABLES.
     """
-    customer_spending_data = get_customer_total_spending(conn)
-    if customer_spending_data:
-        spending_header = ["customer_id", "customer_name", "total_spending"]
-        if file_format.upper() == "CSV":
-            export_to_csv(customer_spending_data, "customer_total_spending.csv", spending_header)
-        elif file_format.upper() == "XLSX":
-            export_to_xlsx(customer_spending_data, "customer_total_spending.xlsx", "Customer Spending", spending_header)
+    filename = base_filename + EXPORT_EXTENSIONS[file_format]
+    if cache is not None and file_format in ("CSV", "XLSX") and query in REPORT_QUERY_TABLES:
+        try:
+            hits = cache.hits
+            _, rows = peek_rows(cache.rows(conn, query, REPORT_QUERY_TABLES[query]))
+            if cache.hits > hits:
+                print(f"⚡ {base_filename}: served from the report cache")
+            if rows is None:
+                print(empty_message)
+            elif file_format == "CSV":
+                export_to_csv(rows, filename + COMPRESSION_SUFFIXES.get(compression, ""), header, compression=compression)
+            else:
+                export_to_xlsx(rows, filename, sheet_name or os.path.basename(base_filename), header)
+        except Exception as e:
+            print(f"❌ Error exporting {base_filename}: {e}")
+        finally:
+            conn.rollback()  # closes the server-side cursor and its snapshot
+        return
+    if file_format in ("PARQUET", "ARROW"):
+        row_count = export_to_columnar(conn, query, base_filename if partition_by else filename, file_format, partition_by)
+        if row_count == 0:
+            print(empty_message)
+        return
+    try:
+        if header is None:
+            header = [column.name for column in describe_query(conn, query)]
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error exporting {base_filename}: {e}")
+        return
+    if file_format == "CSV":
+        row_count = export_query_to_csv(conn, query, filename, header, compression)
+        if row_count == 0:
+            print(empty_message)
+        return
+    try:
+        _, rows = peek_rows(stream_query(conn, query))
+        if rows is None:
+            print(empty_message)
         else:
-            print("❌ Invalid file format. Please choose CSV or XLSX.")
+            export_to_xlsx(rows, filename, sheet_name or os.path.basename(base_filename), header)
+    except Exception as e:
+        print(f"❌ Error exporting {base_filename}: {e}")
+    finally:
+        conn.rollback()  # closes the server-side cursor and its snapshot
+
+def export_monthly_revenue_to_file(conn, file_format, compression=None, partition_by=None, use_cache=True):
+    """
+    Exports monthly revenue per store to CSV, XLSX, Parquet or Arrow based on user choice.
+    """
+    file_format = file_format.upper()
+    if file_format not in EXPORT_FORMATS:
+        print("❌ Invalid file format. Please choose CSV, XLSX, PARQUET or ARROW.")
+        return
+    revenue_header = ["store_id", "store_name", "month", "monthly_revenue"]
+    export_query_to_file(conn, MONTHLY_REVENUE_QUERY, file_format, "monthly_revenue_per_store",
+                         "Store Revenue", revenue_header, "No monthly revenue data to export.", compression, partition_by,
+                         report_cache() if use_cache else None)
+
+
+def export_customer_spending_to_file(conn, file_format, compression=None, partition_by=None, use_cache=True):
+    """
+    Exports customer total spending data to CSV, XLSX, Parquet or Arrow based on user choice.
+    """
+    file_format = file_format.upper()
+    if file_format not in EXPORT_FORMATS:
+        print("❌ Invalid file format. Please choose CSV, XLSX, PARQUET or ARROW.")
+        return
+    spending_header = ["customer_id", "customer_name", "total_spending"]
+    export_query_to_file(conn, CUSTOMER_SPENDING_QUERY, file_format, "customer_total_spending",
+                         "Customer Spending", spending_header, "No customer spending data to export.", compression, partition_by,
+                         report_cache() if use_cache else None)
+
+
+def export_table_or_query_to_file(conn, source, file_format, base_filename, compression=None, partition_by=None):
+    """
+    Exports any table (by name) or SELECT query to CSV, XLSX, Parquet or Arrow.
+    """
+    file_format = file_format.upper()
+    if file_format not in EXPORT_FORMATS:
+        print("❌ Invalid file format. Please choose CSV, XLSX, PARQUET or ARROW.")
+        return
+    source = source.strip().rstrip(";")
+    if source.split(None, 1)[0].upper() in ("SELECT", "WITH", "TABLE", "VALUES"):
+        query = source
     else:
-        print("No customer spending data to export.")
+        query = sql.SQL("SELECT * FROM {}").format(table_identifier(source)).as_string(conn)
+    export_query_to_file(conn, query, file_format, base_filename, compression=compression, partition_by=partition_by)
 
 
 def task_14_export_data(conn):
@@ -1553,27 +5198,548 @@ def task_14_export_data(conn):
     print("\n🚀 Task 14: Data Export - Started...")
 
     # 1. Export monthly revenue per store
-    monthly_revenue_data = get_monthly_revenue_per_store(conn)
-    if monthly_revenue_data:
-        revenue_header = ["store_id", "store_name", "total_revenue"]
-        export_to_csv(monthly_revenue_data, "monthly_revenue_per_store.csv", revenue_header)
-        export_to_xlsx(monthly_revenue_data, "monthly_revenue_per_store.xlsx", "Store Revenue", revenue_header)
+    for file_format in ("CSV", "XLSX"):
+        export_monthly_revenue_to_file(conn, file_format)
 
     # 2. Export list of customers and their total spending
-    customer_spending_data = get_customer_total_spending(conn)
-    if customer_spending_data:
-        spending_header = ["customer_id", "customer_name", "total_spending"]
-        export_to_csv(customer_spending_data, "customer_total_spending.csv", spending_header)
-        export_to_xlsx(customer_spending_data, "customer_total_spending.xlsx", "Customer Spending", spending_header)
+    for file_format in ("CSV", "XLSX"):
+        export_customer_spending_to_file(conn, file_format)
 
     print("✅ Task 14: Data Export - Completed!\n")
 
 
+#================================================= task 21 index advisor =================================================
+
+# Tables smaller than this are left alone: a sequential scan is as good as an index there
+ADVISOR_MIN_TABLE_ROWS = 1_000
+# Statements from pg_stat_statements examined, by total execution time
+ADVISOR_TOP_STATEMENTS = 50
+# Covering indexes INCLUDE at most this many extra columns
+ADVISOR_MAX_INCLUDE_COLUMNS = 3
+
+def existing_index_keys(conn):
+    """
+    Returns {table: [key column lists of its valid indexes]} for the public schema.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT i.indrelid::regclass::TEXT, array_agg(a.attname::TEXT ORDER BY k.ord)
+        FROM pg_index i
+        JOIN pg_class t ON t.oid = i.indrelid AND t.relnamespace = 'public'::regnamespace
+        CROSS JOIN LATERAL unnest(i.indkey::INT2[]) WITH ORDINALITY AS k(attnum, ord)
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+        WHERE i.indisvalid AND k.ord <= i.indnkeyatts
+        GROUP BY i.indexrelid, i.indrelid;
+    """)
+    keys = {}
+    for table, columns in cur.fetchall():
+        keys.setdefault(table, []).append(columns)
+    cur.close()
+    return keys
+
+def index_covers(index_keys, table, columns):
+    """
+    True when an existing index on the table leads with exactly these columns (in any order).
+    """
+    return any(sorted(keys[:len(columns)]) == sorted(columns) for keys in index_keys.get(table, []))
+
+def table_scan_stats(conn):
+    """
+    Returns {table: pg_stat_user_tables counters} for the public schema.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT relname::TEXT, n_live_tup, seq_scan, seq_tup_read, COALESCE(idx_scan, 0)
+        FROM pg_stat_user_tables WHERE schemaname = 'public';
+    """)
+    stats = {table: {"live_rows": live, "seq_scan": seq_scan, "seq_tup_read": seq_read, "idx_scan": idx_scan}
+             for table, live, seq_scan, seq_read, idx_scan in cur.fetchall()}
+    cur.close()
+    return stats
+
+def extension_installed(conn, name):
+    """
+    True when the extension is installed in the current database.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = %s);", (name,))
+    installed = cur.fetchone()[0]
+    cur.close()
+    return installed
+
+def unindexed_foreign_keys(conn, index_keys):
+    """
+    Returns (table, columns, constraint) for every foreign key whose columns no index leads with.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT c.conrelid::regclass::TEXT, c.conname::TEXT, array_agg(a.attname::TEXT ORDER BY k.ord)
+        FROM pg_constraint c
+        CROSS JOIN LATERAL unnest(c.conkey) WITH ORDINALITY AS k(attnum, ord)
+        JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+        WHERE c.contype = 'f' AND c.connamespace = 'public'::regnamespace
+        GROUP BY c.oid, c.conrelid, c.conname
+        ORDER BY 1, 2;
+    """)
+    foreign_keys = [(table, columns, name) for table, name, columns in cur.fetchall()
+                    if not index_covers(index_keys, table, columns)]
+    cur.close()
+    return foreign_keys
+
+def generic_plan(conn, query):
+    """
+    Returns the JSON plan of a (possibly parameterised, $n) statement, or None if it cannot be planned
+    (EXPLAIN (GENERIC_PLAN) needs PostgreSQL 16+).
+    """
+    if conn.server_version < 160000:
+        return None
+    cur = conn.cursor()
+    try:
+        cur.execute("EXPLAIN (GENERIC_PLAN, VERBOSE, FORMAT JSON) " + query)
+        return cur.fetchone()[0][0]["Plan"]
+    except psycopg2.Error:
+        return None
+    finally:
+        cur.close()
+        conn.rollback()
+
+def iter_plan_nodes(plan):
+    """
+    Yields a plan node and all of its children, depth first.
+    """
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from iter_plan_nodes(child)
+
+def workload_index_candidates(conn, stats, index_keys, columns_by_table):
+    """
+    Proposes indexes from the statements in pg_stat_statements: each sequential scan with a filter on
+    a large table suggests an index on the filtered columns, INCLUDE-ing the other columns it outputs.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT query, calls, total_exec_time
+        FROM pg_stat_statements
+        WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+          AND query ~* '^\\s*(SELECT|WITH|UPDATE|DELETE)'
+        ORDER BY total_exec_time DESC
+        LIMIT %s;
+    """, (ADVISOR_TOP_STATEMENTS,))
+    statements = cur.fetchall()
+    cur.close()
+
+    candidates = {}
+    for query, calls, total_ms in statements:
+        plan = generic_plan(conn, query)
+        if plan is None:
+            continue
+        for node in iter_plan_nodes(plan):
+            table = node.get("Relation Name")
+            if node.get("Node Type") != "Seq Scan" or "Filter" not in node or table not in columns_by_table:
+                continue
+            if stats.get(table, {}).get("live_rows", 0) < ADVISOR_MIN_TABLE_ROWS:
+                continue
+            filter_words = set(re.findall(r"[a-z_][a-z0-9_]*", node["Filter"].lower()))
+            key = tuple(column for column in columns_by_table[table] if column in filter_words)
+            if not key or index_covers(index_keys, table, list(key)):
+                continue
+            output = {column.rsplit(".", 1)[-1] for column in node.get("Output", [])}
+            include = [column for column in columns_by_table[table] if column in output and column not in key]
+            candidate = candidates.setdefault((table, key), {
+                "table": table, "columns": list(key), "include": set(), "calls": 0, "total_ms": 0.0,
+                "reason": f"sequential scan filtering on {', '.join(key)}", "statements": []})
+            if len(include) <= ADVISOR_MAX_INCLUDE_COLUMNS:
+                candidate["include"].update(include)
+            candidate["calls"] += calls
+            candidate["total_ms"] += total_ms
+            candidate["statements"].append(query)
+    for candidate in candidates.values():
+        candidate["include"] = [column for column in columns_by_table[candidate["table"]] if column in candidate["include"]]
+    return list(candidates.values())
+
+def index_name(table, columns):
+    """
+    Conventional idx_<table>_<columns> name, kept within PostgreSQL's 63-character limit.
+    """
+    return f"idx_{table}_{'_'.join(columns)}"[:63]
+
+def index_definition(recommendation, concurrently=True):
+    """
+    Builds the CREATE INDEX statement for a recommendation.
+    """
+    return sql.SQL("CREATE INDEX {}IF NOT EXISTS {} ON {} ({}){}").format(
+        sql.SQL("CONCURRENTLY " if concurrently else ""),
+        sql.Identifier(index_name(recommendation["table"], recommendation["columns"])),
+        sql.Identifier(recommendation["table"]),
+        sql.SQL(", ").join(map(sql.Identifier, recommendation["columns"])),
+        sql.SQL(" INCLUDE ({})").format(sql.SQL(", ").join(map(sql.Identifier, recommendation["include"])))
+        if recommendation["include"] else sql.SQL(""))
+
+def estimate_index_benefit(conn, recommendation):
+    """
+    Estimates the planner cost saved (summed over the recommendation's statements, weighted by calls)
+    with a hypothetical index from hypopg. Returns None when the estimate cannot be made.
+    """
+    if not recommendation.get("statements"):
+        return None
+    cur = conn.cursor()
+    try:
+        before = sum(generic_plan(conn, query)["Total Cost"] for query in recommendation["statements"])
+        cur.execute("SELECT indexrelid FROM hypopg_create_index(%s);",
+                    (index_definition(recommendation, concurrently=False).as_string(conn),))
+        conn.commit()
+        after = sum(generic_plan(conn, query)["Total Cost"] for query in recommendation["statements"])
+        return max(before - after, 0) * recommendation["calls"] / len(recommendation["statements"])
+    except (psycopg2.Error, TypeError):
+        conn.rollback()
+        return None
+    finally:
+        cur.execute("SELECT hypopg_reset();")
+        conn.commit()
+        cur.close()
+
+def recommend_indexes(conn):
+    """
+    Proposes indexes for unindexed foreign keys and, when pg_stat_statements is installed, for the
+    filters of the most expensive statements; benefits are estimated with hypopg when it is installed.
+    Returns the recommendations, most beneficial first.
+    """
+    index_keys = existing_index_keys(conn)
+    stats = table_scan_stats(conn)
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT table_name::TEXT, array_agg(column_name::TEXT ORDER BY ordinal_position)
+        FROM information_schema.columns WHERE table_schema = 'public' GROUP BY table_name;
+    """)
+    columns_by_table = dict(cur.fetchall())
+    cur.close()
+    conn.commit()
+
+    recommendations = []
+    for table, columns, constraint in unindexed_foreign_keys(conn, index_keys):
+        table_stats = stats.get(table, {})
+        recommendations.append({
+            "table": table, "columns": columns, "include": [],
+            "reason": f"foreign key {constraint}: joins and cascades scan {table_stats.get('live_rows', 0):,} rows",
+            "benefit": float(table_stats.get("seq_tup_read", 0)), "basis": "rows read by sequential scans",
+            "live_rows": table_stats.get("live_rows", 0),
+        })
+
+    if conn.server_version < 160000:
+        print("ℹ️ Workload-based recommendations were skipped: EXPLAIN (GENERIC_PLAN) needs PostgreSQL 16+; "
+              "only foreign key indexes are proposed.")
+    elif extension_installed(conn, "pg_stat_statements"):
+        with_hypopg = extension_installed(conn, "hypopg")
+        for candidate in workload_index_candidates(conn, stats, index_keys, columns_by_table):
+            if any(r["table"] == candidate["table"] and r["columns"] == candidate["columns"] for r in recommendations):
+                continue
+            benefit = estimate_index_benefit(conn, candidate) if with_hypopg else None
+            candidate["benefit"] = benefit if benefit is not None else candidate["total_ms"]
+            candidate["basis"] = "planner cost saved (hypopg)" if benefit is not None else "ms spent in matching statements"
+            recommendations.append(candidate)
+    else:
+        print("ℹ️ pg_stat_statements is not installed; only foreign key indexes are proposed.")
+
+    recommendations.sort(key=lambda r: (r["benefit"], r.get("live_rows", 0)), reverse=True)
+    return recommendations
+
+def apply_index_recommendations(conn, recommendations):
+    """
+    Creates the recommended indexes with CREATE INDEX CONCURRENTLY (no write lock on the table).
+    A failed build leaves an invalid index behind, which is dropped again.
+    """
+    conn.commit()
+    previous_autocommit = conn.autocommit
+    conn.autocommit = True  # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    cur = conn.cursor()
+    try:
+        for recommendation in recommendations:
+            name = index_name(recommendation["table"], recommendation["columns"])
+            started = time.perf_counter()
+            try:
+                cur.execute(index_definition(recommendation))
+                print(f"✅ Created {name} in {time.perf_counter() - started:.2f}s")
+            except psycopg2.Error as e:
+                print(f"❌ Error creating {name}: {str(e).strip()}")
+                cur.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {};").format(sql.Identifier(name)))
+    finally:
+        cur.close()
+        conn.autocommit = previous_autocommit
+
+def run_index_advisor(conn, apply=False):
+    """
+    Prints the index recommendations and optionally applies them.
+    """
+    try:
+        recommendations = recommend_indexes(conn)
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error running the index advisor: {e}")
+        return []
+    if not recommendations:
+        print("✅ No missing indexes found.")
+        return []
+    print("\nRecommended indexes:")
+    for recommendation in recommendations:
+        print(f"  {index_definition(recommendation).as_string(conn)};")
+        print(f"      {recommendation['reason']} - benefit {recommendation['benefit']:,.0f} ({recommendation['basis']})")
+    if apply:
+        apply_index_recommendations(conn, recommendations)
+    return recommendations
+
+
+#================================================= task 20 benchmark suite =================================================
+
+# Menu tasks timed by the benchmark suite, in run order: (name, menu option, function)
+BENCHMARK_TASKS = [
+    ("create_tables", 1, create_tables),
+    ("create_indexes", 2, create_indexes),
+    ("create_views", 3, create_views),
+    ("create_triggers", 4, create_triggers),
+    ("insert_sample_data", 5, insert_sample_data),
+    ("generate_synthetic_data", 19, None),  # loads the data set for the scale factor
+    ("load_xlsx_to_db", 6, None),  # reloads products from an exported workbook
+    ("display_employee_hierarchy", 7, display_employee_hierarchy),
+    ("display_monthly_sales_pivot_crosstab", 8, display_monthly_sales_pivot_crosstab),
+    ("query_data_joins", 9, query_data_joins),
+    ("task_union_union_all", 10, task_union_union_all),
+    ("demonstrate_data_updates", 11, demonstrate_data_updates),
+    ("create_stored_procedures", 13, create_stored_procedures),
+    ("task_14_export_data", 14, task_14_export_data),
+    ("demonstrate_data_deletion", 12, demonstrate_data_deletion),  # last: it deletes customers and orders
+]
+BENCHMARK_SCALE_FACTORS = (0.01, 0.1)
+# Compare mode: flag a task when it got this much slower (fraction) and by at least this many ms
+BENCHMARK_REGRESSION_THRESHOLD = 0.10
+BENCHMARK_NOISE_FLOOR_MS = 5.0
+# How often the peak client memory (RSS) is sampled while a task runs
+BENCHMARK_MEMORY_SAMPLE_SECONDS = 0.005
+BENCHMARK_FIELDS = ["scale_factor", "task", "menu_option", "status", "wall_ms", "server_ms", "rows_read",
+                    "rows_written", "client_peak_mb", "error"]
+
+def server_counters(conn):
+    """
+    Returns cumulative server-side counters for the current database: statement execution time (ms,
+    None before PostgreSQL 14, which has no pg_stat_database.active_time) and rows read / written
+    across user tables.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT pg_stat_force_next_flush();")  # PostgreSQL 15+: publish this backend's stats now
+    except psycopg2.Error:
+        conn.rollback()
+    conn.commit()
+    cur.execute("SELECT pg_stat_clear_snapshot();")
+    active_time = "d.active_time" if conn.server_version >= 140000 else "NULL::float8"
+    cur.execute(f"""
+        SELECT {active_time},
+               COALESCE(SUM(t.seq_tup_read + COALESCE(t.idx_tup_fetch, 0)), 0),
+               COALESCE(SUM(t.n_tup_ins + t.n_tup_upd + t.n_tup_del), 0)
+        FROM pg_stat_database d
+        LEFT JOIN pg_stat_user_tables t ON TRUE
+        WHERE d.datname = current_database()
+        GROUP BY 1;
+    """)
+    active_time, rows_read, rows_written = cur.fetchone()
+    conn.commit()
+    cur.close()
+    server_ms = None if conn.server_version < 140000 else float(active_time or 0)
+    return {"server_ms": server_ms, "rows_read": int(rows_read), "rows_written": int(rows_written)}
+
+def current_memory_mb():
+    """
+    Returns the current resident memory of this process in MB, or None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class MemorySampler:
+    """
+    Tracks the peak resident memory of this process from a background thread. Falls back to
+    tracemalloc (Python allocations only, and noticeably slower) where RSS cannot be read.
+    """
+    def __init__(self, interval=BENCHMARK_MEMORY_SAMPLE_SECONDS):
+        self.interval = interval
+        self.baseline = current_memory_mb()
+        self.peak = self.baseline
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_memory_mb() or 0)
+
+    def __enter__(self):
+        if self.baseline is None:
+            tracemalloc.start()
+        else:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._thread is None:
+            self.peak_growth_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+        else:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, current_memory_mb() or 0)
+            self.peak_growth_mb = self.peak - self.baseline
+        return False
+
+def run_benchmark_task(conn, name, menu_option, task, scale_factor):
+    """
+    Runs one task with its output captured and returns its measurements. Tasks report failures by
+    printing an error line rather than raising, so the captured output decides the status.
+    """
+    before = server_counters(conn)
+    output = io.StringIO()
+    started = time.perf_counter()
+    with MemorySampler() as memory:
+        try:
+            with redirect_stdout(output):
+                task(conn)
+            error = next((line.strip() for line in output.getvalue().splitlines() if line.lstrip().startswith(("❌", "Error"))), "")
+        except Exception as e:
+            error = str(e).strip()
+        wall_ms = (time.perf_counter() - started) * 1000
+    if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+    after = server_counters(conn)
+    return {
+        "scale_factor": scale_factor,
+        "task": name,
+        "menu_option": menu_option,
+        "status": "error" if error else "ok",
+        "wall_ms": round(wall_ms, 3),
+        # null without server-side active_time (PostgreSQL < 14): wall_ms is the only timing then
+        "server_ms": None if after["server_ms"] is None else round(after["server_ms"] - before["server_ms"], 3),
+        "rows_read": after["rows_read"] - before["rows_read"],
+        "rows_written": after["rows_written"] - before["rows_written"],
+        "client_peak_mb": round(memory.peak_growth_mb, 3),
+        "error": error,
+    }
+
+def benchmark_load_xlsx(conn, workbook_path):
+    """
+    Benchmark step for task 6: loads an exported products workbook into a scratch copy of products.
+    """
+    cur = conn.cursor()
+    cur.execute("DROP TABLE IF EXISTS benchmark_products; CREATE TABLE benchmark_products (LIKE products);")
+    conn.commit()
+    try:
+        load_xlsx_to_db(workbook_path, "benchmark_products", conn)
+    finally:
+        cur.execute("DROP TABLE IF EXISTS benchmark_products;")
+        conn.commit()
+        cur.close()
+
+def run_benchmark_suite(conn, scale_factors=BENCHMARK_SCALE_FACTORS, output_base="benchmark_results", seed=42):
+    """
+    Runs every menu task at each scale factor and writes the measurements to <output_base>.json
+    and <output_base>.csv. Destructive: the core tables are truncated and regenerated.
+    Returns the list of result rows.
+    """
+    results = []
+    workdir = tempfile.TemporaryDirectory(prefix="shopease-benchmark-")
+    previous_dir = os.getcwd()
+    os.chdir(workdir.name)  # exports land in the scratch directory
+    try:
+        for scale_factor in scale_factors:
+            print(f"\n🚀 Benchmark at scale factor {scale_factor}")
+            create_tables(conn)
+            cur = conn.cursor()
+            cur.execute("TRUNCATE stores, employees, customers, suppliers, products, orders, order_items, payments CASCADE;")
+            conn.commit()
+            cur.close()
+            workbook_path = os.path.join(workdir.name, "products.xlsx")
+            tasks = {
+                "generate_synthetic_data": lambda c: generate_synthetic_data(c, scale_factor, seed),
+                "load_xlsx_to_db": lambda c: benchmark_load_xlsx(c, workbook_path),
+            }
+            for name, menu_option, task in BENCHMARK_TASKS:
+                if name == "load_xlsx_to_db":
+                    with redirect_stdout(io.StringIO()):
+                        header = [column.name for column in describe_query(conn, "SELECT * FROM products")]
+                        export_to_xlsx(stream_query(conn, "SELECT * FROM products"), workbook_path, "products", header)
+                    conn.commit()
+                result = run_benchmark_task(conn, name, menu_option, task or tasks[name], scale_factor)
+                results.append(result)
+                server = "n/a" if result["server_ms"] is None else f"{result['server_ms']:,.1f} ms"
+                print(f"{'✅' if result['status'] == 'ok' else '❌'} {name}: {result['wall_ms']:,.1f} ms wall, "
+                      f"{server} server, {result['rows_read']:,} read / {result['rows_written']:,} written, "
+                      f"{result['client_peak_mb']:.1f} MB peak" + (f" - {result['error']}" if result['error'] else ""))
+    finally:
+        os.chdir(previous_dir)
+        workdir.cleanup()
+
+    metadata = {
+        "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "server_version": conn.server_version,
+        "python_version": sys.version.split()[0],
+        "scale_factors": list(scale_factors),
+        "seed": seed,
+    }
+    with open(f"{output_base}.json", "w") as f:
+        json.dump({"metadata": metadata, "results": results}, f, indent=2)
+    with open(f"{output_base}.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=BENCHMARK_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"✅ Benchmark results written to {output_base}.json and {output_base}.csv")
+    if conn.server_version < 140000:
+        print("ℹ️ server_ms is empty: pg_stat_database.active_time needs PostgreSQL 14+; compare wall_ms instead.")
+    return results
+
+def compare_benchmarks(baseline_path, current_path, threshold=BENCHMARK_REGRESSION_THRESHOLD,
+                       noise_floor_ms=BENCHMARK_NOISE_FLOOR_MS):
+    """
+    Compares two benchmark JSON files task by task and flags wall-time regressions beyond the
+    threshold (ignoring differences under the noise floor) as well as tasks that started failing.
+    Returns the list of regressions.
+    """
+    with open(baseline_path) as f:
+        baseline = {(r["scale_factor"], r["task"]): r for r in json.load(f)["results"]}
+    with open(current_path) as f:
+        current = json.load(f)["results"]
+
+    regressions = []
+    print(f"\n{'SF':>6}  {'Task':<40} {'Baseline ms':>12} {'Current ms':>12} {'Change':>8}")
+    for result in current:
+        before = baseline.get((result["scale_factor"], result["task"]))
+        if before is None:
+            continue
+        change = (result["wall_ms"] - before["wall_ms"]) / max(before["wall_ms"], 1e-9)
+        regressed = (change > threshold and result["wall_ms"] - before["wall_ms"] > noise_floor_ms) \
+            or (before["status"] == "ok" and result["status"] != "ok")
+        if regressed:
+            regressions.append({"scale_factor": result["scale_factor"], "task": result["task"],
+                                "baseline_ms": before["wall_ms"], "current_ms": result["wall_ms"], "change": change})
+        print(f"{result['scale_factor']:>6}  {result['task']:<40} {before['wall_ms']:>12,.1f} {result['wall_ms']:>12,.1f} "
+              f"{change:>+8.1%}" + ("  ❌ REGRESSION" if regressed else ""))
+
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) beyond {threshold:.0%}")
+    else:
+        print("✅ No regressions")
+    return regressions
+
+
 #================================================= main =================================================
 
-# Establish connection and create tables
-conn = connect_db()
-inp = int(input("""1. Create tables
+if __name__ == "__main__":
+    # Borrow a connection from the pool and run the selected task
+    try:
+        conn = borrow_connection()
+        print("✅ Database connected successfully!")
+    except Exception as e:
+        print(f"❌ Database connection error: {e}")
+        conn = None
+    inp = int(input("""1. Create tables
 2. Create indexes
 3. Create views
 4. Create triggers
@@ -1586,54 +5752,164 @@ inp = int(input("""1. Create tables
 11. Demonstrate data updates
 12. Demonstrate data deletions
 13. Demonstrate stored procedures
-14. Export data to CSV/XLSX
-Enter your choice (1/2/3/4/5/6/7/8/9/10/11/12/13/14) -
+14. Export data (CSV/XLSX/Parquet/Arrow)
+15. Load workbooks into DB in parallel (foreign-key order)
+16. Benchmark connect-per-operation vs pooled connections
+17. Reconcile store revenue summary
+18. Backfill monthly revenue rollup (parallel)
+19. Generate synthetic data at a scale factor
+20. Benchmark suite (run / compare)
+21. Index advisor
+22. Partition orders and payments by month (migrate / maintain)
+23. Benchmark batched order placement
+24. Employee hierarchy lookups (ancestors / depth / headcount)
+25. Watch the employee hierarchy (in-memory cache)
+26. Benchmark prepared statements for point lookups
+27. Purge inactive customers in batches
+28. Bulk update a table from a CSV/XLSX file
+29. Ingest shipment feeds (file or watched directory)
+Enter your choice (1/2/3/4/5/6/7/8/9/10/11/12/13/14/15/16/17/18/19/20/21/22/23/24/25/26/27/28/29) -
 -> """))
 
-if conn:
-    if inp == 1:
-        create_tables(conn)
-    elif inp == 2:
-        create_indexes(conn)
-    elif inp == 3:
-        create_views(conn)
-    elif inp == 4:
-        create_triggers(conn)
-    elif inp == 5:
-        insert_sample_data(conn)
-    elif inp == 6:
-            file_path = input("Enter XLSX file path: ")
-            table_name = input("Enter table name: ")
-            load_xlsx_to_db(file_path, table_name, conn)
-    elif inp == 7:
-        display_employee_hierarchy(conn)
-    elif inp == 8:
-        display_monthly_sales_pivot_crosstab(conn)  
-    elif inp == 9:
-        query_data_joins(conn)
-    elif inp == 10:
-        task_union_union_all(conn)
-    elif inp == 11:
-        demonstrate_data_updates(conn)
-    elif inp == 12:
-        demonstrate_data_deletion(conn)
-    elif inp == 13:
-        create_stored_procedures(conn)
-    elif inp == 14:  # Modified Task 14 implementation
-                    export_type = int(input("""1. Export monthly revenue per store
+    if conn:
+        if inp == 1:
+            partitioned = input("Create orders and payments as monthly range-partitioned tables? (y/N): ").strip().lower() == "y"
+            create_tables(conn, partitioned)
+        elif inp == 2:
+            create_indexes(conn)
+        elif inp == 3:
+            create_views(conn)
+        elif inp == 4:
+            create_triggers(conn)
+        elif inp == 5:
+            insert_sample_data(conn)
+        elif inp == 6:
+                file_path = input("Enter XLSX file path: ")
+                table_name = input("Enter table name: ")
+                if input("Stream the file in committed batches (large files)? (y/N): ").strip().lower() == "y":
+                    start_batch = int(input("Resume from batch (0 to start from the beginning): ").strip() or 0)
+                    load_xlsx_to_db_streaming(file_path, table_name, conn, start_batch=start_batch)
+                else:
+                    load_xlsx_to_db(file_path, table_name, conn)
+        elif inp == 7:
+            root_id = input("Show only the team under employee ID (blank for everyone): ").strip()
+            display_employee_hierarchy(conn, int(root_id) if root_id else None)
+        elif inp == 8:
+            rows = input("Pivot rows (store/customer/month/quarter/year) [store]: ").strip().lower() or "store"
+            columns = input("Pivot columns (store/customer/month/quarter/year) [month]: ").strip().lower() or "month"
+            measure = input("Measure (revenue/orders) [revenue]: ").strip().lower() or "revenue"
+            display_monthly_sales_pivot_crosstab(conn, rows, columns, measure)
+        elif inp == 9:
+            query_data_joins(conn)
+        elif inp == 10:
+            task_union_union_all(conn)
+        elif inp == 11:
+            demonstrate_data_updates(conn)
+        elif inp == 12:
+            demonstrate_data_deletion(conn)
+        elif inp == 13:
+            create_stored_procedures(conn)
+        elif inp == 14:  # Modified Task 14 implementation
+                        export_type = int(input("""1. Export monthly revenue per store
 2. Export customer spending
+3. Export a table or custom SELECT query
 
 -> """))
-                    file_format = input("Enter export file format (CSV or XLSX): ").strip()
-                    if export_type == 1:
-                        export_monthly_revenue_to_file(conn, file_format)
-                    elif export_type == 2:
-                        export_customer_spending_to_file(conn, file_format)
-                    else:
-                        print("❌ Invalid export type selected.")
-
+                        source = base_filename = None
+                        if export_type == 3:
+                            source = input("Enter table name or SELECT query: ").strip()
+                            base_filename = input("Enter output file name (without extension): ").strip()
+                        file_format = input("Enter export file format (CSV, XLSX, PARQUET or ARROW): ").strip()
+                        compression = partition_by = None
+                        if file_format.upper() == "CSV":
+                            compression = input("Compression (none/gzip/zstd): ").strip().lower() or None
+                        elif file_format.upper() == "PARQUET":
+                            partition_by = input("Partition by column, e.g. store_id or month (blank for none): ").strip() or None
+                        if export_type == 1:
+                            export_monthly_revenue_to_file(conn, file_format, compression, partition_by)
+                        elif export_type == 2:
+                            export_customer_spending_to_file(conn, file_format, compression, partition_by)
+                        elif export_type == 3:
+                            export_table_or_query_to_file(conn, source, file_format, base_filename, compression, partition_by)
+                        else:
+                            print("❌ Invalid export type selected.")
+        elif inp == 15:
+            paths = [path.strip() for path in input("Enter XLSX file paths (comma separated): ").split(",") if path.strip()]
+            load_workbooks_parallel(paths, conn)
+        elif inp == 16:
+            benchmark_connection_pool()
+        elif inp == 17:
+            repair = input("Rebuild the summary if it has drifted? (y/N): ").strip().lower() == "y"
+            reconcile_store_revenue(conn, repair)
+        elif inp == 18:
+            backfill_monthly_revenue(conn)
+        elif inp == 19:
+            scale_factor = float(input("Scale factor (1 = 150,000 orders / 600,000 order items): ").strip() or 1)
+            seed = int(input("Random seed (default 42): ").strip() or 42)
+            if input("This replaces all store, employee, customer, supplier, product and order data. Continue? (y/N): ").strip().lower() == "y":
+                generate_synthetic_data(conn, scale_factor, seed)
+        elif inp == 20:
+            if input("1. Run the benchmark suite\n2. Compare two benchmark runs\n\n-> ").strip() == "2":
+                compare_benchmarks(input("Baseline results JSON: ").strip(), input("Current results JSON: ").strip())
+            else:
+                scale_factors = [float(value) for value in (input("Scale factors (comma separated, default 0.01,0.1): ").strip() or "0.01,0.1").split(",")]
+                output_base = input("Output file name (without extension, default benchmark_results): ").strip() or "benchmark_results"
+                if input("The benchmark regenerates all store, employee, customer, supplier, product and order data. Continue? (y/N): ").strip().lower() == "y":
+                    run_benchmark_suite(conn, scale_factors, output_base)
+        elif inp == 21:
+            recommendations = run_index_advisor(conn)
+            if recommendations and input("Create these indexes concurrently? (y/N): ").strip().lower() == "y":
+                apply_index_recommendations(conn, recommendations)
+        elif inp == 22:
+            action = input("""1. Migrate orders and payments to monthly partitions
+2. Pre-create future partitions and empty the default partition
+3. Apply retention (detach or drop old partitions)
+
+-> """).strip()
+            if action == "1":
+                for table in PARTITIONED_TABLES:
+                    migrate_to_partitioned(conn, table)
+            elif action == "2":
+                maintain_partitions(conn)
+            elif action == "3":
+                retention_months = int(input("Keep how many months of data? ").strip())
+                drop = input("Drop expired partitions instead of detaching them? (y/N): ").strip().lower() == "y"
+                maintain_partitions(conn, retention_months=retention_months, drop=drop)
+            else:
+                print("❌ Invalid partition action selected.")
+        elif inp == 23:
+            benchmark_place_orders(conn)
+        elif inp == 24:
+            task_employee_hierarchy_lookups(conn, int(input("Enter employee ID: ").strip()))
+        elif inp == 25:
+            root_id = input("Show only the team under employee ID (blank for everyone): ").strip()
+            watch_employee_hierarchy(int(root_id) if root_id else None)
+        elif inp == 26:
+            benchmark_prepared_statements(conn)
+        elif inp == 27:
+            years = int(input("Purge customers without orders in how many years? [2]: ").strip() or 2)
+            dry_run = input("Dry run (count only)? (Y/n): ").strip().lower() != "n"
+            if dry_run:
+                purge_inactive_customers(conn, years, dry_run=True)
+            else:
+                batch_size = int(input(f"Customers per batch [{PURGE_BATCH_ROWS}]: ").strip() or PURGE_BATCH_ROWS)
+                sleep_seconds = float(input(f"Pause between batches in seconds [{PURGE_SLEEP_SECONDS}]: ").strip() or PURGE_SLEEP_SECONDS)
+                purge_inactive_customers(conn, years, batch_size, sleep_seconds)
+        elif inp == 28:
+            file_path = input("Enter the CSV/XLSX file with the new values: ").strip()
+            table_name = input("Enter the table to update: ").strip()
+            key = input("Enter the key column(s), comma-separated: ").strip()
+            fill_nulls_only = input("Only fill columns that are currently NULL? (y/N): ").strip().lower() == "y"
+            bulk_update(conn, table_name, [column.strip() for column in key.split(",")], file_path, fill_nulls_only=fill_nulls_only)
+        elif inp == 29:
+            feed_path = input("Enter a shipment CSV file, or a directory to watch for feeds: ").strip()
+            if os.path.isdir(feed_path):
+                watch_shipment_feeds(conn, feed_path)
+            else:
+                ingest_shipments(conn, feed_path)
 
-    else:
-        print("Invalid input!")
-    conn.close()    
+        else:
+            print("Invalid input!")
+        release_connection(conn)
+        close_pool()
     
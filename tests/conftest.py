@@ -0,0 +1,63 @@
+"""
+Shared fixtures. Tests that need PostgreSQL run against a scratch database created for the test
+session on the server assignment.py is configured for (PGHOST, PGPORT, PGUSER, PGPASSWORD or
+SHOPEASE_DSN), and are skipped when that server cannot be reached.
+"""
+import os
+import sys
+
+import psycopg2
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import assignment  # noqa: E402
+
+CORE_TABLES = "stores, employees, customers, suppliers, products, orders, order_items, payments"
+
+
+@pytest.fixture(scope="session")
+def database():
+    """
+    Creates the schema (tables, indexes, views, triggers) in a fresh database and points
+    assignment.py at it for the session; the database is dropped afterwards.
+    """
+    params = {name: value for name, value in assignment.connection_params().items() if name != "cursor_factory"}
+    server_dsn = psycopg2.extensions.make_dsn(params.pop("dsn", None), **params)
+    try:
+        admin = psycopg2.connect(server_dsn, dbname="postgres", connect_timeout=3)
+    except psycopg2.Error as e:
+        pytest.skip(f"PostgreSQL is not available: {str(e).strip()}")
+    admin.autocommit = True
+    name = f"shopease_test_{os.getpid()}"
+    with admin.cursor() as cur:
+        cur.execute(f"DROP DATABASE IF EXISTS {name};")
+        cur.execute(f"CREATE DATABASE {name};")
+
+    previous_dsn = assignment.DB_DSN
+    assignment.DB_DSN = psycopg2.extensions.make_dsn(server_dsn, dbname=name)
+    conn = psycopg2.connect(assignment.DB_DSN)
+    for step in (assignment.create_tables, assignment.create_indexes, assignment.create_views, assignment.create_triggers):
+        step(conn)
+    conn.close()
+    try:
+        yield name
+    finally:
+        assignment.close_pool()
+        assignment.DB_DSN = previous_dsn
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS {name} WITH (FORCE);")
+        admin.close()
+
+
+@pytest.fixture
+def conn(database):
+    """
+    A connection to the test database with the core tables (and anything referencing them) emptied.
+    """
+    conn = psycopg2.connect(assignment.DB_DSN)
+    with conn.cursor() as cur:
+        cur.execute(f"TRUNCATE {CORE_TABLES} CASCADE;")
+    conn.commit()
+    yield conn
+    conn.close()
@@ -0,0 +1,55 @@
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+import assignment
+
+
+@pytest.fixture
+def products(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO products (product_id, name, category, price, stock) VALUES
+                (1, 'Kettle', 'Kitchen', 20.00, 5), (2, 'Toaster', 'Kitchen', 35.00, NULL), (3, 'Lamp', 'Home', 12.50, 8);
+        """)
+    conn.commit()
+
+
+def product_rows(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT product_id, price, stock FROM products ORDER BY 1;")
+        rows = cur.fetchall()
+    conn.commit()
+    return rows
+
+
+def test_bulk_update_counts_matched_and_unmatched_keys(conn, products):
+    frame = pd.DataFrame({"product_id": [1, 2, 99], "price": [22.00, 36.00, 1.00]})
+    totals = assignment.bulk_update(conn, "products", "product_id", frame)
+
+    assert totals == {"matched": 2, "unmatched": 1, "updated": 2}
+    assert product_rows(conn) == [(1, Decimal("22.00"), 5), (2, Decimal("36.00"), None), (3, Decimal("12.50"), 8)]
+
+
+def test_bulk_update_counts_across_chunks_and_skips_current_rows(conn, products):
+    # key 3 already has this price: matched but not rewritten; 98 and 99 are unknown
+    frame = pd.DataFrame({"product_id": [1, 98, 3, 2, 99], "price": [21.00, 1.00, 12.50, 30.00, 1.00]})
+    totals = assignment.bulk_update(conn, "products", "product_id", frame, chunk_rows=2)
+
+    assert totals == {"matched": 3, "unmatched": 2, "updated": 2}
+    assert assignment.bulk_update(conn, "products", "product_id", frame, chunk_rows=2) == {"matched": 3, "unmatched": 2, "updated": 0}
+
+
+def test_bulk_update_last_value_for_a_key_wins(conn, products):
+    frame = pd.DataFrame({"product_id": [1, 1], "price": [25.00, 26.00]})
+    assert assignment.bulk_update(conn, "products", "product_id", frame) == {"matched": 1, "unmatched": 0, "updated": 1}
+    assert product_rows(conn)[0] == (1, Decimal("26.00"), 5)
+
+
+def test_bulk_update_fill_nulls_only_keeps_existing_values(conn, products):
+    frame = pd.DataFrame({"product_id": [1, 2], "stock": [50, 7]})
+    totals = assignment.bulk_update(conn, "products", "product_id", frame, fill_nulls_only=True)
+
+    assert totals == {"matched": 2, "unmatched": 0, "updated": 1}
+    assert [(product_id, stock) for product_id, _, stock in product_rows(conn)] == [(1, 5), (2, 7), (3, 8)]
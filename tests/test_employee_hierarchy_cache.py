@@ -0,0 +1,77 @@
+import pytest
+
+import assignment
+
+LEVELS_QUERY = """
+    WITH RECURSIVE tree AS (
+        SELECT employee_id, 0 AS level FROM employees WHERE manager_id IS NULL
+        UNION ALL
+        SELECT e.employee_id, t.level + 1 FROM employees e JOIN tree t ON e.manager_id = t.employee_id
+    )
+    SELECT employee_id, level FROM tree;
+"""
+
+
+def execute(conn, query, params=None):
+    with conn.cursor() as cur:
+        cur.execute(query, params)
+    conn.commit()
+
+
+def database_levels(conn):
+    with conn.cursor() as cur:
+        cur.execute(LEVELS_QUERY)
+        levels = dict(cur.fetchall())
+    conn.commit()
+    return levels
+
+
+def settle(cache):
+    """
+    Applies change notifications until none have arrived for a moment.
+    """
+    applied = cache.wait(timeout=2)
+    while True:
+        more = cache.wait(timeout=0.2)
+        if not more:
+            return applied
+        applied += more
+
+
+@pytest.fixture
+def cache(conn):
+    execute(conn, """
+        INSERT INTO employees (employee_id, name, role, manager_id) VALUES
+            (1, 'Asha', 'CEO', NULL), (2, 'Bala', 'VP', 1), (3, 'Chitra', 'Manager', 2),
+            (4, 'Dev', 'Engineer', 3), (5, 'Esha', 'CFO', NULL);
+    """)
+    cache = assignment.EmployeeHierarchyCache()
+    yield cache
+    cache.close()
+
+
+def test_initial_levels_match_database(conn, cache):
+    assert cache.levels == database_levels(conn) == {1: 0, 2: 1, 3: 2, 4: 3, 5: 0}
+
+
+def test_moving_a_manager_relevels_the_whole_subtree(conn, cache):
+    execute(conn, "UPDATE employees SET manager_id = 5 WHERE employee_id = 3;")
+    assert settle(cache) >= 1
+    assert cache.levels == database_levels(conn)
+    assert (cache.levels[3], cache.levels[4]) == (1, 2)
+    assert 3 in cache.children[5] and 3 not in cache.children[2]
+
+
+def test_report_announced_before_its_manager_is_leveled_later(conn, cache):
+    # one statement, report first: its notification arrives while its manager is still unknown
+    execute(conn, "INSERT INTO employees (employee_id, name, role, manager_id) VALUES (7, 'Gita', 'Analyst', 6), (6, 'Farid', 'Lead', 4);")
+    settle(cache)
+    assert cache.levels == database_levels(conn)
+    assert (cache.levels[6], cache.levels[7]) == (4, 5)
+
+
+def test_deleting_a_manager_promotes_its_reports(conn, cache):
+    execute(conn, "DELETE FROM employees WHERE employee_id = 2;")
+    settle(cache)
+    assert cache.levels == database_levels(conn)
+    assert 2 not in cache.levels and cache.levels[3] == 0 and cache.levels[4] == 1
@@ -0,0 +1,45 @@
+import datetime
+
+import pytest
+
+import assignment
+
+LONG_FORM_QUERY = """
+    SELECT * FROM (VALUES (1, 'a', 10), (1, 'b', 11), (1, 'c', 12), (2, 'a', 20), (3, 'b', 30), (3, 'c', 31)) AS v
+    ORDER BY 1, 2;
+"""
+PIVOTED = [(1, 10, 11, 12), (2, 20, None, None), (3, None, 30, 31)]
+
+
+@pytest.mark.parametrize("itersize", [1, 2, 3, 4, 100])
+def test_pandas_pivot_carries_a_row_split_across_chunks(conn, itersize):
+    rows = list(assignment._pandas_pivot_rows(conn, LONG_FORM_QUERY, None, ["a", "b", "c"], itersize))
+    assert rows == PIVOTED
+
+
+def test_pandas_pivot_of_no_rows_yields_nothing(conn):
+    query = "SELECT 1, 'a', 1 WHERE FALSE;"
+    assert list(assignment._pandas_pivot_rows(conn, query, None, ["a"], 2)) == []
+
+
+def test_pandas_pivot_matches_sql_pivot(conn):
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO stores (store_id, name, location) VALUES (1, 'Central', 'Pune');")
+        cur.execute("""
+            INSERT INTO customers (customer_id, name, email, phone, city)
+            SELECT id, 'Customer ' || id, id || '@example.com', '555-' || id, 'Pune' FROM generate_series(1, 4) id;
+        """)
+        orders = [(1, 1, datetime.date(2024, 1, 5), 100), (2, 2, datetime.date(2024, 1, 9), 50),
+                  (3, 2, datetime.date(2024, 2, 1), 70), (4, 2, datetime.date(2024, 3, 3), 30),
+                  (5, 2, datetime.date(2024, 3, 20), 5), (6, 3, datetime.date(2024, 2, 14), 80),
+                  (7, 4, datetime.date(2024, 3, 30), 10)]
+        cur.executemany("INSERT INTO orders (order_id, customer_id, store_id, order_date, total_amount) VALUES (%s, %s, 1, %s, %s);", orders)
+    conn.commit()
+
+    labels, sql_rows = assignment.stream_pivot(conn, rows="customer", columns="month", method="sql", itersize=2)
+    sql_rows = [tuple(None if value is None else float(value) for value in row) for row in sql_rows]
+    pandas_labels, pandas_rows = assignment.stream_pivot(conn, rows="customer", columns="month", method="pandas", itersize=2)
+
+    assert labels == pandas_labels == ["2024-01", "2024-02", "2024-03"]
+    assert list(pandas_rows) == sql_rows
+    assert sql_rows[1] == (2, 50.0, 70.0, 35.0)
@@ -0,0 +1,59 @@
+import datetime
+
+import pytest
+
+import assignment
+
+
+@pytest.fixture
+def customers(conn):
+    """
+    Seven customers: 2 and 5 ordered recently, 3 only three years ago (with an item and a payment),
+    the rest never.
+    """
+    today = datetime.date.today()
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO customers (customer_id, name, email, phone, city)
+            SELECT id, 'Customer ' || id, id || '@example.com', '555-' || id, 'Pune' FROM generate_series(1, 7) id;
+        """)
+        cur.execute("INSERT INTO products (product_id, name, category, price, stock) VALUES (1, 'Kettle', 'Kitchen', 20, 100);")
+        cur.executemany("INSERT INTO orders (order_id, customer_id, order_date, total_amount) VALUES (%s, %s, %s, %s);",
+                        [(1, 2, today, 20), (2, 5, today - datetime.timedelta(days=30), 20),
+                         (3, 3, today - datetime.timedelta(days=3 * 366), 20)])
+        cur.execute("INSERT INTO order_items (order_item_id, order_id, product_id, quantity, price) VALUES (1, 3, 1, 1, 20);")
+        cur.execute("INSERT INTO payments (payment_id, order_id, amount, payment_method, payment_date) VALUES (1, 3, 20, 'Card', CURRENT_DATE);")
+    conn.commit()
+
+
+def remaining_customers(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT customer_id FROM customers ORDER BY 1;")
+        ids = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    return ids
+
+
+def test_purge_deletes_inactive_customers_in_keyset_batches(conn, customers, capsys):
+    totals = assignment.purge_inactive_customers(conn, inactive_years=2, batch_size=2, sleep_seconds=0)
+
+    assert totals == {"customers": 5, "orders": 1, "order_items": 1, "payments": 1}
+    assert remaining_customers(conn) == [2, 5]
+    output = capsys.readouterr().out
+    # candidates 1, 3, 4, 6, 7 taken two at a time in customer_id order
+    assert "batch 1: up to customer ID 3," in output
+    assert "batch 2: up to customer ID 6," in output
+    assert "batch 3: up to customer ID 7," in output
+    assert "in 3 batches" in output
+
+
+def test_purge_batch_size_does_not_change_the_result(conn, customers):
+    totals = assignment.purge_inactive_customers(conn, inactive_years=2, batch_size=1000, sleep_seconds=0)
+    assert totals == {"customers": 5, "orders": 1, "order_items": 1, "payments": 1}
+    assert remaining_customers(conn) == [2, 5]
+
+
+def test_purge_dry_run_only_counts(conn, customers):
+    counts = assignment.purge_inactive_customers(conn, inactive_years=2, batch_size=2, dry_run=True)
+    assert counts == {"customers": 5, "orders": 1, "order_items": 1, "payments": 1}
+    assert remaining_customers(conn) == [1, 2, 3, 4, 5, 6, 7]
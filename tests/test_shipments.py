@@ -0,0 +1,124 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import pytest
+
+import assignment
+
+
+@pytest.fixture
+def products(conn):
+    with conn.cursor() as cur:
+        cur.execute("INSERT INTO products (product_id, name, category, price, stock) VALUES (1, 'Kettle', 'Kitchen', 20, 10), (2, 'Lamp', 'Home', 12, 10);")
+    conn.commit()
+
+
+def stock(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT product_id, stock FROM products ORDER BY 1;")
+        levels = dict(cur.fetchall())
+    conn.commit()
+    return levels
+
+
+FEED = [
+    (100, 1, 5, None),
+    (100, 1, 5, None),  # repeated within the feed, and across the batch boundary below
+    (101, 2, 3, None),
+    (100, 1, 5, None),
+    (102, 999, 1, None),  # unknown product
+    (None, 1, 1, None),  # no shipment_id
+]
+
+
+def test_duplicate_shipments_are_counted_once(conn, products):
+    totals = assignment.ingest_shipments(conn, FEED, batch_rows=2)
+
+    assert totals == {"received": 6, "new": 2, "duplicates": 2, "conflicts": 0, "rejected": 2, "products_restocked": 2}
+    assert stock(conn) == {1: 15, 2: 13}
+
+
+def test_ingesting_a_feed_again_changes_nothing(conn, products):
+    assignment.ingest_shipments(conn, FEED, batch_rows=2)
+    totals = assignment.ingest_shipments(conn, FEED, batch_rows=4)
+
+    assert totals == {"received": 6, "new": 0, "duplicates": 4, "conflicts": 0, "rejected": 2, "products_restocked": 0}
+    assert stock(conn) == {1: 15, 2: 13}
+
+
+def test_csv_and_dataframe_feeds(conn, products, tmp_path):
+    feed = tmp_path / "feed.csv"
+    feed.write_text("shipment_id,product_id,quantity,shipment_date\n200,1,4,2024-05-01\n201,2,2,\n")
+    assert assignment.ingest_shipments(conn, str(feed))["new"] == 2
+    # an integer column with a blank arrives as float64; it must still stage as INT
+    frame = pd.DataFrame({"shipment_id": [201, 202, 203], "product_id": [2, 1, 2], "quantity": [2, 6, np.nan]})
+    totals = assignment.ingest_shipments(conn, frame)
+
+    assert totals == {"received": 3, "new": 1, "duplicates": 1, "conflicts": 0, "rejected": 1, "products_restocked": 1}
+    assert stock(conn) == {1: 20, 2: 12}
+
+
+def test_concurrent_ingesters_of_one_feed_add_stock_once(conn, products):
+    rows = [(1000 + i, 1 + i % 2, 1, None) for i in range(400)]
+    errors = []
+
+    def ingest():
+        worker = psycopg2.connect(**assignment.connection_params())
+        try:
+            if assignment.ingest_shipments(worker, rows, batch_rows=50) is None:
+                errors.append("ingest failed")
+        finally:
+            worker.close()
+
+    threads = [threading.Thread(target=ingest) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert stock(conn) == {1: 210, 2: 210}
+
+
+def test_conflicting_repeats_of_a_shipment_are_rejected(conn, products, capsys):
+    assignment.ingest_shipments(conn, [(300, 1, 5, None)])
+    feed = [
+        (301, 1, 2, None), (301, 2, 2, None),  # same shipment, different product
+        (300, 1, 9, None),  # already received with quantity 5
+        (302, 2, 1, None), (302, 2, 1, None),
+    ]
+    totals = assignment.ingest_shipments(conn, feed)
+
+    assert totals == {"received": 5, "new": 1, "duplicates": 1, "conflicts": 3, "rejected": 0, "products_restocked": 1}
+    assert stock(conn) == {1: 15, 2: 11}
+    assert "shipment IDs 300, 301" in capsys.readouterr().out
+
+
+def test_watcher_retries_transient_errors_and_parks_bad_feeds(conn, products, tmp_path, monkeypatch):
+    (tmp_path / "good.csv").write_text("shipment_id,product_id,quantity\n400,1,3\n")
+    (tmp_path / "bad.csv").write_text("shipment_id,product_id,quantity\nabc,1,3\n")
+    os.utime(tmp_path / "bad.csv", (1, 1))  # oldest first: the bad feed is tried before the good one
+    ingest = assignment._ingest_shipment_batches
+    calls = []
+
+    def flaky_ingest(watch_conn, path, batch_rows):
+        calls.append(os.path.basename(path))
+        if len(calls) == 1:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        return ingest(watch_conn, path, batch_rows)
+
+    def sleep(_):
+        if len(calls) >= 3:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(assignment, "_ingest_shipment_batches", flaky_ingest)
+    monkeypatch.setattr(assignment.time, "sleep", sleep)
+    assignment.watch_shipment_feeds(conn, str(tmp_path), poll_seconds=0)
+
+    assert calls == ["bad.csv", "bad.csv", "good.csv"]
+    assert os.listdir(tmp_path / "failed") == ["bad.csv"]
+    assert os.listdir(tmp_path / "processed") == ["good.csv"]
+    assert stock(conn) == {1: 13, 2: 10}